@@ -0,0 +1,386 @@
+"""
+Batch – concept maps for a whole corpus of documents.
+
+Responsibilities:
+  - List the documents of a run from a directory tree or a manifest file
+  - Shard them across worker processes that each load the spaCy model once
+  - Append one JSON line per document to the output as soon as it is done
+  - Optionally merge every document's graph into a corpus store
+  - Resume an interrupted run by skipping ids already in the output
+  - Survive a worker process that dies on a document: record that
+    document as failed and carry on with a new pool
+  - Report throughput (documents and sentences per second)
+"""
+
+import json
+import multiprocessing
+import os
+import re
+import time
+from concurrent.futures import ALL_COMPLETED, FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+from corpus_store import CorpusStore, document_record
+from utils import BATCH_SUFFIXES, BATCH_WORKERS, DEFAULT_PROFILE
+
+# (document id, file path)
+BatchDocument = Tuple[str, str]
+
+# (output line, succeeded, sentences, corpus record or None)
+Outcome = Tuple[str, bool, int, Optional[Dict]]
+
+
+# ---------------------------------------------------------------------------
+# Inputs
+# ---------------------------------------------------------------------------
+
+def iter_input_dir(root: str, suffixes: Tuple[str, ...] = BATCH_SUFFIXES) -> Iterator[BatchDocument]:
+    """
+    Every file under *root* whose name ends in one of *suffixes*, in
+    sorted path order.  The id is the path relative to *root*, with "/"
+    separators.
+    """
+    for directory, subdirs, files in os.walk(root):
+        subdirs.sort()
+        for name in sorted(files):
+            if name.lower().endswith(suffixes):
+                path = os.path.join(directory, name)
+                yield os.path.relpath(path, root).replace(os.sep, "/"), path
+
+
+def iter_manifest(manifest_path: str) -> Iterator[BatchDocument]:
+    """
+    Documents listed in a manifest file, one per line.
+
+    A line is either a path (which is also the id) or a JSON object with
+    "path" and an optional "id".  Relative paths are resolved against the
+    manifest's directory; blank lines and lines starting with "#" are
+    skipped.  Raises ``ValueError`` for a malformed line.
+    """
+    base = os.path.dirname(os.path.abspath(manifest_path))
+    with open(manifest_path, "r", encoding="utf-8") as f:
+        for number, line in enumerate(f, 1):
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            if line.startswith("{"):
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError as exc:
+                    raise ValueError(f"{manifest_path}:{number}: {exc}") from exc
+                path = entry.get("path")
+                if not isinstance(path, str) or not path:
+                    raise ValueError(f"{manifest_path}:{number}: entry has no \"path\"")
+                doc_id = str(entry.get("id") or path)
+            else:
+                path = doc_id = line
+            yield doc_id, os.path.join(base, path)
+
+
+# ---------------------------------------------------------------------------
+# Output
+# ---------------------------------------------------------------------------
+
+# Lines are written as {"id": ..., "status": ..., ...}, so resuming can
+# read both from the start of a line without parsing the whole map.
+_LINE_HEAD = re.compile(r'\{"id": ("(?:[^"\\]|\\.)*"), "status": "(\w+)"')
+
+
+def completed_ids(output_path: str) -> Set[str]:
+    """
+    Ids of the documents already written successfully to *output_path*.
+
+    A final line cut short by a crash is truncated away, so appending
+    starts on a fresh line.  Failed documents are not counted: they are
+    retried.
+    """
+    if not os.path.exists(output_path):
+        return set()
+
+    with open(output_path, "rb+") as f:
+        data = f.read()
+        end = data.rfind(b"\n") + 1
+        if end < len(data):
+            f.truncate(end)
+
+    done = set()
+    for line in data[:end].decode("utf-8", "replace").splitlines():
+        m = _LINE_HEAD.match(line)
+        if m is not None:
+            doc_id, status = json.loads(m.group(1)), m.group(2)
+        else:
+            try:
+                entry = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            doc_id, status = entry.get("id"), entry.get("status")
+        if status == "ok" and isinstance(doc_id, str):
+            done.add(doc_id)
+    return done
+
+
+# ---------------------------------------------------------------------------
+# Worker side
+# ---------------------------------------------------------------------------
+
+def _init_worker(profile: str):
+    """Pool initializer: load the model once."""
+    from document_graph_builder import get_nlp
+    get_nlp(profile)
+
+
+def _process_document(
+    doc_id: str, path: str, options: Dict, pdf_options: Dict, with_graph: bool = False,
+) -> Outcome:
+    """
+    Build the concept map of one document.
+
+    Returns the output line (serialised here, so the parent only writes
+    it), whether it succeeded, the number of sentences processed and,
+    with *with_graph*, the ``document_record`` of its full graph.
+    """
+    from document_graph_builder import process_pdf, process_text_file
+
+    graphs = []
+    if with_graph:
+        options = dict(options, graph_sink=lambda *args: graphs.append(document_record(*args)))
+    start = time.perf_counter()
+    try:
+        if path.lower().endswith(".pdf"):
+            result = process_pdf(path, **options, **pdf_options)
+        else:
+            result = process_text_file(path, **options)
+    except Exception as exc:
+        entry = {
+            "id": doc_id,
+            "status": "error",
+            "path": path,
+            "seconds": round(time.perf_counter() - start, 4),
+            "error": f"{type(exc).__name__}: {exc}",
+        }
+        return json.dumps(entry, ensure_ascii=False), False, 0, None
+
+    entry = {
+        "id": doc_id,
+        "status": "ok",
+        "path": path,
+        "seconds": round(time.perf_counter() - start, 4),
+        "result": result,
+    }
+    sentences = result.get("stats", {}).get("total_sentences", 0)
+    graph = graphs[0] if graphs else None
+    return json.dumps(entry, ensure_ascii=False), True, sentences, graph
+
+
+def _crashed(doc_id: str, path: str) -> Outcome:
+    """Outcome of a document whose worker process died while processing it."""
+    entry = {
+        "id": doc_id,
+        "status": "error",
+        "path": path,
+        "error": "BrokenProcessPool: the worker process died (crash or out of memory)",
+    }
+    return json.dumps(entry, ensure_ascii=False), False, 0, None
+
+
+# ---------------------------------------------------------------------------
+# Runner
+# ---------------------------------------------------------------------------
+
+def run_batch(
+    documents: Iterable[BatchDocument],
+    output_path: str,
+    workers: int = BATCH_WORKERS,
+    resume: bool = True,
+    options: Optional[Dict] = None,
+    pdf_options: Optional[Dict] = None,
+    progress: Optional[Callable[[str, Dict], None]] = None,
+    corpus: Optional[CorpusStore] = None,
+) -> Dict:
+    """
+    Build a concept map for every document and append them to the JSONL
+    file *output_path* in the order they finish.
+
+    *options* are passed to ``process_text_file`` / ``process_pdf`` and
+    *pdf_options* to ``process_pdf`` only.  Documents are spread over
+    *workers* processes (0 = one per CPU core, 1 = this process); at most
+    two per worker are in flight, so the document list is consumed
+    lazily.  Every line is flushed as it is written, so after a crash a
+    rerun with *resume* skips the ids already done (without *resume* the
+    output is overwritten).  Ids repeated in *documents* are processed
+    once.  *progress*, if given, is called as ``progress("document", info)``
+    after each document.  A document whose worker process dies is
+    written as an error and the run goes on (see ``_run_pool``).
+
+    With *corpus* the full graph of every document is also merged into
+    that store under the document's id (by this process, as results come
+    in); resuming then skips only ids that are in both the output and the
+    corpus.  Scores and clusters are left to ``corpus.refresh()``.
+
+    Returns
+    -------
+    dict
+        documents, processed, skipped, failed, sentences, seconds,
+        docs_per_second, sentences_per_second and workers.
+    """
+    options = dict(options or {})
+    # Each worker already has a core to itself; nested spaCy, section or
+    # page multiprocessing would only oversubscribe the machine.
+    options.update(n_process=1, section_workers=0)
+    pdf_options = dict(pdf_options or {}, pdf_workers=0)
+    profile = options.get("profile", DEFAULT_PROFILE)
+    if workers <= 0:
+        workers = os.cpu_count() or 1
+
+    os.makedirs(os.path.dirname(output_path) or ".", exist_ok=True)
+    seen = completed_ids(output_path) if resume else set()
+    if corpus is not None:
+        seen &= corpus.document_names()
+    skipped = 0
+
+    def todo() -> Iterator[BatchDocument]:
+        nonlocal skipped
+        for doc_id, path in documents:
+            if doc_id in seen:
+                skipped += 1
+                continue
+            seen.add(doc_id)
+            yield doc_id, path
+
+    counts = {"processed": 0, "failed": 0, "sentences": 0}
+    start = time.perf_counter()
+
+    with open(output_path, "a" if resume else "w", encoding="utf-8") as out:
+        def record(doc_id: str, outcome: Outcome):
+            line, ok, sentences, graph = outcome
+            out.write(line + "\n")
+            out.flush()
+            if corpus is not None and graph is not None:
+                corpus.add_document(doc_id, graph)
+            counts["processed"] += 1
+            counts["sentences"] += sentences
+            if not ok:
+                counts["failed"] += 1
+            if progress is not None:
+                progress("document", {
+                    "id": doc_id,
+                    "status": "ok" if ok else "error",
+                    "done": counts["processed"],
+                })
+
+        if workers == 1:
+            _init_worker(profile)
+            for doc_id, path in todo():
+                record(doc_id, _process_document(
+                    doc_id, path, options, pdf_options, corpus is not None,
+                ))
+        else:
+            _run_pool(todo(), workers, profile, options, pdf_options, corpus is not None, record)
+
+    seconds = time.perf_counter() - start
+    return {
+        "documents": counts["processed"] + skipped,
+        "processed": counts["processed"],
+        "skipped": skipped,
+        "failed": counts["failed"],
+        "sentences": counts["sentences"],
+        "seconds": round(seconds, 3),
+        "docs_per_second": round(counts["processed"] / seconds, 3) if seconds else 0.0,
+        "sentences_per_second": round(counts["sentences"] / seconds, 1) if seconds else 0.0,
+        "workers": workers,
+    }
+
+
+def _run_pool(
+    documents: Iterator[BatchDocument],
+    workers: int,
+    profile: str,
+    options: Dict,
+    pdf_options: Dict,
+    with_graph: bool,
+    record: Callable[[str, Outcome], None],
+):
+    """
+    Process *documents* in a pool, passing each outcome to *record*.
+
+    A worker process that dies (a crash in native code, the OOM killer)
+    breaks the pool, and every document in flight fails with it.  Those
+    documents are run again one at a time in a new pool, so only the one
+    that kills its worker again is recorded as an error, and the run
+    goes on.
+    """
+    executor = _new_pool(workers, profile)
+
+    def submit(doc_id: str, path: str) -> Future:
+        return executor.submit(_process_document, doc_id, path, options, pdf_options, with_graph)
+
+    def recover(suspects: List[BatchDocument]):
+        nonlocal executor
+        # Every other document in flight fails too (or had just finished)
+        suspects += _record_finished(pending, record, ALL_COMPLETED)
+        executor = _new_pool(workers, profile)
+        for doc_id, path in suspects:
+            try:
+                outcome = submit(doc_id, path).result()
+            except BrokenProcessPool:
+                outcome = _crashed(doc_id, path)
+                executor = _new_pool(workers, profile)
+            record(doc_id, outcome)
+
+    pending: Dict[Future, BatchDocument] = {}
+    try:
+        for document in documents:
+            try:
+                pending[submit(*document)] = document
+            except BrokenProcessPool:
+                recover([document])
+                continue
+            if len(pending) >= 2 * workers:
+                suspects = _record_finished(pending, record)
+                if suspects:
+                    recover(suspects)
+        while pending:
+            suspects = _record_finished(pending, record)
+            if suspects:
+                recover(suspects)
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+def _new_pool(workers: int, profile: str) -> ProcessPoolExecutor:
+    # "spawn" so a pool is never forked from a multi-threaded process
+    return ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=_init_worker,
+        initargs=(profile,),
+    )
+
+
+def _record_finished(
+    pending: Dict[Future, BatchDocument],
+    record: Callable[[str, Outcome], None],
+    return_when: str = FIRST_COMPLETED,
+) -> List[BatchDocument]:
+    """
+    Wait for at least one of *pending* (all with ``ALL_COMPLETED``) and
+    record those done.
+
+    Returns
+    -------
+    list
+        The documents that failed because the pool broke; they are not
+        recorded.
+    """
+    done, _ = wait(pending, return_when=return_when)
+    broken = []
+    for future in done:
+        document = pending.pop(future)
+        try:
+            outcome = future.result()
+        except BrokenProcessPool:
+            broken.append(document)
+            continue
+        record(document[0], outcome)
+    return broken
@@ -0,0 +1,448 @@
+"""
+Compact Graph – array-backed concept graph for large batch runs.
+
+Responsibilities:
+  - Store concepts as interned integer ids with NumPy attribute arrays
+  - Store edges as CSR adjacency with small-int relation codes
+  - Store descriptions and formulas as offsets into one shared string
+    table (a sentence describing several concepts is stored once)
+  - Convert to and from NetworkX
+
+The graph_builder functions (rank_concepts, prune_graph,
+filter_low_value_nodes, connect_to_root, detect_communities,
+graph_to_json) accept a CompactConceptGraph wherever they accept a
+NetworkX DiGraph and produce the same results.
+"""
+
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+import networkx as nx
+import numpy as np
+
+from utils import ALLOWED_RELATIONS
+
+
+# Relation codes shared by all graphs; other relation names get codes
+# appended per graph as they are seen.
+RELATION_NAMES: List[str] = sorted(ALLOWED_RELATIONS)
+
+
+class _StringTable:
+    """Interned strings addressed by integer id."""
+
+    def __init__(self):
+        self.strings: List[str] = []
+        self._ids: Dict[str, int] = {}
+
+    def intern(self, s: str) -> int:
+        sid = self._ids.get(s)
+        if sid is None:
+            sid = len(self.strings)
+            self._ids[s] = sid
+            self.strings.append(s)
+        return sid
+
+
+def _ragged(lists: Sequence[Sequence[int]]) -> Tuple[np.ndarray, np.ndarray]:
+    """Pack lists of ids into (offsets, values) arrays."""
+    ptr = np.zeros(len(lists) + 1, dtype=np.int64)
+    ptr[1:] = np.cumsum([len(x) for x in lists])
+    values = np.fromiter((v for x in lists for v in x), dtype=np.int32, count=int(ptr[-1]))
+    return ptr, values
+
+
+def _take_ragged(ptr: np.ndarray, values: np.ndarray, ids: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Rows *ids* of a ragged array, in order."""
+    counts = ptr[ids + 1] - ptr[ids]
+    new_ptr = np.zeros(len(ids) + 1, dtype=np.int64)
+    new_ptr[1:] = np.cumsum(counts)
+    if not len(ids) or not new_ptr[-1]:
+        return new_ptr, values[:0]
+    starts = np.repeat(ptr[ids], counts)
+    offsets = np.arange(new_ptr[-1]) - np.repeat(new_ptr[:-1], counts)
+    return new_ptr, values[starts + offsets]
+
+
+class CompactConceptGraph:
+    """
+    Directed concept graph held in flat arrays.
+
+    Node *i* is ``names[i]``; its out-edges are
+    ``indices[indptr[i]:indptr[i + 1]]`` in insertion order, with
+    ``relations`` (codes into ``relation_names``) and ``negated`` aligned
+    to ``indices``.  Descriptions and formulas of node *i* are string ids
+    ``desc_ids[desc_ptr[i]:desc_ptr[i + 1]]`` (likewise ``form_*``) into
+    ``strings``, which subgraphs share with their parent.
+    """
+
+    def __init__(
+        self,
+        names: List[str],
+        frequency: np.ndarray,
+        cluster: np.ndarray,
+        indptr: np.ndarray,
+        indices: np.ndarray,
+        relations: np.ndarray,
+        negated: np.ndarray,
+        relation_names: List[str],
+        strings: List[str],
+        desc_ptr: np.ndarray,
+        desc_ids: np.ndarray,
+        form_ptr: np.ndarray,
+        form_ids: np.ndarray,
+    ):
+        self.names = names
+        self.index: Dict[str, int] = {name: i for i, name in enumerate(names)}
+        self.frequency = frequency
+        self.cluster = cluster
+        self.indptr = indptr
+        self.indices = indices
+        self.relations = relations
+        self.negated = negated
+        self.relation_names = relation_names
+        self.strings = strings
+        self.desc_ptr = desc_ptr
+        self.desc_ids = desc_ids
+        self.form_ptr = form_ptr
+        self.form_ids = form_ids
+
+    # ------------------------------------------------------------------
+    # Construction
+    # ------------------------------------------------------------------
+
+    @classmethod
+    def _from_parts(
+        cls,
+        names: List[str],
+        frequency: Sequence[int],
+        cluster: Sequence[int],
+        edges: Iterable[Tuple[int, int, str, bool]],
+        descriptions: Sequence[Sequence[str]],
+        formulas: Sequence[Sequence[str]],
+        table: Optional[_StringTable] = None,
+    ) -> "CompactConceptGraph":
+        """Freeze per-node lists and an ordered edge list into arrays."""
+        n = len(names)
+        relation_names = list(RELATION_NAMES)
+        codes = {rel: i for i, rel in enumerate(relation_names)}
+
+        src, dst, rel, neg = [], [], [], []
+        for u, v, relation, negated in edges:
+            code = codes.get(relation)
+            if code is None:
+                code = codes[relation] = len(relation_names)
+                relation_names.append(relation)
+            src.append(u)
+            dst.append(v)
+            rel.append(code)
+            neg.append(negated)
+
+        # Group edges by source; a stable sort keeps insertion order per row
+        src_arr = np.asarray(src, dtype=np.int64)
+        order = np.argsort(src_arr, kind="stable")
+        indptr = np.zeros(n + 1, dtype=np.int64)
+        indptr[1:] = np.cumsum(np.bincount(src_arr, minlength=n))
+
+        table = table or _StringTable()
+        desc_ptr, desc_ids = _ragged([[table.intern(s) for s in d] for d in descriptions])
+        form_ptr, form_ids = _ragged([[table.intern(s) for s in f] for f in formulas])
+
+        return cls(
+            names=list(names),
+            frequency=np.asarray(frequency, dtype=np.int64),
+            cluster=np.asarray(cluster, dtype=np.int32),
+            indptr=indptr,
+            indices=np.asarray(dst, dtype=np.int32)[order],
+            relations=np.asarray(rel, dtype=np.uint8)[order],
+            negated=np.asarray(neg, dtype=bool)[order],
+            relation_names=relation_names,
+            strings=table.strings,
+            desc_ptr=desc_ptr,
+            desc_ids=desc_ids,
+            form_ptr=form_ptr,
+            form_ids=form_ids,
+        )
+
+    @classmethod
+    def from_relations(
+        cls,
+        relations: List[Dict],
+        frequency: Dict[str, int],
+        descriptions: Dict[str, List[str]],
+        formulas: Dict[str, List[str]],
+        heading_edges: Optional[List[Dict]] = None,
+    ) -> "CompactConceptGraph":
+        """Build the same graph as ``graph_builder.build_graph``."""
+        index: Dict[str, int] = {}
+        edges: Dict[Tuple[int, int], Tuple[str, bool]] = {}
+
+        def node_id(name: str) -> int:
+            if name not in index:
+                index[name] = len(index)
+            return index[name]
+
+        # --- Relation edges (a repeated edge keeps its position, last data wins) ---
+        for r in relations:
+            if r["relation"] not in ALLOWED_RELATIONS:
+                continue
+            u, v = node_id(r["source"]), node_id(r["target"])
+            edges[(u, v)] = (r["relation"], r.get("negated", False))
+
+        # --- Heading hierarchy edges ---
+        for he in heading_edges or []:
+            u, v = node_id(he["source"]), node_id(he["target"])
+            if (u, v) not in edges:
+                edges[(u, v)] = (he.get("relation", "contains"), False)
+
+        names = list(index)
+        return cls._from_parts(
+            names,
+            frequency=[frequency.get(n, 1) for n in names],
+            cluster=[-1] * len(names),
+            edges=((u, v, rel, neg) for (u, v), (rel, neg) in edges.items()),
+            descriptions=[list(dict.fromkeys(descriptions.get(n, []))) for n in names],
+            formulas=[list(dict.fromkeys(formulas.get(n, []))) for n in names],
+        )
+
+    @classmethod
+    def from_edges(
+        cls,
+        names: List[str],
+        frequency: Sequence[int],
+        edges: Iterable[Tuple[int, int, str, bool]],
+        cluster: Optional[Sequence[int]] = None,
+    ) -> "CompactConceptGraph":
+        """
+        Graph of *names* with (source id, target id, relation, negated)
+        *edges* and no descriptions or formulas (e.g. for ranking and
+        clustering a corpus graph held elsewhere).
+        """
+        empty = [()] * len(names)
+        return cls._from_parts(
+            names,
+            frequency=frequency,
+            cluster=[-1] * len(names) if cluster is None else cluster,
+            edges=edges,
+            descriptions=empty,
+            formulas=empty,
+        )
+
+    @classmethod
+    def from_networkx(cls, G: nx.DiGraph) -> "CompactConceptGraph":
+        names = list(G.nodes)
+        index = {name: i for i, name in enumerate(names)}
+        data = [G.nodes[n] for n in names]
+        return cls._from_parts(
+            names,
+            frequency=[d.get("frequency", 1) for d in data],
+            cluster=[d.get("cluster", -1) for d in data],
+            edges=(
+                (index[u], index[v], d.get("relation", "connected_to"), d.get("negated", False))
+                for u, v, d in G.edges(data=True)
+            ),
+            descriptions=[d.get("descriptions", []) for d in data],
+            formulas=[d.get("formulas", []) for d in data],
+        )
+
+    def to_networkx(self) -> nx.DiGraph:
+        G = nx.DiGraph()
+        for i, name in enumerate(self.names):
+            G.add_node(
+                name,
+                frequency=int(self.frequency[i]),
+                descriptions=self.descriptions(i),
+                formulas=self.formulas(i),
+                cluster=int(self.cluster[i]),
+            )
+        for u, v, relation, negated in self.iter_edges():
+            G.add_edge(u, v, relation=relation, negated=negated)
+        return G
+
+    # ------------------------------------------------------------------
+    # Queries
+    # ------------------------------------------------------------------
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def __contains__(self, name) -> bool:
+        return name in self.index
+
+    @property
+    def nodes(self) -> List[str]:
+        return self.names
+
+    def number_of_nodes(self) -> int:
+        return len(self.names)
+
+    def number_of_edges(self) -> int:
+        return len(self.indices)
+
+    def edge_sources(self) -> np.ndarray:
+        """Source id of every edge, aligned with ``indices``."""
+        return np.repeat(np.arange(len(self.names), dtype=np.int64), np.diff(self.indptr))
+
+    def degrees(self) -> np.ndarray:
+        """In- plus out-degree of every node."""
+        n = len(self.names)
+        return np.diff(self.indptr) + np.bincount(self.indices, minlength=n)
+
+    def in_degrees(self) -> np.ndarray:
+        return np.bincount(self.indices, minlength=len(self.names))
+
+    def iter_edges(self) -> Iterator[Tuple[str, str, str, bool]]:
+        """(source, target, relation, negated) in adjacency order."""
+        names, rel_names = self.names, self.relation_names
+        for u in range(len(names)):
+            for k in range(self.indptr[u], self.indptr[u + 1]):
+                yield (names[u], names[self.indices[k]],
+                       rel_names[self.relations[k]], bool(self.negated[k]))
+
+    def descriptions(self, i: int) -> List[str]:
+        return [self.strings[s] for s in self.desc_ids[self.desc_ptr[i]:self.desc_ptr[i + 1]]]
+
+    def formulas(self, i: int) -> List[str]:
+        return [self.strings[s] for s in self.form_ids[self.form_ptr[i]:self.form_ptr[i + 1]]]
+
+    # ------------------------------------------------------------------
+    # Derived graphs
+    # ------------------------------------------------------------------
+
+    def subgraph(self, keep: np.ndarray) -> "CompactConceptGraph":
+        """Graph induced by the nodes where boolean mask *keep* is set."""
+        ids = np.flatnonzero(keep)
+        new_id = np.full(len(self.names), -1, dtype=np.int64)
+        new_id[ids] = np.arange(len(ids))
+
+        edge_keep = keep[self.edge_sources()] & keep[self.indices]
+        src = new_id[self.edge_sources()[edge_keep]]
+        indptr = np.zeros(len(ids) + 1, dtype=np.int64)
+        indptr[1:] = np.cumsum(np.bincount(src, minlength=len(ids)))
+
+        desc_ptr, desc_ids = _take_ragged(self.desc_ptr, self.desc_ids, ids)
+        form_ptr, form_ids = _take_ragged(self.form_ptr, self.form_ids, ids)
+        return CompactConceptGraph(
+            names=[self.names[i] for i in ids],
+            frequency=self.frequency[ids],
+            cluster=self.cluster[ids],
+            indptr=indptr,
+            indices=new_id[self.indices[edge_keep]].astype(np.int32),
+            relations=self.relations[edge_keep],
+            negated=self.negated[edge_keep],
+            relation_names=self.relation_names,
+            strings=self.strings,
+            desc_ptr=desc_ptr,
+            desc_ids=desc_ids,
+            form_ptr=form_ptr,
+            form_ids=form_ids,
+        )
+
+    def with_node(self, name: str, frequency: int = 0) -> "CompactConceptGraph":
+        """Graph with an extra isolated node appended (no-op if present)."""
+        if name in self.index:
+            return self
+        empty = np.zeros(1, dtype=np.int64)
+        return CompactConceptGraph(
+            names=self.names + [name],
+            frequency=np.append(self.frequency, frequency),
+            cluster=np.append(self.cluster, np.int32(-1)),
+            indptr=np.append(self.indptr, self.indptr[-1]),
+            indices=self.indices,
+            relations=self.relations,
+            negated=self.negated,
+            relation_names=self.relation_names,
+            strings=self.strings,
+            desc_ptr=np.append(self.desc_ptr, self.desc_ptr[-1] + empty),
+            desc_ids=self.desc_ids,
+            form_ptr=np.append(self.form_ptr, self.form_ptr[-1] + empty),
+            form_ids=self.form_ids,
+        )
+
+    def with_edges_from(self, source: str, targets: Sequence[str], relation: str) -> "CompactConceptGraph":
+        """Graph with non-negated edges source→target appended to *source*'s row."""
+        if not targets:
+            return self
+        u = self.index[source]
+        relation_names = self.relation_names
+        if relation not in relation_names:
+            relation_names = relation_names + [relation]
+        code = relation_names.index(relation)
+
+        at = self.indptr[u + 1]
+        count = len(targets)
+        indptr = self.indptr.copy()
+        indptr[u + 1:] += count
+        return CompactConceptGraph(
+            names=self.names,
+            frequency=self.frequency,
+            cluster=self.cluster,
+            indptr=indptr,
+            indices=np.insert(self.indices, at, [self.index[t] for t in targets]).astype(np.int32),
+            relations=np.insert(self.relations, at, np.full(count, code, dtype=np.uint8)),
+            negated=np.insert(self.negated, at, np.zeros(count, dtype=bool)),
+            relation_names=relation_names,
+            strings=self.strings,
+            desc_ptr=self.desc_ptr,
+            desc_ids=self.desc_ids,
+            form_ptr=self.form_ptr,
+            form_ids=self.form_ids,
+        )
+
+    def has_edge(self, source: str, target: str) -> bool:
+        u, v = self.index.get(source), self.index.get(target)
+        if u is None or v is None:
+            return False
+        return bool(np.any(self.indices[self.indptr[u]:self.indptr[u + 1]] == v))
+
+    # ------------------------------------------------------------------
+    # Attribute updates
+    # ------------------------------------------------------------------
+
+    def set_clusters(self, partition: Dict[str, int]):
+        for name, cluster_id in partition.items():
+            i = self.index.get(name)
+            if i is not None:
+                self.cluster[i] = cluster_id
+
+    def set_formulas(self, name: str, formulas: List[str]):
+        """Replace the formulas of one node (the string table is extended)."""
+        i = self.index[name]
+        table = _StringTable()
+        table.strings = self.strings
+        table._ids = {s: k for k, s in enumerate(self.strings)}
+        rows = [
+            [table.intern(f) for f in formulas] if k == i
+            else self.form_ids[self.form_ptr[k]:self.form_ptr[k + 1]].tolist()
+            for k in range(len(self.names))
+        ]
+        self.form_ptr, self.form_ids = _ragged(rows)
+
+    # ------------------------------------------------------------------
+    # Export
+    # ------------------------------------------------------------------
+
+    def to_json(self) -> Dict:
+        """Same structure as ``graph_builder.graph_to_json``."""
+        nodes = []
+        for i, name in enumerate(self.names):
+            nodes.append({
+                "id": name,
+                "frequency": int(self.frequency[i]),
+                "descriptions": self.descriptions(i),
+                "formulas": self.formulas(i),
+                "cluster": int(self.cluster[i]),
+            })
+
+        edges = [
+            {"source": u, "target": v, "relation": relation, "negated": negated}
+            for u, v, relation, negated in self.iter_edges()
+        ]
+
+        all_formulas = list(dict.fromkeys(
+            self.strings[s] for s in self.form_ids.tolist()
+        ))
+        return {
+            "nodes": nodes,
+            "edges": edges,
+            "document_formulas": all_formulas,
+        }
@@ -8,24 +8,27 @@ Responsibilities:
   - Track concept frequency
 """
 
-from typing import Dict, List, Set, Tuple
+from typing import Dict, List, Sequence, Set, Tuple, Union
 
 import spacy
 from spacy.tokens import Doc, Span
 
-from utils import normalize_concept, is_valid_concept
+from utils import normalize_concept, is_valid_concept, NLP_BATCH_SIZE, NLP_N_PROCESS
+from preprocessor import iter_parsed
+from parse_cache import SentenceParse
+from phrase_index import PhraseAutomaton
 
 
 # ---------------------------------------------------------------------------
 # Core extraction
 # ---------------------------------------------------------------------------
 
-def _get_noun_phrases(doc: Doc) -> List[Span]:
+def _get_noun_phrases(doc: Union[Doc, Span]) -> List[Span]:
     """Return all noun chunks from the document."""
     return list(doc.noun_chunks)
 
 
-def _get_compound_phrases(doc: Doc) -> List[str]:
+def _get_compound_phrases(doc: Union[Doc, Span]) -> List[str]:
     """
     Walk the dependency tree to build compound noun phrases that spaCy's
     noun_chunks might miss (e.g. "entity relationship diagram").
@@ -77,96 +80,145 @@ def _keep_longest_phrases(raw_phrases: List[str]) -> List[str]:
     # Sort longest first
     normed.sort(key=lambda x: -len(x[1]))
 
+    # A phrase can only be contained in a strictly longer one, and longer
+    # phrases are decided first.  So whenever a phrase is kept, every
+    # shorter candidate occurring inside it is marked as covered in a
+    # single automaton scan, instead of later testing each candidate
+    # against every kept phrase.
+    automaton = PhraseAutomaton({lower for _, lower in normed})
+    covered: Set[str] = set()
+
     kept: List[str] = []
-    kept_lower: List[str] = []
     for original, lower in normed:
         # Skip obvious noisy fragments (general rule)
         if lower in {"what", "the", "also", "referred", "to", "common", "tool", "type", "upfront"}:
             continue
 
-        # Check if this phrase is a substring of an already-kept phrase
-        is_sub = False
-        for kl in kept_lower:
-            if lower in kl and lower != kl:
-                is_sub = True
-                break
-        if not is_sub:
-            kept.append(original)
-            kept_lower.append(lower)
+        # Skip phrases that are substrings of an already-kept phrase
+        if lower in covered:
+            continue
+        kept.append(original)
+        for match in automaton.iter_matches(lower):
+            if match != lower:
+                covered.add(match)
 
     return kept
 
 
 # ---------------------------------------------------------------------------
-# Public API
+# Incremental accumulation
 # ---------------------------------------------------------------------------
 
-def extract_concepts(
-    sentences: List[str],
-    nlp: spacy.language.Language,
-) -> Tuple[List[str], Dict[str, int]]:
+class ConceptAccumulator:
     """
-    Extract and normalise concepts from a list of sentences.
+    Collect noun-phrase counts sentence by sentence.
 
-    Returns
-    -------
-    concepts : list[str]
-        Unique normalised concept strings.
-    frequency : dict[str, int]
-        Concept -> occurrence count.
+    Only the normalised phrase counts are kept (in first-occurrence
+    order), so documents can be fed in section by section and partial
+    accumulators merged; ``finalize()`` returns exactly what
+    ``extract_concepts`` returns for the same sentences.
     """
-    raw_phrases: List[str] = []
 
-    for sent_text in sentences:
-        doc = nlp(sent_text)
+    def __init__(self):
+        self.freq: Dict[str, int] = {}
+
+    def add_phrase(self, raw_phrase: str):
+        n = normalize_concept(raw_phrase)
+        if n and is_valid_concept(n):
+            self.freq[n] = self.freq.get(n, 0) + 1
+
+    def add_doc(self, doc: Union[Doc, Span, SentenceParse]):
+        noun_chunks, compound_phrases = get_raw_phrases(doc)
 
         # 1. spaCy noun chunks
-        for chunk in _get_noun_phrases(doc):
-            raw_phrases.append(chunk.text)
+        for phrase in noun_chunks:
+            self.add_phrase(phrase)
 
         # 2. Compound phrases from dependency tree
-        raw_phrases.extend(_get_compound_phrases(doc))
+        for phrase in compound_phrases:
+            self.add_phrase(phrase)
 
-    # Normalize all phrases
-    normed_map: Dict[str, str] = {}  # normalised -> first raw
-    for rp in raw_phrases:
-        n = normalize_concept(rp)
-        if n and is_valid_concept(n):
-            normed_map.setdefault(n, rp)
+    def merge(self, other: "ConceptAccumulator"):
+        """Append the counts of a later part of the document."""
+        for n, count in other.freq.items():
+            self.freq[n] = self.freq.get(n, 0) + count
+
+    def finalize(self) -> Tuple[List[str], Dict[str, int]]:
+        # Keep longest non-overlapping phrases
+        unique_concepts = _keep_longest_phrases(list(self.freq.keys()))
+
+        # General cleanup - remove very short or quoted fragments
+        unique_concepts = [c for c in unique_concepts if len(c) > 4 and not c.startswith('"')]
+
+        # Rebuild freq dict with only kept concepts
+        final_freq = {c: self.freq.get(c, 1) for c in unique_concepts}
+
+        return unique_concepts, final_freq
 
-    # Count frequencies (case-insensitive)
-    freq: Dict[str, int] = {}
-    for rp in raw_phrases:
-        n = normalize_concept(rp)
-        if n and n in normed_map:
-            freq[n] = freq.get(n, 0) + 1
 
-    # Keep longest non-overlapping phrases
-    unique_concepts = _keep_longest_phrases(list(normed_map.keys()))
+# ---------------------------------------------------------------------------
+# Public API
+# ---------------------------------------------------------------------------
 
-    # General cleanup - remove very short or quoted fragments
-    unique_concepts = [c for c in unique_concepts if len(c) > 4 and not c.startswith('"')]
+def get_raw_phrases(
+    doc: Union[Doc, Span, SentenceParse],
+) -> Tuple[Sequence[str], Sequence[str]]:
+    """
+    Noun-chunk texts and compound phrases of a parsed sentence.
+
+    A ``SentenceParse`` already carries both, so cached sentences are
+    never walked again.
+    """
+    if isinstance(doc, SentenceParse):
+        return doc.noun_chunks, doc.compound_phrases
+    return [chunk.text for chunk in _get_noun_phrases(doc)], _get_compound_phrases(doc)
 
-    # Rebuild freq dict with only kept concepts
-    final_freq = {c: freq.get(c, 1) for c in unique_concepts}
 
-    return unique_concepts, final_freq
+def extract_concepts(
+    sentences: Sequence[Union[str, Span, SentenceParse]],
+    nlp: spacy.language.Language,
+    batch_size: int = NLP_BATCH_SIZE,
+    n_process: int = NLP_N_PROCESS,
+) -> Tuple[List[str], Dict[str, int]]:
+    """
+    Extract and normalise concepts from a list of sentences.
+
+    Sentences may be raw strings, already-parsed spaCy spans or cached
+    ``SentenceParse`` artifacts; the latter two are used as-is so the
+    pipeline does not parse the same text twice.  Raw
+    strings are parsed in batches of *batch_size* across *n_process*
+    processes.
+
+    Returns
+    -------
+    concepts : list[str]
+        Unique normalised concept strings.
+    frequency : dict[str, int]
+        Concept -> occurrence count.
+    """
+    accumulator = ConceptAccumulator()
+    for doc in iter_parsed(sentences, nlp, batch_size, n_process):
+        accumulator.add_doc(doc)
+    return accumulator.finalize()
 
 
 def extract_concepts_from_doc(
-    doc: Doc,
+    doc: Union[Doc, Span, SentenceParse],
 ) -> List[str]:
     """
-    Extract concept strings from a single spaCy Doc (used by meaning_analyzer).
+    Extract concept strings from a single spaCy Doc, sentence Span or
+    ``SentenceParse`` (used by meaning_analyzer).
     Returns raw normalised concept strings found in the doc.
     """
+    noun_chunks, compound_phrases = get_raw_phrases(doc)
+
     phrases: List[str] = []
-    for chunk in doc.noun_chunks:
-        n = normalize_concept(chunk.text)
+    for chunk_text in noun_chunks:
+        n = normalize_concept(chunk_text)
         if n and is_valid_concept(n):
             phrases.append(n)
 
-    for phrase_text in _get_compound_phrases(doc):
+    for phrase_text in compound_phrases:
         n = normalize_concept(phrase_text)
         if n and is_valid_concept(n):
             if n not in phrases:
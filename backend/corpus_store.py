@@ -0,0 +1,700 @@
+"""
+Corpus Store – one concept graph across many documents, kept in SQLite.
+
+Responsibilities:
+  - Merge the graph of each document into a single SQLite file: concept
+    frequencies, relation edges with the documents they came from, and
+    descriptions and formulas stored once however many documents share
+    them
+  - Add, replace or remove one document without touching the others
+  - Rank and cluster the merged graph, warm-starting Louvain from the
+    clusters of the previous run so cluster ids stay put
+  - Export the top-ranked part of the corpus graph as a concept map
+  - Answer lookups by index: a concept, its neighbours, the documents
+    that mention it, the edges of one relation type and the k-hop
+    subgraph around it
+
+Only the rows of the document being merged are read or written, and
+SQLite's page cache is capped, so merging runs in bounded memory however
+large the corpus grows.  Ranking and clustering hold the graph structure
+(names and integer edges, no texts) in memory.
+"""
+
+import sqlite3
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Sequence, Set
+
+import networkx as nx
+
+from compact_graph import CompactConceptGraph
+from graph_builder import ConceptGraph, cluster_graph, graph_to_json, rank_concepts
+from parse_cache import text_key
+from utils import (
+    CORPUS_CACHE_KIB,
+    CORPUS_MAX_TEXTS,
+    CORPUS_QUERY_LIMIT,
+    LOUVAIN_MAX_LEVELS,
+    LOUVAIN_TIME_BUDGET,
+    MAX_CONCEPTS,
+)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS documents (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE,
+    title TEXT NOT NULL,
+    concepts INTEGER NOT NULL,
+    edges INTEGER NOT NULL,
+    added REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS concepts (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE,
+    frequency INTEGER NOT NULL DEFAULT 0,
+    documents INTEGER NOT NULL DEFAULT 0,
+    headings INTEGER NOT NULL DEFAULT 0,
+    score REAL,
+    cluster INTEGER
+);
+CREATE INDEX IF NOT EXISTS concepts_by_score ON concepts (score);
+CREATE TABLE IF NOT EXISTS concept_documents (
+    concept_id INTEGER NOT NULL,
+    document_id INTEGER NOT NULL,
+    frequency INTEGER NOT NULL,
+    heading INTEGER NOT NULL,
+    PRIMARY KEY (concept_id, document_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS concept_documents_by_document ON concept_documents (document_id);
+CREATE TABLE IF NOT EXISTS edges (
+    id INTEGER PRIMARY KEY,
+    source_id INTEGER NOT NULL,
+    target_id INTEGER NOT NULL,
+    relation TEXT NOT NULL,
+    negated INTEGER NOT NULL,
+    documents INTEGER NOT NULL DEFAULT 0,
+    UNIQUE (source_id, target_id, relation, negated)
+);
+CREATE TABLE IF NOT EXISTS edge_documents (
+    edge_id INTEGER NOT NULL,
+    document_id INTEGER NOT NULL,
+    PRIMARY KEY (edge_id, document_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS edges_by_target ON edges (target_id, source_id);
+CREATE INDEX IF NOT EXISTS edges_by_relation ON edges (relation, documents);
+CREATE INDEX IF NOT EXISTS edge_documents_by_document ON edge_documents (document_id);
+CREATE TABLE IF NOT EXISTS texts (
+    id INTEGER PRIMARY KEY,
+    concept_id INTEGER NOT NULL,
+    kind TEXT NOT NULL,
+    digest BLOB NOT NULL,
+    text TEXT NOT NULL,
+    documents INTEGER NOT NULL DEFAULT 0,
+    UNIQUE (concept_id, kind, digest)
+);
+CREATE TABLE IF NOT EXISTS text_documents (
+    text_id INTEGER NOT NULL,
+    document_id INTEGER NOT NULL,
+    PRIMARY KEY (text_id, document_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS text_documents_by_document ON text_documents (document_id);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+"""
+
+# Texts kept per concept: "description" and "formula"
+_TEXT_KINDS = ("description", "formula")
+
+# Names per "IN (...)" lookup (SQLite allows 999 parameters before 3.32)
+_IN_CHUNK = 500
+
+
+def document_record(graph: ConceptGraph, title: str, headings: Sequence[str]) -> Dict:
+    """
+    What the corpus keeps of one document's graph, as plain data that can
+    be pickled between processes: title, headings, nodes (id, frequency,
+    descriptions, formulas) and edges (source, target, relation, negated).
+    """
+    concept_map = graph_to_json(graph)
+    return {
+        "title": title,
+        "headings": list(headings),
+        "nodes": concept_map["nodes"],
+        "edges": concept_map["edges"],
+    }
+
+
+class CorpusStore:
+    """
+    Merged concept graph of a corpus in one SQLite file.
+
+    ``add_document`` merges a ``document_record`` under a document name
+    (replacing an earlier version of that name); ``remove_document``
+    takes one out again.  Concept frequencies are summed over documents,
+    an edge or text lives as long as some document has it, and every
+    merge is one transaction.  ``refresh`` recomputes scores and
+    clusters; ``concept_map`` exports the top-ranked concepts.
+    """
+
+    def __init__(self, path: str, cache_kib: int = CORPUS_CACHE_KIB):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(f"PRAGMA cache_size = -{int(cache_kib)}")
+        self._conn.execute("PRAGMA journal_mode = WAL")
+        self._conn.execute("PRAGMA synchronous = NORMAL")
+        self._conn.executescript(_SCHEMA)
+        self._conn.commit()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    # ------------------------------------------------------------------
+    # Merging
+    # ------------------------------------------------------------------
+
+    def add_document(self, name: str, record: Dict) -> Dict:
+        """
+        Merge *record* (see ``document_record``) as document *name*.
+
+        Returns
+        -------
+        dict
+            document, concepts, edges, new_concepts and replaced (whether
+            an earlier version of *name* was taken out first).
+        """
+        nodes = record["nodes"]
+        edges = record["edges"]
+        headings = set(record.get("headings", ()))
+        with self._lock, self._conn:
+            conn = self._conn
+            replaced = self._remove(name)
+            doc_id = conn.execute(
+                "INSERT INTO documents (name, title, concepts, edges, added) VALUES (?, ?, ?, ?, ?)",
+                (name, record.get("title", name), len(nodes), len(edges), time.time()),
+            ).lastrowid
+
+            before = conn.total_changes
+            conn.executemany(
+                "INSERT INTO concepts (name) VALUES (?) ON CONFLICT (name) DO NOTHING",
+                ((node["id"],) for node in nodes),
+            )
+            new_concepts = conn.total_changes - before
+            ids = self._concept_ids([node["id"] for node in nodes])
+
+            concept_rows = [
+                (ids[node["id"]], node["frequency"], node["id"] in headings) for node in nodes
+            ]
+            conn.executemany(
+                "UPDATE concepts SET frequency = frequency + ?, documents = documents + 1,"
+                " headings = headings + ? WHERE id = ?",
+                ((freq, heading, concept_id) for concept_id, freq, heading in concept_rows),
+            )
+            conn.executemany(
+                "INSERT INTO concept_documents (concept_id, document_id, frequency, heading)"
+                " VALUES (?, ?, ?, ?)",
+                ((concept_id, doc_id, freq, heading) for concept_id, freq, heading in concept_rows),
+            )
+
+            edge_rows = [
+                (ids[e["source"]], ids[e["target"]], e["relation"], bool(e["negated"]))
+                for e in edges
+            ]
+            conn.executemany(
+                "INSERT INTO edges (source_id, target_id, relation, negated, documents)"
+                " VALUES (?, ?, ?, ?, 1)"
+                " ON CONFLICT (source_id, target_id, relation, negated)"
+                " DO UPDATE SET documents = documents + 1",
+                edge_rows,
+            )
+            conn.executemany(
+                "INSERT OR IGNORE INTO edge_documents (edge_id, document_id)"
+                " SELECT id, ? FROM edges"
+                " WHERE source_id = ? AND target_id = ? AND relation = ? AND negated = ?",
+                ((doc_id,) + row for row in edge_rows),
+            )
+
+            text_rows = [
+                (ids[node["id"]], kind, text_key(kind, text), text)
+                for node in nodes
+                for kind, texts in zip(_TEXT_KINDS, (node["descriptions"], node["formulas"]))
+                for text in dict.fromkeys(texts)
+            ]
+            conn.executemany(
+                "INSERT INTO texts (concept_id, kind, digest, text, documents)"
+                " VALUES (?, ?, ?, ?, 1)"
+                " ON CONFLICT (concept_id, kind, digest) DO UPDATE SET documents = documents + 1",
+                text_rows,
+            )
+            conn.executemany(
+                "INSERT OR IGNORE INTO text_documents (text_id, document_id)"
+                " SELECT id, ? FROM texts WHERE concept_id = ? AND kind = ? AND digest = ?",
+                ((doc_id, concept_id, kind, digest) for concept_id, kind, digest, _ in text_rows),
+            )
+            self._set_meta("stale", "1")
+
+        return {
+            "document": name,
+            "concepts": len(nodes),
+            "edges": len(edges),
+            "new_concepts": new_concepts,
+            "replaced": replaced,
+        }
+
+    def _concept_ids(self, names: List[str]) -> Dict[str, int]:
+        """Id of every concept in *names* (which must all exist)."""
+        ids: Dict[str, int] = {}
+        for start in range(0, len(names), _IN_CHUNK):
+            chunk = names[start:start + _IN_CHUNK]
+            marks = ", ".join("?" * len(chunk))
+            ids.update(
+                (name, concept_id) for concept_id, name in self._conn.execute(
+                    f"SELECT id, name FROM concepts WHERE name IN ({marks})", chunk
+                )
+            )
+        return ids
+
+    def remove_document(self, name: str) -> bool:
+        """Take document *name* out of the corpus; False if it is unknown."""
+        with self._lock, self._conn:
+            removed = self._remove(name)
+            if removed:
+                self._set_meta("stale", "1")
+        return removed
+
+    def _remove(self, name: str) -> bool:
+        """Undo every contribution of document *name* (inside a transaction)."""
+        row = self._conn.execute("SELECT id FROM documents WHERE name = ?", (name,)).fetchone()
+        if row is None:
+            return False
+        doc = {"d": row[0]}
+        script = (
+            "UPDATE concepts SET"
+            " frequency = frequency - (SELECT frequency FROM concept_documents"
+            "  WHERE concept_id = concepts.id AND document_id = :d),"
+            " headings = headings - (SELECT heading FROM concept_documents"
+            "  WHERE concept_id = concepts.id AND document_id = :d),"
+            " documents = documents - 1"
+            " WHERE id IN (SELECT concept_id FROM concept_documents WHERE document_id = :d)",
+
+            "UPDATE edges SET documents = documents - 1"
+            " WHERE id IN (SELECT edge_id FROM edge_documents WHERE document_id = :d)",
+            "DELETE FROM edges WHERE documents <= 0"
+            " AND id IN (SELECT edge_id FROM edge_documents WHERE document_id = :d)",
+            "DELETE FROM edge_documents WHERE document_id = :d",
+
+            "UPDATE texts SET documents = documents - 1"
+            " WHERE id IN (SELECT text_id FROM text_documents WHERE document_id = :d)",
+            "DELETE FROM texts WHERE documents <= 0"
+            " AND id IN (SELECT text_id FROM text_documents WHERE document_id = :d)",
+            "DELETE FROM text_documents WHERE document_id = :d",
+
+            # A concept is only on edges of documents that have it, so no
+            # remaining edge refers to a concept deleted here
+            "DELETE FROM concepts WHERE documents <= 0"
+            " AND id IN (SELECT concept_id FROM concept_documents WHERE document_id = :d)",
+            "DELETE FROM concept_documents WHERE document_id = :d",
+            "DELETE FROM documents WHERE id = :d",
+        )
+        for statement in script:
+            self._conn.execute(statement, doc)
+        return True
+
+    def _set_meta(self, key: str, value: str):
+        self._conn.execute(
+            "INSERT INTO meta (key, value) VALUES (?, ?)"
+            " ON CONFLICT (key) DO UPDATE SET value = excluded.value",
+            (key, value),
+        )
+
+    # ------------------------------------------------------------------
+    # Ranking and clustering
+    # ------------------------------------------------------------------
+
+    def refresh(
+        self,
+        max_levels: int = LOUVAIN_MAX_LEVELS,
+        time_budget: float = LOUVAIN_TIME_BUDGET,
+    ) -> Dict:
+        """
+        Rank every concept of the merged graph and cluster it.
+
+        Ranking is ``graph_builder.rank_concepts`` (concepts that are a
+        heading in any document get the heading boost).  Clustering is
+        ``graph_builder.cluster_graph`` seeded with the stored clusters, so
+        after a few documents are merged only their neighbourhoods move
+        and existing cluster ids are kept.  Between two concepts the
+        relation found in the most documents stands for the pair.
+
+        Returns
+        -------
+        dict
+            concepts, edges, seconds and the clustering info (modularity,
+            levels, passes, moves, warm_start, budget_exhausted).
+        """
+        start = time.perf_counter()
+        with self._lock:
+            conn = self._conn
+            ids: List[int] = []
+            names: List[str] = []
+            frequency: List[int] = []
+            heading_concepts: List[str] = []
+            previous: Dict[str, int] = {}
+            position: Dict[int, int] = {}
+            for concept_id, name, freq, headings, cluster in conn.execute(
+                "SELECT id, name, frequency, headings, cluster FROM concepts ORDER BY id"
+            ):
+                position[concept_id] = len(ids)
+                ids.append(concept_id)
+                names.append(name)
+                frequency.append(freq)
+                if headings > 0:
+                    heading_concepts.append(name)
+                if cluster is not None:
+                    previous[name] = cluster
+
+            # SQLite takes the bare columns from the row with MAX(documents)
+            edges = [
+                (position[source], position[target], relation, bool(negated))
+                for source, target, relation, negated, _ in conn.execute(
+                    "SELECT source_id, target_id, relation, negated, MAX(documents)"
+                    " FROM edges GROUP BY source_id, target_id"
+                )
+            ]
+            position.clear()
+
+            graph = CompactConceptGraph.from_edges(names, frequency, edges)
+            del edges
+            scores = rank_concepts(graph, heading_concepts=heading_concepts)
+            clusters, info = cluster_graph(
+                graph, previous=previous or None,
+                max_levels=max_levels, time_budget=time_budget,
+            )
+
+            with conn:
+                conn.executemany(
+                    "UPDATE concepts SET score = ?, cluster = ? WHERE id = ?",
+                    ((scores[name], clusters[name], concept_id)
+                     for concept_id, name in zip(ids, names)),
+                )
+                self._set_meta("stale", "0")
+                self._set_meta("refreshed", repr(time.time()))
+
+        return dict(
+            {
+                "concepts": len(names),
+                "edges": graph.number_of_edges(),
+                "seconds": round(time.perf_counter() - start, 4),
+            },
+            clustering=info,
+        )
+
+    # ------------------------------------------------------------------
+    # Reading
+    # ------------------------------------------------------------------
+
+    def document_names(self) -> Set[str]:
+        with self._lock:
+            return {name for (name,) in self._conn.execute("SELECT name FROM documents")}
+
+    def stats(self) -> Dict:
+        """Document, concept, edge and text counts, and whether ranks are stale."""
+        with self._lock:
+            conn = self._conn
+
+            def count(sql: str, *args) -> int:
+                return conn.execute(sql, args).fetchone()[0]
+
+            meta = dict(conn.execute("SELECT key, value FROM meta"))
+            return {
+                "documents": count("SELECT COUNT(*) FROM documents"),
+                "concepts": count("SELECT COUNT(*) FROM concepts"),
+                "edges": count("SELECT COUNT(*) FROM edges"),
+                "descriptions": count("SELECT COUNT(*) FROM texts WHERE kind = ?", "description"),
+                "formulas": count("SELECT COUNT(*) FROM texts WHERE kind = ?", "formula"),
+                "communities": count(
+                    "SELECT COUNT(DISTINCT cluster) FROM concepts WHERE cluster IS NOT NULL"
+                ),
+                "stale": meta.get("stale", "0") == "1",
+            }
+
+    def concept_map(self, max_concepts: int = MAX_CONCEPTS, max_texts: int = CORPUS_MAX_TEXTS) -> Dict:
+        """
+        The *max_concepts* highest-ranked concepts and the edges among
+        them, in the format of ``graph_builder.graph_to_json``.
+
+        Scores and clusters are those of the last ``refresh``.  Each
+        concept keeps at most *max_texts* descriptions and formulas, those
+        found in the most documents first.
+        """
+        # The connection context commits the transaction that writing to
+        # the temporary table opens; left open, it would pin this
+        # connection to a snapshot without later merges (and make the
+        # next refresh fail with "database is locked").
+        with self._lock, self._conn as conn:
+            # Walks the score index; unscored concepts (NULL) come last
+            rows = conn.execute(
+                "SELECT id, name, frequency, cluster FROM concepts ORDER BY score DESC LIMIT ?",
+                (max_concepts,),
+            ).fetchall()
+
+            self._select(row[0] for row in rows)
+
+            G = nx.DiGraph()
+            names = {}
+            for concept_id, name, freq, cluster in rows:
+                names[concept_id] = name
+                G.add_node(
+                    name, frequency=freq, descriptions=[], formulas=[],
+                    cluster=-1 if cluster is None else cluster,
+                )
+
+            # CROSS JOIN keeps "selected" as the outer loop, so only the
+            # selected concepts' rows are looked up by index
+            texts = conn.execute(
+                "SELECT t.concept_id, t.kind, t.text FROM selected s"
+                " CROSS JOIN texts t ON t.concept_id = s.id"
+                " ORDER BY t.concept_id, t.kind, t.documents DESC, t.id"
+            )
+            for concept_id, kind, text in texts:
+                kept = G.nodes[names[concept_id]][kind + "s"]
+                if len(kept) < max_texts:
+                    kept.append(text)
+
+            # Ascending support, so the relation found in most documents
+            # is the one a pair keeps
+            for source, target, relation, negated, _ in self._selected_edges():
+                G.add_edge(names[source], names[target], relation=relation, negated=bool(negated))
+            conn.execute("DELETE FROM selected")
+
+        return graph_to_json(G)
+
+    def _select(self, ids: Iterable[int]):
+        """
+        Put *ids* in the temporary table "selected" (replacing its rows).
+
+        Call it within ``with self._conn`` so the transaction it opens is
+        committed.
+        """
+        self._conn.execute("CREATE TEMP TABLE IF NOT EXISTS selected (id INTEGER PRIMARY KEY)")
+        self._conn.execute("DELETE FROM selected")
+        self._conn.executemany("INSERT INTO selected (id) VALUES (?)", ((i,) for i in ids))
+
+    def _selected_edges(self) -> sqlite3.Cursor:
+        """
+        (source id, target id, relation, negated, documents) of the edges
+        between selected concepts, least supported first.
+        """
+        # CROSS JOIN keeps "selected" as the outer loop
+        return self._conn.execute(
+            "SELECT e.source_id, e.target_id, e.relation, e.negated, e.documents FROM selected a"
+            " CROSS JOIN edges e ON e.source_id = a.id JOIN selected b ON b.id = e.target_id"
+            " ORDER BY e.documents, e.id"
+        )
+
+    # ------------------------------------------------------------------
+    # Queries
+    # ------------------------------------------------------------------
+    # Each lookup starts from an index (concept name, edge source or
+    # target, relation type) and reads only the rows it returns, so its
+    # cost does not grow with the corpus.
+
+    def concept(self, name: str, max_texts: int = CORPUS_MAX_TEXTS) -> Optional[Dict]:
+        """
+        Concept *name* with its corpus frequency, document count, score,
+        cluster and up to *max_texts* descriptions and formulas (those
+        found in the most documents first); None if it is unknown.
+        """
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT id, frequency, documents, score, cluster FROM concepts WHERE name = ?",
+                (name,),
+            ).fetchone()
+            if row is None:
+                return None
+            concept_id, frequency, documents, score, cluster = row
+            texts = {
+                kind: [text for (text,) in self._conn.execute(
+                    "SELECT text FROM texts WHERE concept_id = ? AND kind = ?"
+                    " ORDER BY documents DESC, id LIMIT ?",
+                    (concept_id, kind, max_texts),
+                )]
+                for kind in _TEXT_KINDS
+            }
+        return {
+            "id": name,
+            "frequency": frequency,
+            "documents": documents,
+            "score": score,
+            "cluster": -1 if cluster is None else cluster,
+            "descriptions": texts["description"],
+            "formulas": texts["formula"],
+        }
+
+    def neighbors(
+        self,
+        name: str,
+        relation: Optional[str] = None,
+        direction: str = "both",
+        limit: int = CORPUS_QUERY_LIMIT,
+    ) -> Optional[List[Dict]]:
+        """
+        Edges between concept *name* and its neighbours, most supported
+        first: outgoing ("out"), incoming ("in") or both.  *relation*
+        keeps only edges of that type.  None if the concept is unknown.
+
+        Each edge is {"source", "target", "relation", "negated",
+        "documents"}, documents being how many documents have it.
+        """
+        if direction not in ("out", "in", "both"):
+            raise ValueError(f"direction must be 'out', 'in' or 'both', not {direction!r}")
+        with self._lock:
+            row = self._conn.execute("SELECT id FROM concepts WHERE name = ?", (name,)).fetchone()
+            if row is None:
+                return None
+            concept_id = row[0]
+            # "+" keeps the planner on the endpoint indexes: a concept has
+            # few edges, a relation type very many
+            match = " AND +e.relation = ?" if relation is not None else ""
+            parts, args = [], []
+            if direction in ("out", "both"):
+                parts.append(
+                    "SELECT ?, c.name, e.relation, e.negated, e.documents, e.id FROM edges e"
+                    " JOIN concepts c ON c.id = e.target_id WHERE e.source_id = ?" + match
+                )
+                args += [name, concept_id] + ([relation] if relation is not None else [])
+            if direction in ("in", "both"):
+                # A self-loop is already among the outgoing edges
+                loop = " AND e.source_id != e.target_id" if direction == "both" else ""
+                parts.append(
+                    "SELECT c.name, ?, e.relation, e.negated, e.documents, e.id FROM edges e"
+                    " JOIN concepts c ON c.id = e.source_id WHERE e.target_id = ?" + loop + match
+                )
+                args += [name, concept_id] + ([relation] if relation is not None else [])
+            rows = self._conn.execute(
+                " UNION ALL ".join(parts) + " ORDER BY 5 DESC, 6 LIMIT ?", args + [limit]
+            ).fetchall()
+        return [
+            {"source": s, "target": t, "relation": r, "negated": bool(n), "documents": d}
+            for s, t, r, n, d, _ in rows
+        ]
+
+    def concept_documents(self, name: str, limit: int = CORPUS_QUERY_LIMIT) -> Optional[List[Dict]]:
+        """
+        Documents that mention concept *name*, by how often they do:
+        {"document", "title", "frequency", "heading"} each.  None if the
+        concept is unknown.
+        """
+        with self._lock:
+            row = self._conn.execute("SELECT id FROM concepts WHERE name = ?", (name,)).fetchone()
+            if row is None:
+                return None
+            rows = self._conn.execute(
+                "SELECT d.name, d.title, cd.frequency, cd.heading FROM concept_documents cd"
+                " JOIN documents d ON d.id = cd.document_id WHERE cd.concept_id = ?"
+                " ORDER BY cd.frequency DESC, d.id LIMIT ?",
+                (row[0], limit),
+            ).fetchall()
+        return [
+            {"document": d, "title": title, "frequency": f, "heading": bool(h)}
+            for d, title, f, h in rows
+        ]
+
+    def relations(self, relation: str, limit: int = CORPUS_QUERY_LIMIT, offset: int = 0) -> List[Dict]:
+        """
+        Edges of type *relation*, most supported first (a page of *limit*
+        from *offset*), in the format of ``neighbors``.
+        """
+        with self._lock:
+            # The page is picked from the covering relation index alone, so
+            # the rows skipped by *offset* are never read from the table
+            rows = self._conn.execute(
+                "SELECT s.name, t.name, e.negated, e.documents FROM ("
+                " SELECT id FROM edges WHERE relation = ?"
+                " ORDER BY documents DESC, id DESC LIMIT ? OFFSET ?"
+                ") p CROSS JOIN edges e ON e.id = p.id"
+                " JOIN concepts s ON s.id = e.source_id JOIN concepts t ON t.id = e.target_id"
+                " ORDER BY e.documents DESC, e.id DESC",
+                (relation, limit, offset),
+            ).fetchall()
+        return [
+            {"source": s, "target": t, "relation": relation, "negated": bool(n), "documents": d}
+            for s, t, n, d in rows
+        ]
+
+    def subgraph(self, name: str, hops: int = 1, max_nodes: int = MAX_CONCEPTS) -> Optional[Dict]:
+        """
+        Concepts within *hops* edges of *name* (in either direction) and
+        the edges among them; None if the concept is unknown.
+
+        At most *max_nodes* concepts are returned; when a hop would
+        exceed that, its highest-scored concepts are kept and "truncated"
+        is set.  Nodes carry frequency, score, cluster and their distance
+        ("hops"); edges are in the format of ``neighbors``.
+        """
+        # Committed on exit, like concept_map's temporary-table writes
+        with self._lock, self._conn as conn:
+            row = conn.execute("SELECT id FROM concepts WHERE name = ?", (name,)).fetchone()
+            if row is None:
+                return None
+
+            # Breadth-first, one query per hop: the concepts reached by the
+            # previous hop, in the temporary table "reached", are joined to
+            # both edge indexes, and the best-scored new neighbours kept.
+            conn.execute(
+                "CREATE TEMP TABLE IF NOT EXISTS reached (id INTEGER PRIMARY KEY, hops INTEGER NOT NULL)"
+            )
+            conn.execute("DELETE FROM reached")
+            conn.execute("INSERT INTO reached (id, hops) VALUES (?, 0)", (row[0],))
+            distance = {row[0]: 0}
+            truncated = False
+            for hop in range(1, hops + 1):
+                room = max_nodes - len(distance)
+                found = [i for (i,) in conn.execute(
+                    "SELECT c.id FROM ("
+                    " SELECT e.target_id AS id FROM reached r CROSS JOIN edges e"
+                    " ON e.source_id = r.id WHERE r.hops = ?1"
+                    " UNION SELECT e.source_id FROM reached r CROSS JOIN edges e"
+                    " ON e.target_id = r.id WHERE r.hops = ?1"
+                    ") n CROSS JOIN concepts c ON c.id = n.id"
+                    " WHERE n.id NOT IN (SELECT id FROM reached)"
+                    " ORDER BY c.score DESC, c.id LIMIT ?2",
+                    (hop - 1, room + 1),
+                )]
+                if len(found) > room:
+                    truncated = True
+                    del found[room:]
+                conn.executemany(
+                    "INSERT INTO reached (id, hops) VALUES (?, ?)", ((i, hop) for i in found)
+                )
+                distance.update((i, hop) for i in found)
+                if not found or truncated:
+                    break
+
+            self._select(distance)
+            names = {}
+            nodes = []
+            for concept_id, concept, frequency, score, cluster in conn.execute(
+                "SELECT c.id, c.name, c.frequency, c.score, c.cluster FROM selected s"
+                " CROSS JOIN concepts c ON c.id = s.id"
+            ):
+                names[concept_id] = concept
+                nodes.append({
+                    "id": concept,
+                    "frequency": frequency,
+                    "score": score,
+                    "cluster": -1 if cluster is None else cluster,
+                    "hops": distance[concept_id],
+                })
+            edges = [
+                {"source": names[s], "target": names[t], "relation": r,
+                 "negated": bool(n), "documents": d}
+                for s, t, r, n, d in self._selected_edges()
+            ]
+            conn.execute("DELETE FROM selected")
+
+        nodes.sort(key=lambda node: (node["hops"], -(node["score"] or 0.0), node["id"]))
+        return {"concept": name, "hops": hops, "nodes": nodes, "edges": edges, "truncated": truncated}
@@ -1,16 +1,34 @@
 """
 CS-CME Engine – Flask web server for the Interactive Concept Map Generator.
 
+Run with --serve for the web server, --input / --text for one document,
+or --input-dir / --manifest for a batch run writing JSON lines.
+
 Endpoints
 ---------
-GET  /                  Serve the frontend
-POST /api/extract       Accept text / file, return concept-map JSON
-GET  /api/health        Health check
+GET  /                       Serve the frontend
+POST /api/extract            Accept text / file, return concept-map JSON
+                             (or stream progress and previews as NDJSON
+                             with "Accept: application/x-ndjson")
+POST /api/jobs               Same input as /api/extract, run asynchronously
+GET  /api/jobs/<id>          Job status and per-stage progress
+GET  /api/jobs/<id>/result   Concept-map JSON of a finished job
+GET  /api/corpus             Corpus graph counts (with --corpus)
+POST /api/corpus/refresh     Re-rank and re-cluster the corpus graph
+GET  /api/corpus/map         Top-ranked concepts of the corpus as a concept map
+GET  /api/corpus/concepts/<name>[/neighbors|/documents|/subgraph]
+                             Lookups around one concept
+GET  /api/corpus/relations/<relation>
+                             Corpus edges of one relation type
+GET  /api/health             Health check
 """
 
 import os
 import sys
 import json
+import queue
+import threading
+from functools import wraps
 
 from flask import Flask, request, jsonify, send_from_directory
 from flask_cors import CORS
@@ -18,8 +36,43 @@ from flask_cors import CORS
 # Ensure sibling modules are importable
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
-from document_graph_builder import process_text, process_pdf, get_nlp
-from utils import MAX_CHARACTERS, MAX_WORDS, MAX_PDF_PAGES
+from document_graph_builder import (
+    process_text,
+    process_text_file,
+    process_pdf,
+    get_nlp,
+    get_parse_cache,
+    get_section_versions,
+    describe_pipeline,
+)
+from batch import iter_input_dir, iter_manifest, run_batch
+from corpus_store import CorpusStore, document_record
+from job_manager import JobManager, QueueFullError, start_job_server, stop_job_server, connect_job_server
+from result_cache import ResultCache, make_cache_key
+from serving import can_prefork, serve_prefork
+from uploads import spool_upload, remove_quietly
+from utils import (
+    MAX_CHARACTERS,
+    MAX_WORDS,
+    MAX_PDF_PAGES,
+    NLP_BATCH_SIZE,
+    NLP_N_PROCESS,
+    SECTION_WORKERS,
+    MAX_DOCUMENT_ID_LENGTH,
+    PDF_BACKEND,
+    PDF_WORKERS,
+    DEFAULT_PROFILE,
+    PIPELINE_PROFILES,
+    JOB_WORKERS,
+    JOB_QUEUE_SIZE,
+    BATCH_WORKERS,
+    SERVE_MAX_REQUESTS,
+    CORPUS_QUERY_LIMIT,
+    CORPUS_MAX_HOPS,
+    MAX_CONCEPTS,
+    RESULT_CACHE_MEMORY_BYTES,
+    RESULT_CACHE_DISK_BYTES,
+)
 
 # ---------------------------------------------------------------------------
 # Flask app
@@ -32,6 +85,99 @@ app = Flask(
 )
 CORS(app)
 
+# Server configuration.  Defaults can be overridden with CSCME_-prefixed
+# environment variables (e.g. CSCME_NLP_BATCH_SIZE=512) or CLI flags.
+app.config.update(
+    NLP_BATCH_SIZE=NLP_BATCH_SIZE,
+    NLP_N_PROCESS=NLP_N_PROCESS,
+    NLP_PROFILE=DEFAULT_PROFILE,
+    SECTION_WORKERS=SECTION_WORKERS,
+    PDF_BACKEND=PDF_BACKEND,
+    PDF_WORKERS=PDF_WORKERS,
+    JOB_WORKERS=JOB_WORKERS,
+    JOB_QUEUE_SIZE=JOB_QUEUE_SIZE,
+    RESULT_CACHE_MEMORY_BYTES=RESULT_CACHE_MEMORY_BYTES,
+    RESULT_CACHE_PATH="",          # SQLite file for the disk tier ("" = off)
+    RESULT_CACHE_DISK_BYTES=RESULT_CACHE_DISK_BYTES,
+    CORPUS_PATH="",                # SQLite corpus graph ("" = off)
+)
+app.config.from_prefixed_env("CSCME")
+
+
+def _pipeline_options() -> dict:
+    """Keyword arguments for process_text / process_pdf from server config."""
+    return {
+        "batch_size": int(app.config["NLP_BATCH_SIZE"]),
+        "n_process": int(app.config["NLP_N_PROCESS"]),
+        "profile": app.config["NLP_PROFILE"],
+        "section_workers": int(app.config["SECTION_WORKERS"]),
+    }
+
+
+def _pdf_options() -> dict:
+    """Extra keyword arguments for process_pdf from server config."""
+    return {
+        "pdf_backend": app.config["PDF_BACKEND"],
+        "pdf_workers": int(app.config["PDF_WORKERS"]),
+    }
+
+
+def _flag(value) -> bool:
+    """Interpret a JSON / form value such as true, "1" or "yes" as a boolean."""
+    if isinstance(value, str):
+        return value.strip().lower() in ("1", "true", "yes", "on")
+    return bool(value)
+
+
+# Process pool for /api/jobs, created on first use.  Pre-forked server
+# workers all use the one in the job server started by the master.
+_job_manager = None
+
+
+def _job_manager_options() -> dict:
+    return {
+        "max_workers": int(app.config["JOB_WORKERS"]) or None,
+        "max_queued": int(app.config["JOB_QUEUE_SIZE"]),
+        "profile": app.config["NLP_PROFILE"],
+        "corpus_path": app.config["CORPUS_PATH"],
+    }
+
+
+def get_job_manager() -> JobManager:
+    global _job_manager
+    if _job_manager is None:
+        if app.config.get("JOB_SERVER_ADDRESS"):
+            _job_manager = connect_job_server(app.config["JOB_SERVER_ADDRESS"])
+        else:
+            _job_manager = JobManager(**_job_manager_options())
+    return _job_manager
+
+
+# Result cache for /api/extract, created on first use
+_result_cache = None
+
+
+def get_result_cache() -> ResultCache:
+    global _result_cache
+    if _result_cache is None:
+        _result_cache = ResultCache(
+            memory_bytes=int(app.config["RESULT_CACHE_MEMORY_BYTES"]),
+            disk_path=app.config["RESULT_CACHE_PATH"] or None,
+            disk_bytes=int(app.config["RESULT_CACHE_DISK_BYTES"]),
+        )
+    return _result_cache
+
+
+# Corpus graph store, opened on first use (None when not configured)
+_corpus = None
+
+
+def get_corpus():
+    global _corpus
+    if _corpus is None and app.config["CORPUS_PATH"]:
+        _corpus = CorpusStore(app.config["CORPUS_PATH"])
+    return _corpus
+
 # ---------------------------------------------------------------------------
 # Routes
 # ---------------------------------------------------------------------------
@@ -50,7 +196,106 @@ def static_files(path):
 
 @app.route("/api/health", methods=["GET"])
 def health():
-    return jsonify({"status": "ok"})
+    info = {
+        "status": "ok",
+        "profile": app.config["NLP_PROFILE"],
+        "parse_cache": get_parse_cache(app.config["NLP_PROFILE"]).stats(),
+        "incremental_documents": len(get_section_versions(app.config["NLP_PROFILE"])),
+        "pid": os.getpid(),
+    }
+    if _job_manager is not None:
+        info["jobs"] = _job_manager.stats()
+    if _result_cache is not None:
+        info["cache"] = _result_cache.stats()
+    return jsonify(info)
+
+
+def _read_extract_input():
+    """
+    Parse the input of /api/extract and /api/jobs.
+
+    Supported content types:
+      - application/json  → {"text": "...", "long_document": false,
+                             "document_id": "...", "corpus_document": "..."}
+      - multipart/form-data → file upload (txt or pdf) OR text field,
+                              plus optional long_document / document_id /
+                              corpus_document fields
+
+    ``document_id`` (text input only) names a document that the client
+    edits and regenerates; see ``process_text``.  ``corpus_document``
+    names the document in the corpus graph (server started with
+    ``--corpus``), into which its graph is then merged.
+
+    Uploaded files are spooled to a temporary file instead of being read
+    into memory.  Returns ``(kind, payload, options, error)`` where *kind*
+    is "text" (payload: the text), "text_file" or "pdf" (payload: the
+    spooled file's path, which the caller removes); on invalid input
+    only *error* (a Flask response tuple) is set.
+    """
+    raw_text = None
+    file_kind = None
+    file_path = None
+
+    if request.content_type and "application/json" in request.content_type:
+        data = request.get_json(force=True)
+        raw_text = data.get("text", "")
+        long_document = _flag(data.get("long_document", False))
+        document_id = data.get("document_id")
+        corpus_document = data.get("corpus_document")
+    else:
+        long_document = _flag(request.form.get("long_document", False))
+        document_id = request.form.get("document_id")
+        corpus_document = request.form.get("corpus_document")
+        # Multipart form
+        if "file" in request.files:
+            uploaded = request.files["file"]
+            filename = uploaded.filename.lower() if uploaded.filename else ""
+            if filename.endswith(".pdf"):
+                file_kind = "pdf"
+            elif filename.endswith(".txt"):
+                file_kind = "text_file"
+            else:
+                return None, None, None, (jsonify({
+                    "error": "Unsupported file type. Please upload a .txt or .pdf file."
+                }), 400)
+        elif "text" in request.form:
+            raw_text = request.form["text"]
+        else:
+            return None, None, None, (jsonify({
+                "error": "No input provided. Send JSON with 'text' key, "
+                         "or upload a file via 'file' field, "
+                         "or send text via 'text' form field."
+            }), 400)
+
+    options = _pipeline_options()
+    options["long_document"] = long_document
+    if corpus_document:
+        if not app.config["CORPUS_PATH"]:
+            return None, None, None, (jsonify({
+                "error": "corpus_document needs a server started with --corpus."
+            }), 400)
+        if not isinstance(corpus_document, str) or len(corpus_document) > MAX_DOCUMENT_ID_LENGTH:
+            return None, None, None, (jsonify({
+                "error": f"corpus_document must be a string of at most {MAX_DOCUMENT_ID_LENGTH} characters."
+            }), 400)
+        options["corpus_document"] = corpus_document
+    if file_kind:
+        file_path = spool_upload(uploaded.stream, suffix=os.path.splitext(filename)[1])
+        if os.path.getsize(file_path) == 0:
+            remove_quietly(file_path)
+            return None, None, None, (jsonify({"error": "Empty input."}), 400)
+        if file_kind == "pdf":
+            options.update(_pdf_options())
+        return file_kind, file_path, options, None
+    if raw_text:
+        if document_id:
+            if not isinstance(document_id, str) or len(document_id) > MAX_DOCUMENT_ID_LENGTH:
+                return None, None, None, (jsonify({
+                    "error": f"document_id must be a string of at most {MAX_DOCUMENT_ID_LENGTH} characters."
+                }), 400)
+            options["document_id"] = document_id
+        return "text", raw_text, options, None
+    return None, None, None, (jsonify({"error": "Empty input."}), 400)
 
 
 @app.route("/api/extract", methods=["POST"])
@@ -58,53 +303,317 @@ def extract():
     """
     Accept text or file upload and return the concept map.
 
-    Supported content types:
-      - application/json  → {"text": "..."}
-      - multipart/form-data → file upload (txt or pdf) OR text field
+    ``long_document`` lifts the input limits and streams the document
+    through the pipeline section by section; ``document_id`` re-extracts
+    only the sections changed since the previous request with that id;
+    ``corpus_document`` merges the document into the corpus graph.
+    Results are cached by input content, and a cached map is returned
+    even with ``document_id``; incremental and corpus results are not
+    stored.  The ``X-Cache`` header says whether one was reused.
+
+    A client that accepts ``application/x-ndjson`` gets the pipeline's
+    progress and previews of the map as they are produced (see
+    ``_stream_extraction``).
     """
+    kind = payload = None
+    streaming = False
     try:
-        raw_text = None
-        pdf_bytes = None
+        kind, payload, options, error = _read_extract_input()
+        if error:
+            return error
+        stream = _wants_stream()
+
+        corpus_document = options.pop("corpus_document", None)
+        if corpus_document:
+            corpus = get_corpus()
+            options["graph_sink"] = lambda *graph: corpus.add_document(
+                corpus_document, document_record(*graph)
+            )
+
+        # Corpus runs skip the result cache: they need the document's
+        # graph, which a cached map does not have.
+        cache = key = None
+        if not corpus_document:
+            cache = get_result_cache()
+            key = make_cache_key(kind, payload, options, describe_pipeline(options["profile"]))
+            body = cache.get(key)
+            if body is not None:
+                if stream:
+                    return _ndjson_response(iter([_result_line(body)]), "hit")
+                response = app.response_class(body, mimetype="application/json")
+                response.headers["X-Cache"] = "hit"
+                return response
+
+        if "document_id" in options or corpus_document:
+            # Incremental maps are not stored: their clusters are
+            # warm-started from the document's previous version, and their
+            # unchanged sections are reused anyway.
+            if stream:
+                streaming = True
+                return _stream_extraction(kind, payload, options, "bypass")
+            response = app.response_class(
+                json.dumps(_run_extraction(kind, payload, options)), mimetype="application/json"
+            )
+            response.headers["X-Cache"] = "bypass"
+            return response
+
+        if stream:
+            streaming = True
+            return _stream_extraction(kind, payload, options, "miss", cache, key)
+        result = _run_extraction(kind, payload, options)
+        body = cache.put(key, result)
+        response = app.response_class(body, mimetype="application/json")
+        response.headers["X-Cache"] = "miss"
+        return response
 
-        if request.content_type and "application/json" in request.content_type:
-            data = request.get_json(force=True)
-            raw_text = data.get("text", "")
-        else:
-            # Multipart form
-            if "file" in request.files:
-                uploaded = request.files["file"]
-                filename = uploaded.filename.lower() if uploaded.filename else ""
-                if filename.endswith(".pdf"):
-                    pdf_bytes = uploaded.read()
-                elif filename.endswith(".txt"):
-                    raw_text = uploaded.read().decode("utf-8", errors="replace")
-                else:
-                    return jsonify({
-                        "error": "Unsupported file type. Please upload a .txt or .pdf file."
-                    }), 400
-            elif "text" in request.form:
-                raw_text = request.form["text"]
-            else:
-                return jsonify({
-                    "error": "No input provided. Send JSON with 'text' key, "
-                             "or upload a file via 'file' field, "
-                             "or send text via 'text' form field."
-                }), 400
-
-        # Process
-        if pdf_bytes:
-            result = process_pdf(pdf_bytes)
-        elif raw_text:
-            result = process_text(raw_text)
-        else:
-            return jsonify({"error": "Empty input."}), 400
+    except Exception as exc:
+        return jsonify({"error": str(exc)}), 500
+    finally:
+        # A streamed extraction removes its upload when it has finished
+        if kind != "text" and not streaming:
+            remove_quietly(payload)
+
+
+def _run_extraction(kind: str, payload, options: dict) -> dict:
+    """Run the pipeline on input read by ``_read_extract_input``."""
+    if kind == "pdf":
+        return process_pdf(payload, **options)
+    if kind == "text_file":
+        return process_text_file(payload, **options)
+    return process_text(payload, **options)
+
+
+NDJSON = "application/x-ndjson"
+
+
+def _wants_stream() -> bool:
+    """Whether the client listed NDJSON in its Accept header."""
+    return any(mimetype == NDJSON for mimetype, _ in request.accept_mimetypes)
+
+
+def _stream_extraction(kind: str, payload, options: dict, cache_status: str,
+                       cache: ResultCache = None, key: str = None):
+    """
+    Run an extraction in a background thread and stream its events.
+
+    Every line of the response is one JSON object with an "event":
+    "progress" (the pipeline "stage" and its counters), then the
+    previews "headings", "concepts" and "relations" (see
+    ``PartialCallback``), and finally "result" (the full result, also
+    stored in *cache* under *key* if given) or "error".  The upload
+    *payload*, if any, is removed when the run ends.
+    """
+    events = queue.Queue()
+
+    def send(event: str, data: dict):
+        events.put(json.dumps({"event": event, **data}) + "\n")
+
+    options = dict(
+        options,
+        progress=lambda stage, info: send("progress", {"stage": stage, **info}),
+        partial=send,
+    )
+
+    def run():
+        try:
+            result = _run_extraction(kind, payload, options)
+            body = cache.put(key, result) if cache is not None else json.dumps(result)
+            events.put(_result_line(body))
+        except Exception as exc:
+            send("error", {"error": str(exc)})
+        finally:
+            if kind != "text":
+                remove_quietly(payload)
+            events.put(None)
+
+    threading.Thread(target=run, daemon=True).start()
+    return _ndjson_response(iter(events.get, None), cache_status)
+
+
+def _result_line(body: str) -> str:
+    """The "result" event for a serialised result (spliced in, not re-encoded)."""
+    return '{"event": "result", "result": ' + body + "}\n"
 
-        return jsonify(result)
 
+def _ndjson_response(lines, cache_status: str):
+    response = app.response_class(lines, mimetype=NDJSON)
+    response.headers["X-Cache"] = cache_status
+    # Ask proxies to pass every line on as soon as it is written
+    response.headers["Cache-Control"] = "no-cache"
+    response.headers["X-Accel-Buffering"] = "no"
+    return response
+
+
+@app.route("/api/jobs", methods=["POST"])
+def submit_job():
+    """
+    Queue an extraction and return its job id (202).
+
+    Accepts the same input as /api/extract.  Answers 429 when the job
+    queue is full.
+    """
+    try:
+        kind, payload, options, error = _read_extract_input()
+        if error:
+            return error
+
+        temp_path = payload if kind != "text" else None
+        job_id = get_job_manager().submit(kind, payload, options, temp_path=temp_path)
+        return jsonify({
+            "job_id": job_id,
+            "status": "queued",
+            "status_url": f"/api/jobs/{job_id}",
+            "result_url": f"/api/jobs/{job_id}/result",
+        }), 202
+
+    except QueueFullError as exc:
+        response = jsonify({"error": str(exc)})
+        response.headers["Retry-After"] = "5"
+        return response, 429
     except Exception as exc:
         return jsonify({"error": str(exc)}), 500
 
 
+@app.route("/api/jobs/<job_id>", methods=["GET"])
+def job_status(job_id):
+    """Return a job's status and per-stage progress."""
+    status = get_job_manager().status(job_id)
+    if status is None:
+        return jsonify({"error": "Unknown job id."}), 404
+    return jsonify(status)
+
+
+@app.route("/api/jobs/<job_id>/result", methods=["GET"])
+def job_result(job_id):
+    """Return the concept map of a finished job (202 while it is running)."""
+    manager = get_job_manager()
+    status = manager.status(job_id)
+    if status is None:
+        return jsonify({"error": "Unknown job id."}), 404
+    if status["status"] == "failed":
+        return jsonify({"error": status["error"]}), 500
+    if status["status"] != "done":
+        return jsonify({"status": status["status"], "stage": status["stage"]}), 202
+    return jsonify(manager.result(job_id))
+
+
+# ---------------------------------------------------------------------------
+# Corpus graph queries
+# ---------------------------------------------------------------------------
+
+class _BadQuery(ValueError):
+    """Invalid query-string parameter (answered with 400)."""
+
+
+def _int_arg(name: str, default: int, low: int, high: int) -> int:
+    """Integer query parameter *name*, which must lie in [low, high]."""
+    value = request.args.get(name)
+    if value is None:
+        return default
+    try:
+        number = int(value)
+    except ValueError:
+        raise _BadQuery(f"{name} must be an integer.")
+    if not low <= number <= high:
+        raise _BadQuery(f"{name} must be between {low} and {high}.")
+    return number
+
+
+def _corpus_route(view):
+    """
+    Run a corpus query view with the store as its first argument: 404
+    without a corpus or for an unknown concept (the view returns None),
+    400 for a bad parameter.
+    """
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        corpus = get_corpus()
+        if corpus is None:
+            return jsonify({"error": "No corpus graph configured (start with --corpus)."}), 404
+        try:
+            result = view(corpus, *args, **kwargs)
+        except _BadQuery as exc:
+            return jsonify({"error": str(exc)}), 400
+        if result is None:
+            return jsonify({"error": "Unknown concept."}), 404
+        return jsonify(result)
+    return wrapper
+
+
+@app.route("/api/corpus", methods=["GET"])
+@_corpus_route
+def corpus_stats(corpus):
+    """Document, concept, edge and text counts of the corpus graph."""
+    return corpus.stats()
+
+
+@app.route("/api/corpus/refresh", methods=["POST"])
+@_corpus_route
+def corpus_refresh(corpus):
+    """Re-rank and re-cluster the corpus graph after documents were merged."""
+    return corpus.refresh()
+
+
+@app.route("/api/corpus/map", methods=["GET"])
+@_corpus_route
+def corpus_map(corpus):
+    """Top-ranked corpus concepts (?max_concepts=) as a concept map."""
+    return corpus.concept_map(_int_arg("max_concepts", MAX_CONCEPTS, 1, 10 * MAX_CONCEPTS))
+
+
+@app.route("/api/corpus/concepts/<path:name>", methods=["GET"])
+@_corpus_route
+def corpus_concept(corpus, name):
+    """One concept with its frequency, score, cluster, descriptions and formulas."""
+    return corpus.concept(name)
+
+
+@app.route("/api/corpus/concepts/<path:name>/neighbors", methods=["GET"])
+@_corpus_route
+def corpus_neighbors(corpus, name):
+    """Edges around a concept (?relation=, ?direction=out|in|both, ?limit=)."""
+    direction = request.args.get("direction", "both")
+    if direction not in ("out", "in", "both"):
+        raise _BadQuery("direction must be 'out', 'in' or 'both'.")
+    return corpus.neighbors(
+        name,
+        relation=request.args.get("relation"),
+        direction=direction,
+        limit=_int_arg("limit", CORPUS_QUERY_LIMIT, 1, 10 * CORPUS_QUERY_LIMIT),
+    )
+
+
+@app.route("/api/corpus/concepts/<path:name>/documents", methods=["GET"])
+@_corpus_route
+def corpus_concept_documents(corpus, name):
+    """Documents mentioning a concept, most mentions first (?limit=)."""
+    return corpus.concept_documents(
+        name, limit=_int_arg("limit", CORPUS_QUERY_LIMIT, 1, 10 * CORPUS_QUERY_LIMIT),
+    )
+
+
+@app.route("/api/corpus/concepts/<path:name>/subgraph", methods=["GET"])
+@_corpus_route
+def corpus_subgraph(corpus, name):
+    """Concepts within ?hops= edges of a concept (at most ?max_nodes=)."""
+    return corpus.subgraph(
+        name,
+        hops=_int_arg("hops", 1, 1, CORPUS_MAX_HOPS),
+        max_nodes=_int_arg("max_nodes", MAX_CONCEPTS, 1, 10 * MAX_CONCEPTS),
+    )
+
+
+@app.route("/api/corpus/relations/<relation>", methods=["GET"])
+@_corpus_route
+def corpus_relations(corpus, relation):
+    """Corpus edges of one relation type, most supported first (?limit=, ?offset=)."""
+    return corpus.relations(
+        relation,
+        limit=_int_arg("limit", CORPUS_QUERY_LIMIT, 1, 10 * CORPUS_QUERY_LIMIT),
+        offset=_int_arg("offset", 0, 0, 2 ** 31),
+    )
+
+
 # ---------------------------------------------------------------------------
 # Save output helper
 # ---------------------------------------------------------------------------
@@ -121,6 +630,48 @@ def save_output(result: dict, output_path: str):
 # CLI mode
 # ---------------------------------------------------------------------------
 
+def _print_progress(stage: str, info: dict):
+    """Progress callback for the CLI: one line per pipeline step."""
+    details = ", ".join(f"{k}={v}" for k, v in info.items())
+    print(f"[{stage}] {details}" if details else f"[{stage}]", file=sys.stderr)
+
+
+def _print_corpus(corpus: CorpusStore, refresh: dict):
+    """Summary of a corpus store after ranking and clustering it."""
+    stats = corpus.stats()
+    clustering = refresh["clustering"]
+    print(f"\n--- CS-CME Corpus ({corpus.path}) ---")
+    print(f"Documents:           {stats['documents']}")
+    print(f"Concepts:            {stats['concepts']}")
+    print(f"Edges:               {stats['edges']}")
+    print(f"Descriptions:        {stats['descriptions']} ({stats['formulas']} formulas)")
+    print(f"Communities:         {stats['communities']} "
+          f"(modularity {clustering['modularity']:.3f})")
+    print(f"Ranked in:           {refresh['seconds']:.2f} s")
+
+
+def _serve_prefork(args):
+    """
+    Serve with pre-forked workers (see ``serving``) that share the model
+    loaded here, and one job server for /api/jobs.
+    """
+    def preload():
+        print(f"Loading NLP model (profile: {args.profile})...")
+        get_nlp(args.profile)
+        print("NLP model loaded.")
+
+    # Started before the model is loaded; its process is spawned, not forked
+    job_server = start_job_server(**_job_manager_options())
+    app.config["JOB_SERVER_ADDRESS"] = job_server.address
+    try:
+        serve_prefork(
+            app, "0.0.0.0", args.port,
+            workers=args.workers, max_requests=args.max_requests, preload=preload,
+        )
+    finally:
+        stop_job_server(job_server)
+
+
 def main():
     """Run as CLI or start web server."""
     import argparse
@@ -136,6 +687,15 @@ def main():
         "--port", type=int, default=5000,
         help="Port for the web server"
     )
+    parser.add_argument(
+        "--workers", type=int, default=None,
+        help="Serve with N pre-forked worker processes sharing one loaded model "
+             "(0 = one per CPU core) instead of Flask's development server"
+    )
+    parser.add_argument(
+        "--max-requests", type=int, default=SERVE_MAX_REQUESTS,
+        help="Requests a pre-forked worker serves before it is replaced (0 = never)"
+    )
     parser.add_argument(
         "--input", "-i", type=str,
         help="Path to input file (txt or pdf)"
@@ -144,36 +704,161 @@ def main():
         "--text", "-t", type=str,
         help="Direct text input"
     )
+    parser.add_argument(
+        "--input-dir", type=str,
+        help="Batch mode: process every .txt / .pdf file under this directory"
+    )
+    parser.add_argument(
+        "--manifest", type=str,
+        help="Batch mode: file listing one document per line (a path, or "
+             "a JSON object with \"path\" and \"id\")"
+    )
     parser.add_argument(
         "--output", "-o", type=str,
-        default=os.path.join(os.path.dirname(__file__), "..", "outputs", "output.json"),
-        help="Path to save the output JSON"
+        help="Path to save the output JSON (batch mode: the JSONL file, "
+             "default outputs/batch.jsonl)"
+    )
+    parser.add_argument(
+        "--batch-workers", type=int, default=BATCH_WORKERS,
+        help="Batch mode: worker processes (0 = one per CPU core)"
+    )
+    parser.add_argument(
+        "--no-resume", action="store_true",
+        help="Batch mode: overwrite the output instead of skipping ids already in it"
+    )
+    parser.add_argument(
+        "--corpus", type=str,
+        help="SQLite corpus graph to merge each processed document into; "
+             "without an input, export its top concepts to --output"
+    )
+    parser.add_argument(
+        "--batch-size", type=int, default=app.config["NLP_BATCH_SIZE"],
+        help="Number of texts per spaCy nlp.pipe batch"
+    )
+    parser.add_argument(
+        "--n-process", type=int, default=app.config["NLP_N_PROCESS"],
+        help="Number of processes spaCy uses for parsing (-1 = all cores)"
+    )
+    parser.add_argument(
+        "--section-workers", type=int, default=app.config["SECTION_WORKERS"],
+        help="Processes extracting top-level sections in parallel (0 = off, -1 = all cores)"
+    )
+    parser.add_argument(
+        "--pdf-backend", choices=["auto", "pymupdf", "pypdfium2", "pypdf2"],
+        default=app.config["PDF_BACKEND"],
+        help="PDF text extractor ('auto' prefers PyMuPDF, then pypdfium2, then PyPDF2)"
+    )
+    parser.add_argument(
+        "--pdf-workers", type=int, default=app.config["PDF_WORKERS"],
+        help="Processes extracting pages of large PDFs (0 = in-process, -1 = all cores)"
+    )
+    parser.add_argument(
+        "--job-workers", type=int, default=app.config["JOB_WORKERS"],
+        help="Worker processes for /api/jobs (0 = one per CPU core)"
+    )
+    parser.add_argument(
+        "--job-queue-size", type=int, default=app.config["JOB_QUEUE_SIZE"],
+        help="Jobs allowed to wait for a worker before /api/jobs answers 429"
+    )
+    parser.add_argument(
+        "--cache-path", type=str, default=app.config["RESULT_CACHE_PATH"],
+        help="SQLite file for the on-disk result cache (default: memory only)"
+    )
+    parser.add_argument(
+        "--long", action="store_true",
+        help="Long-document mode: no input limits, stream section by section"
+    )
+    parser.add_argument(
+        "--profile", choices=sorted(PIPELINE_PROFILES), default=app.config["NLP_PROFILE"],
+        help="spaCy pipeline profile ('fast' drops NER and segments with senter)"
     )
 
     args = parser.parse_args()
+    app.config.update(
+        NLP_BATCH_SIZE=args.batch_size,
+        NLP_N_PROCESS=args.n_process,
+        NLP_PROFILE=args.profile,
+        SECTION_WORKERS=args.section_workers,
+        PDF_BACKEND=args.pdf_backend,
+        PDF_WORKERS=args.pdf_workers,
+        JOB_WORKERS=args.job_workers,
+        JOB_QUEUE_SIZE=args.job_queue_size,
+        RESULT_CACHE_PATH=args.cache_path,
+    )
+    if args.corpus:
+        app.config["CORPUS_PATH"] = args.corpus
+    options = _pipeline_options()
 
     if args.serve:
+        if args.workers is not None and not can_prefork():
+            print("--workers needs os.fork(); using the development server.")
+        elif args.workers is not None:
+            _serve_prefork(args)
+            return
         print(f"Starting CS-CME web server on http://localhost:{args.port}")
-        print("Loading NLP model...")
-        get_nlp()  # Pre-load
+        print(f"Loading NLP model (profile: {args.profile})...")
+        get_nlp(args.profile)  # Pre-load
         print("NLP model loaded. Server ready.")
         app.run(host="0.0.0.0", port=args.port, debug=False)
         return
 
     # CLI processing
+    options["long_document"] = args.long
+    outputs_dir = os.path.join(os.path.dirname(__file__), "..", "outputs")
+
+    corpus = CorpusStore(args.corpus) if args.corpus else None
+
+    if args.input_dir or args.manifest:
+        if args.input_dir:
+            documents = iter_input_dir(args.input_dir)
+        else:
+            documents = iter_manifest(args.manifest)
+        output = args.output or os.path.join(outputs_dir, "batch.jsonl")
+        summary = run_batch(
+            documents, output, workers=args.batch_workers, resume=not args.no_resume,
+            options=options, pdf_options=_pdf_options(), progress=_print_progress,
+            corpus=corpus,
+        )
+        print(f"\n--- CS-CME Batch ---")
+        print(f"Documents processed: {summary['processed']} "
+              f"({summary['failed']} failed, {summary['skipped']} already done)")
+        print(f"Sentences processed: {summary['sentences']}")
+        print(f"Time:                {summary['seconds']:.1f} s "
+              f"with {summary['workers']} worker(s)")
+        print(f"Throughput:          {summary['docs_per_second']:.2f} docs/s, "
+              f"{summary['sentences_per_second']:.1f} sentences/s")
+        print(f"Output written to {output}")
+        if corpus is not None:
+            _print_corpus(corpus, corpus.refresh())
+        return
+
+    if args.long:
+        options["progress"] = _print_progress
+    if corpus is not None:
+        name = args.input or "text"
+        options["graph_sink"] = lambda *graph: corpus.add_document(name, document_record(*graph))
+
     if args.input:
         filepath = args.input
         if filepath.lower().endswith(".pdf"):
-            with open(filepath, "rb") as f:
-                result = process_pdf(f.read())
+            result = process_pdf(filepath, **options, **_pdf_options())
         else:
-            with open(filepath, "r", encoding="utf-8") as f:
-                result = process_text(f.read())
+            result = process_text_file(filepath, **options)
     elif args.text:
-        result = process_text(args.text)
+        result = process_text(args.text, **options)
+    elif corpus is not None:
+        refresh = corpus.refresh() if corpus.stats()["stale"] else None
+        if refresh is not None:
+            _print_corpus(corpus, refresh)
+        save_output(
+            {"concept_map": corpus.concept_map(), "corpus": corpus.stats()},
+            args.output or os.path.join(outputs_dir, "corpus.json"),
+        )
+        return
     else:
         print("No input provided. Use --serve to start the web server,")
-        print("or provide --input <file> or --text '<text>'.")
+        print("or provide --input <file> or --text '<text>' (or --input-dir /")
+        print("--manifest for a batch run).")
         print()
         parser.print_help()
         return
@@ -187,6 +872,11 @@ def main():
     print(f"Nodes in map:        {stats.get('concepts_in_map', 0)}")
     print(f"Edges in map:        {stats.get('edges_in_map', 0)}")
     print(f"Communities:         {stats.get('communities_detected', 0)}")
+    pipeline = result.get("pipeline", {})
+    if pipeline:
+        print(f"Pipeline:            {pipeline['profile']} "
+              f"({pipeline['model']} {pipeline['model_version']}: "
+              f"{', '.join(pipeline['components'])})")
 
     warnings = result.get("warnings", [])
     if warnings:
@@ -194,8 +884,11 @@ def main():
         for w in warnings:
             print(f"  - {w}")
 
+    if corpus is not None:
+        _print_corpus(corpus, corpus.refresh())
+
     # Save
-    save_output(result, args.output)
+    save_output(result, args.output or os.path.join(outputs_dir, "output.json"))
 
 
 if __name__ == "__main__":
@@ -13,111 +13,705 @@ Pipeline:
     → JSON output
 """
 
-from typing import Dict, List, Optional, Tuple
+import hashlib
+import heapq
+import itertools
+import multiprocessing
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Callable, Collection, Dict, Iterable, Iterator, List, Optional, Tuple, Union
 
 import spacy
 
-from preprocessor import preprocess, extract_text_from_pdf
-from heading_segmenter import segment_by_headings, get_heading_edges, HeadingNode
-from concept_extractor import extract_concepts
+from preprocessor import preprocess, clean_text, iter_clean_lines
+from pdf_ingest import PdfDocument, PdfBackendError
+from uploads import iter_file_text, read_file_text
+from heading_segmenter import (
+    segment_by_headings,
+    iter_sections,
+    get_heading_edges,
+    HeadingNode,
+)
+from concept_extractor import extract_concepts, ConceptAccumulator
 from meaning_analyzer import MeaningAnalyzer
-from formula_extractor import extract_formulas
+from parse_cache import ParseCache
+from formula_extractor import assign_formulas, extract_formulas
 from graph_builder import (
+    ConceptGraph,
     build_graph,
     rank_concepts,
     prune_graph,
-    detect_communities,
+    cluster_graph,
     connect_to_root,
     graph_to_json,
     filter_low_value_nodes,
+    undirected_view,
+)
+from utils import (
+    MAX_CONCEPTS,
+    MAX_PDF_PAGES,
+    LONG_DOC_SECTION_SENTENCES,
+    LONG_DOC_MAX_DESCRIPTIONS,
+    NLP_BATCH_SIZE,
+    NLP_N_PROCESS,
+    SPACY_MODEL,
+    DEFAULT_PROFILE,
+    PIPELINE_PROFILES,
+    PARSE_CACHE_SIZE,
+    SECTION_WORKERS,
+    INCREMENTAL_DOCUMENTS,
+    PDF_BACKEND,
+    PDF_WORKERS,
+    STREAM_MAX_RELATIONS,
+    STREAM_INTERVAL,
 )
-from utils import MAX_CONCEPTS
 
 
-def _load_nlp():
-    """Load the spaCy English model."""
+def _get_profile(profile: str) -> Dict:
+    if profile not in PIPELINE_PROFILES:
+        raise ValueError(
+            f"Unknown pipeline profile '{profile}'. "
+            f"Choose one of: {', '.join(sorted(PIPELINE_PROFILES))}."
+        )
+    return PIPELINE_PROFILES[profile]
+
+
+def _load_model(**kwargs):
+    """Load the spaCy English model, downloading it on first use."""
     try:
-        nlp = spacy.load("en_core_web_sm")
+        return spacy.load(SPACY_MODEL, **kwargs)
     except OSError:
         from spacy.cli import download
-        download("en_core_web_sm")
-        nlp = spacy.load("en_core_web_sm")
+        download(SPACY_MODEL)
+        return spacy.load(SPACY_MODEL, **kwargs)
+
+
+def _load_nlp(profile: str = DEFAULT_PROFILE):
+    """Load the spaCy English model with the components of *profile*."""
+    config = _get_profile(profile)
+    nlp = _load_model(exclude=config["exclude"])
+
+    missing = [c for c in config["requires"] if c not in nlp.pipe_names]
+    if missing:
+        raise ValueError(
+            f"spaCy model '{SPACY_MODEL}' lacks components required by "
+            f"profile '{profile}': {', '.join(missing)}"
+        )
     # Increase max length for longer documents
     nlp.max_length = 2_000_000
     return nlp
 
 
-# Module-level lazy loader
-_nlp_instance = None
+def _load_segmenter(profile: str = DEFAULT_PROFILE):
+    """
+    Load a sentence-boundary-only pipeline for *profile*.
+
+    For the "senter" segmenter every other component is removed (the
+    shared tok2vec is kept only if senter listens to it).  Models without
+    a senter fall back to the profile's full parser pipeline.
+    """
+    if _get_profile(profile)["segmenter"] != "senter":
+        return get_nlp(profile)
+
+    nlp = _load_model()
+    if "senter" not in nlp.component_names:
+        return get_nlp(profile)
+
+    keep = {"senter"}
+    if "tok2vec" in nlp.component_names:
+        if "senter" in nlp.get_pipe("tok2vec").listening_components:
+            keep.add("tok2vec")
+    for name in list(nlp.component_names):
+        if name not in keep:
+            nlp.remove_pipe(name)
+    nlp.enable_pipe("senter")
+    nlp.max_length = 2_000_000
+    return nlp
+
+
+# Module-level lazy loaders, one pipeline (and parse cache) per profile
+_nlp_instances: Dict = {}
+_segmenter_instances: Dict = {}
+_parse_caches: Dict = {}
 
 
-def get_nlp():
-    global _nlp_instance
-    if _nlp_instance is None:
-        _nlp_instance = _load_nlp()
-    return _nlp_instance
+def get_nlp(profile: str = DEFAULT_PROFILE):
+    if profile not in _nlp_instances:
+        _nlp_instances[profile] = _load_nlp(profile)
+    return _nlp_instances[profile]
+
+
+def get_segmenter(profile: str = DEFAULT_PROFILE):
+    """Pipeline for steps that only need sentence boundaries."""
+    if profile not in _segmenter_instances:
+        _segmenter_instances[profile] = _load_segmenter(profile)
+    return _segmenter_instances[profile]
+
+
+def get_parse_cache(profile: str = DEFAULT_PROFILE) -> ParseCache:
+    """Sentence parse artifacts shared by every document using *profile*."""
+    if profile not in _parse_caches:
+        _parse_caches[profile] = ParseCache(PARSE_CACHE_SIZE)
+    return _parse_caches[profile]
+
+
+def describe_pipeline(profile: str = DEFAULT_PROFILE) -> Dict:
+    """Record the model, version and components used for *profile*."""
+    nlp = get_nlp(profile)
+    return {
+        "profile": profile,
+        "model": SPACY_MODEL,
+        "model_version": nlp.meta.get("version", ""),
+        "spacy_version": spacy.__version__,
+        "components": list(nlp.pipe_names),
+        "segmenter": _get_profile(profile)["segmenter"],
+    }
 
 
 # ---------------------------------------------------------------------------
-# Public API
+# Progress reporting
 # ---------------------------------------------------------------------------
 
-def process_text(raw_text: str) -> Dict:
+# progress(stage, info) is called as the pipeline advances, e.g.
+# progress("sections", {"sections": 3, "sentences": 120, ...}).
+ProgressCallback = Callable[[str, Dict], None]
+
+# graph_sink(graph, document_title, headings) receives the full graph of
+# a document before it is filtered and pruned (e.g. to merge it into a
+# corpus); it must not keep *graph*, which is modified afterwards.
+GraphSink = Callable[[ConceptGraph, str, List[str]], None]
+
+
+# partial(kind, data) receives previews of the concept map while it is
+# being built: "headings", then "concepts", then "relations" (see
+# _Preview).  They are superseded by the final map.
+PartialCallback = Callable[[str, Dict], None]
+
+
+def _report(progress: Optional[ProgressCallback], stage: str, **info):
+    if progress is not None:
+        progress(stage, info)
+
+
+class _Preview:
     """
-    Run the full CS-CME pipeline on raw text.
+    Previews of the concept map for a ``PartialCallback``.
 
-    Returns
-    -------
-    dict with keys:
-        concept_map : dict   – the final JSON (nodes + edges)
-        warnings    : list[str]
-        stats       : dict   – summary statistics
+    "headings" carries the heading titles found so far and the heading
+    tree's edges; "concepts" the ``MAX_CONCEPTS`` most frequent concepts
+    (id, frequency) and the total count; "relations" up to
+    ``STREAM_MAX_RELATIONS`` relations between the headings and the
+    concepts sent, and the total count.  Every call is a no-op without a
+    callback.
     """
-    nlp = get_nlp()
 
-    # 1. Preprocess
-    prep = preprocess(raw_text, nlp)
-    cleaned_text = prep["cleaned_text"]
-    warnings = list(prep["warnings"])
+    def __init__(
+        self,
+        partial: Optional[PartialCallback],
+        root_node: HeadingNode,
+        flat_headings: List[str],
+    ):
+        self.partial = partial
+        self.root_node = root_node
+        self.flat_headings = flat_headings   # filled in as sections stream
+        self._headings_sent = -1
+        self._shown: set = set()
+        self._next_update = 0.0
 
-    # NEW: extract formulas from the entire document
-    document_formulas = extract_formulas(cleaned_text)
+    def headings(self):
+        """Send the heading tree, if it grew since it was last sent."""
+        if self.partial is None or len(self.flat_headings) == self._headings_sent:
+            return
+        self._headings_sent = len(self.flat_headings)
+        self.partial("headings", {
+            "headings": list(self.flat_headings),
+            "edges": get_heading_edges(self.root_node),
+        })
 
-    # 2. Heading segmentation (separates headings from body sentences)
-    root_node, flat_headings = segment_by_headings(cleaned_text)
-    heading_edges = get_heading_edges(root_node)
+    def concepts(self, frequency: Dict[str, int]):
+        if self.partial is None:
+            return
+        top = heapq.nlargest(MAX_CONCEPTS, frequency.items(), key=lambda item: item[1])
+        self._shown = {concept for concept, _ in top}
+        self._shown.update(self.flat_headings)
+        self.partial("concepts", {
+            "concepts": [{"id": concept, "frequency": count} for concept, count in top],
+            "total": len(frequency),
+        })
 
-    # Collect only non-heading sentences from the heading tree
-    # This prevents heading text from being merged into adjacent sentences
-    def _collect_sentences(node: HeadingNode) -> list:
-        sents = []
-        for s in node.sentences:
-            sents.append(s)
-        for child in node.children:
-            sents.extend(_collect_sentences(child))
-        return sents
+    def relations(self, relations: Collection[Dict]):
+        if self.partial is None:
+            return
+        shown = self._shown
+        edges: Dict[Tuple[str, str], Dict] = {}
+        for rel in relations:
+            key = (rel["source"], rel["target"])
+            if key[0] in shown and key[1] in shown and key[0] != key[1]:
+                if key not in edges and len(edges) >= STREAM_MAX_RELATIONS:
+                    continue
+                edges[key] = {
+                    "source": key[0],
+                    "target": key[1],
+                    "relation": rel["relation"],
+                    "negated": rel.get("negated", False),
+                }
+        self.partial("relations", {"relations": list(edges.values()), "total": len(relations)})
 
-    raw_body_sentences = _collect_sentences(root_node)
+    def update(self, frequency: Dict[str, int], relations: Optional[Collection[Dict]] = None):
+        """
+        Preview running counts (raw phrase counts, before the final
+        concept clean-up) and relations, at most every ``STREAM_INTERVAL``
+        seconds.
+        """
+        if self.partial is None:
+            return
+        now = time.perf_counter()
+        if now < self._next_update:
+            return
+        self._next_update = now + STREAM_INTERVAL
+        self.headings()
+        self.concepts(frequency)
+        if relations is not None:
+            self.relations(relations)
 
-    # Re-segment each line through spaCy for proper sentence boundaries
-    sentences = []
-    for line in raw_body_sentences:
-        doc = nlp(line)
-        for sent in doc.sents:
-            s = sent.text.strip()
-            if s:
-                sentences.append(s)
-
-    if not sentences:
-        return {
-            "concept_map": {"nodes": [], "edges": []},
-            "warnings": warnings + ["No sentences found in input."],
-            "stats": {},
-        }
 
-    # 3. Concept extraction
-    concepts, frequency = extract_concepts(sentences, nlp)
+# ---------------------------------------------------------------------------
+# Per-section aggregation (long-document mode)
+# ---------------------------------------------------------------------------
+
+class ExtractionAggregate:
+    """
+    Running totals of extraction results, fed one section at a time.
+
+    Relations are keyed by (source, target) the same way ``build_graph``
+    stores edges: the first occurrence fixes the order and later ones
+    overwrite the attributes.  Descriptions and formulas are de-duplicated
+    as they arrive and descriptions are capped per concept, so memory
+    grows with the number of distinct concepts, not with document length.
+    ``last_subject`` is the pronoun-resolution subject the part ends with.
+    """
+
+    def __init__(self, max_descriptions: Optional[int] = None):
+        self.max_descriptions = max_descriptions
+        self.concepts = ConceptAccumulator()
+        self.relations: Dict[Tuple[str, str], Dict] = {}
+        self.descriptions: Dict[str, Dict[str, None]] = {}
+        self.formulas: Dict[str, Dict[str, None]] = {}
+        self.document_formulas: Dict[str, None] = {}
+        self.sentence_count = 0
+        self.relation_count = 0
+        self.last_subject: Optional[str] = None
+
+    def add_relations(self, relations: List[Dict]):
+        for rel in relations:
+            self.relations[(rel["source"], rel["target"])] = rel
+        self.relation_count += len(relations)
+
+    def add_descriptions(self, descriptions: Dict[str, List[str]]):
+        for concept, sents in descriptions.items():
+            kept = self.descriptions.setdefault(concept, {})
+            for sent in sents:
+                if self.max_descriptions is not None and len(kept) >= self.max_descriptions:
+                    break
+                kept.setdefault(sent, None)
+
+    def add_formulas(self, formulas: Dict[str, List[str]]):
+        for concept, found in formulas.items():
+            kept = self.formulas.setdefault(concept, {})
+            for f in found:
+                kept.setdefault(f, None)
+
+    def add_document_formulas(self, formulas: List[str]):
+        for f in formulas:
+            self.document_formulas.setdefault(f, None)
+
+    def merge(self, other: "ExtractionAggregate"):
+        """Append the results of a later part of the document."""
+        self.concepts.merge(other.concepts)
+        self.relations.update(other.relations)
+        self.add_descriptions({c: list(d) for c, d in other.descriptions.items()})
+        self.add_formulas({c: list(f) for c, f in other.formulas.items()})
+        self.add_document_formulas(list(other.document_formulas))
+        self.sentence_count += other.sentence_count
+        self.relation_count += other.relation_count
+        self.last_subject = other.last_subject
+
+    def relation_list(self) -> List[Dict]:
+        return list(self.relations.values())
+
+    def description_lists(self) -> Dict[str, List[str]]:
+        return {c: list(d) for c, d in self.descriptions.items()}
+
+    def formula_lists(self) -> Dict[str, List[str]]:
+        return {c: list(f) for c, f in self.formulas.items()}
+
+
+# ---------------------------------------------------------------------------
+# Incremental re-extraction
+# ---------------------------------------------------------------------------
+
+class SectionVersions:
+    """
+    Per-section extraction results of the latest version of recent documents.
+
+    Documents are identified by an id chosen by the client.  Each entry
+    maps a section key (see ``_section_key``) to that section's
+    ``ExtractionAggregate``; storing a new version replaces the old one.
+    The cluster ids of the document's last map are kept alongside, to
+    seed the next clustering.  At most *max_documents* documents are
+    kept, least recently used first out (0 = off).
+    """
+
+    def __init__(self, max_documents: int = INCREMENTAL_DOCUMENTS):
+        self.max_documents = max_documents
+        self._documents: "OrderedDict[str, Dict[str, ExtractionAggregate]]" = OrderedDict()
+        self._clusters: Dict[str, Dict[str, int]] = {}
+        self._lock = threading.Lock()
+
+    def previous(self, document_id: str) -> Dict[str, ExtractionAggregate]:
+        """Section results of the last stored version ({} if none)."""
+        with self._lock:
+            sections = self._documents.get(document_id)
+            if sections is None:
+                return {}
+            self._documents.move_to_end(document_id)
+            return sections
+
+    def store(self, document_id: str, sections: Dict[str, ExtractionAggregate]):
+        if self.max_documents <= 0:
+            return
+        with self._lock:
+            self._documents[document_id] = sections
+            self._documents.move_to_end(document_id)
+            while len(self._documents) > self.max_documents:
+                evicted, _ = self._documents.popitem(last=False)
+                self._clusters.pop(evicted, None)
+
+    def clusters(self, document_id: str) -> Optional[Dict[str, int]]:
+        """Concept -> cluster id of the document's last map (None if unknown)."""
+        with self._lock:
+            return self._clusters.get(document_id)
+
+    def store_clusters(self, document_id: str, concept_map: Dict):
+        with self._lock:
+            if document_id in self._documents:
+                self._clusters[document_id] = {
+                    node["id"]: node["cluster"] for node in concept_map["nodes"]
+                }
+
+    def __len__(self) -> int:
+        return len(self._documents)
+
+
+_section_versions: Dict[str, SectionVersions] = {}
+
+
+def get_section_versions(profile: str = DEFAULT_PROFILE) -> SectionVersions:
+    """Latest per-section results of recent documents processed with *profile*."""
+    if profile not in _section_versions:
+        _section_versions[profile] = SectionVersions(INCREMENTAL_DOCUMENTS)
+    return _section_versions[profile]
+
+
+def _section_key(
+    lines: List[str],
+    max_descriptions: Optional[int],
+    slice_size: Optional[int],
+    with_document_formulas: bool,
+    subject: Optional[str] = None,
+) -> str:
+    """
+    Hash of a section's lines and what its extraction depends on: the
+    settings and the pronoun-resolution subject it starts from.
+    """
+    digest = hashlib.sha256(
+        f"{max_descriptions}|{slice_size}|{with_document_formulas}\0".encode("utf-8")
+    )
+    if subject is not None:
+        digest.update(subject.encode("utf-8", "surrogatepass"))
+    digest.update(b"\0")
+    for line in lines:
+        digest.update(line.encode("utf-8", "surrogatepass"))
+        digest.update(b"\n")
+    return digest.hexdigest()
+
+
+# ---------------------------------------------------------------------------
+# Per-section extraction (parallel / incremental)
+# ---------------------------------------------------------------------------
+
+def _section_worker_count(section_workers: int) -> int:
+    if section_workers < 0:
+        return os.cpu_count() or 1
+    return section_workers
+
+
+def _init_section_worker(profile: str):
+    get_nlp(profile)
+
+
+def _extract_section(
+    lines: List[str],
+    batch_size: int,
+    profile: str,
+    max_descriptions: Optional[int],
+    slice_size: Optional[int],
+    with_document_formulas: bool,
+    subject: Optional[str] = None,
+) -> ExtractionAggregate:
+    """
+    Concept extraction and meaning analysis for one section.
+
+    Uses a fresh ``MeaningAnalyzer`` (and so its own ``ContextTracker``),
+    whose pronouns resolve to *subject* until the section names another.
+    Lines are parsed *slice_size* at a time so a long section never
+    holds all of its Docs at once.
+    """
+    nlp = get_nlp(profile)
+    analyzer = MeaningAnalyzer(nlp, batch_size, 1, cache=get_parse_cache(profile))
+    analyzer.context.last_subject = subject
+    aggregate = ExtractionAggregate(max_descriptions=max_descriptions)
+
+    step = slice_size or len(lines) or 1
+    for start in range(0, len(lines), step):
+        part = lines[start:start + step]
+        sentence_parses = analyzer.parse_lines(part)
+        for parse in sentence_parses:
+            aggregate.concepts.add_doc(parse)
+        relations, descriptions, formulas = analyzer.analyze_sentences(sentence_parses)
+        aggregate.add_relations(relations)
+        aggregate.add_descriptions(descriptions)
+        aggregate.add_formulas(formulas)
+        if with_document_formulas:
+            aggregate.add_document_formulas(extract_formulas("\n".join(part)))
+        aggregate.sentence_count += len(sentence_parses)
+    aggregate.last_subject = analyzer.context.last_subject
+    return aggregate
+
+
+# One pool per (workers, profile); workers keep their model and parse cache
+_section_pools: Dict[Tuple[int, str], ProcessPoolExecutor] = {}
+# Concurrent requests of the threaded server must not create two pools
+_section_pools_lock = threading.Lock()
+
+
+def _get_section_pool(workers: int, profile: str) -> ProcessPoolExecutor:
+    key = (workers, profile)
+    with _section_pools_lock:
+        if key not in _section_pools:
+            # "spawn" so a pool is never forked from a multi-threaded server
+            _section_pools[key] = ProcessPoolExecutor(
+                max_workers=workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_section_worker,
+                initargs=(profile,),
+            )
+        return _section_pools[key]
+
+
+def _replace_section_pool(workers: int, profile: str, broken: ProcessPoolExecutor) -> ProcessPoolExecutor:
+    """
+    Drop *broken* (a pool one of whose workers died) and return the pool
+    to use instead, created unless another request already did.
+    """
+    with _section_pools_lock:
+        if _section_pools.get((workers, profile)) is broken:
+            del _section_pools[(workers, profile)]
+    broken.shutdown(wait=False, cancel_futures=True)
+    return _get_section_pool(workers, profile)
+
+
+def _extract_sections(
+    sections: Iterable[List[str]],
+    workers: int,
+    batch_size: int,
+    profile: str,
+    max_descriptions: Optional[int] = None,
+    slice_size: Optional[int] = None,
+    with_document_formulas: bool = False,
+    progress: Optional[ProgressCallback] = None,
+    document_id: Optional[str] = None,
+    preview: Optional[_Preview] = None,
+) -> Tuple[ExtractionAggregate, Dict[str, int]]:
+    """
+    Extract every section on its own and merge the results.
+
+    With *workers* > 1 sections are extracted in worker processes as
+    they arrive (at most ``2 * workers`` in flight), otherwise in this
+    process.  Results are merged strictly in document order, so they do
+    not depend on which worker finishes first.
+
+    With *document_id*, sections are extracted one after another in this
+    process, each starting from the pronoun-resolution subject the one
+    before it ended with, so the merged result is that of a single pass
+    over the document.  A section whose lines and starting subject are
+    unchanged since the previous version of that document reuses its
+    stored result and only the other sections are extracted; the new
+    per-section results are then stored as the document's latest
+    version.  *preview*, if given, is updated as sections are merged.
+
+    A worker that dies (out of memory, a crash in native code) breaks
+    the pool and fails every section in it; each of those sections is
+    retried once in a new pool, and the call fails if that breaks too.
 
+    Returns ``(aggregate, counts)`` where *counts* has the number of
+    "sections" merged and how many were "reused".
+    """
+    chained = document_id is not None
+    parallel = workers > 1 and not chained
+    versions = get_section_versions(profile) if document_id else None
+    previous = versions.previous(document_id) if versions is not None else {}
+    current: Dict[str, ExtractionAggregate] = {}
+
+    aggregate = ExtractionAggregate(max_descriptions=max_descriptions)
+    # (section key, lines, Future or finished ExtractionAggregate, pool or None)
+    pending = deque()
+    counts = {"sections": 0, "reused": 0}
+
+    def submit(pool: ProcessPoolExecutor, lines: List[str]) -> Future:
+        return pool.submit(
+            _extract_section, lines, batch_size, profile,
+            max_descriptions, slice_size, with_document_formulas,
+        )
+
+    def merge_next():
+        key, lines, part, pool = pending.popleft()
+        if isinstance(part, Future):
+            try:
+                part = part.result()
+            except BrokenProcessPool:
+                retry = _replace_section_pool(workers, profile, pool)
+                try:
+                    part = submit(retry, lines).result()
+                except BrokenProcessPool:
+                    _replace_section_pool(workers, profile, retry)
+                    raise
+        if versions is not None:
+            current[key] = part
+        aggregate.merge(part)
+        counts["sections"] += 1
+        extra = {"reused": counts["reused"]} if versions is not None else {}
+        _report(
+            progress, "sections",
+            sections=counts["sections"],
+            sentences=aggregate.sentence_count,
+            relations=aggregate.relation_count,
+            **extra,
+        )
+        if preview is not None:
+            preview.update(aggregate.concepts.freq, aggregate.relations.values())
+
+    subject = None
+    for lines in sections:
+        if not lines:
+            continue
+        key = None
+        if versions is not None:
+            key = _section_key(lines, max_descriptions, slice_size, with_document_formulas, subject)
+        pool = None
+        if key in previous:
+            part = previous[key]
+            counts["reused"] += 1
+        elif parallel:
+            pool = _get_section_pool(workers, profile)
+            try:
+                part = submit(pool, lines)
+            except BrokenProcessPool:
+                pool = _replace_section_pool(workers, profile, pool)
+                part = submit(pool, lines)
+        else:
+            part = _extract_section(
+                lines, batch_size, profile,
+                max_descriptions, slice_size, with_document_formulas, subject,
+            )
+        if chained:
+            subject = part.last_subject
+        pending.append((key, lines, part, pool))
+        if len(pending) >= 2 * max(workers, 1):
+            merge_next()
+    while pending:
+        merge_next()
+
+    if versions is not None:
+        versions.store(document_id, current)
+    return aggregate, counts
+
+
+def _top_level_section(node: HeadingNode) -> HeadingNode:
+    """The child of the root that *node* belongs to (the root for preamble text)."""
+    while node.parent is not None and node.parent.parent is not None:
+        node = node.parent
+    return node
+
+
+def _group_top_level(sections: Iterable[Tuple[HeadingNode, List[str]]]) -> Iterator[List[str]]:
+    """Join consecutive ``iter_sections`` chunks of the same top-level section."""
+    for _, group in itertools.groupby(sections, key=lambda s: id(_top_level_section(s[0]))):
+        yield [line for _, lines in group for line in lines]
+
+
+def _group_by_heading(sections: Iterable[Tuple[HeadingNode, List[str]]]) -> Iterator[List[str]]:
+    """Join the ``iter_sections`` chunks (slices) of each heading section."""
+    for _, group in itertools.groupby(sections, key=lambda s: id(s[0])):
+        yield [line for _, lines in group for line in lines]
+
+
+def _heading_sections(node: HeadingNode) -> Iterator[List[str]]:
+    """The body lines of *node* and of every heading below it, in document order."""
+    yield list(node.sentences)
+    for child in node.children:
+        yield from _heading_sections(child)
+
+
+def _incremental_summary(counts: Dict[str, int]) -> Dict[str, int]:
+    return {
+        "sections": counts["sections"],
+        "reused": counts["reused"],
+        "extracted": counts["sections"] - counts["reused"],
+    }
+
+
+# ---------------------------------------------------------------------------
+# Graph assembly (shared by all modes)
+# ---------------------------------------------------------------------------
+
+def _empty_result(warnings: List[str], pipeline: Dict) -> Dict:
+    return {
+        "concept_map": {"nodes": [], "edges": []},
+        "warnings": warnings,
+        "stats": {},
+        "pipeline": pipeline,
+    }
+
+
+def _assemble_concept_map(
+    concepts: List[str],
+    frequency: Dict[str, int],
+    relations: List[Dict],
+    descriptions: Dict[str, List[str]],
+    formulas: Dict[str, List[str]],
+    document_formulas: List[str],
+    root_node: HeadingNode,
+    flat_headings: List[str],
+    sentence_count: int,
+    relation_count: int,
+    progress: Optional[ProgressCallback] = None,
+    previous_clusters: Optional[Dict[str, int]] = None,
+    graph_sink: Optional[GraphSink] = None,
+) -> Tuple[Dict, Dict]:
+    """
+    Turn extraction results into the final concept map.
+
+    *previous_clusters* (concept -> cluster id of an earlier map of the
+    same document) seeds community detection and keeps its cluster ids.
+    *graph_sink* is given the graph before filtering (see ``GraphSink``).
+
+    Returns ``(concept_map, stats)``.
+    """
     # Also count heading concepts in frequency
     for h in flat_headings:
         frequency[h] = frequency.get(h, 0) + 2  # heading boost
@@ -137,21 +731,11 @@ def process_text(raw_text: str) -> Dict:
     # Also boost frequency of the title
     frequency[document_title] = frequency.get(document_title, 0) + 5
 
-    # 4. Context-aware meaning analysis
-    analyzer = MeaningAnalyzer(nlp)
-    relations, descriptions, formulas = analyzer.analyze_sentences(sentences)
-
     # Merge regex-detected formulas so none are missed
-    for f in document_formulas:
-        added = False
-        for concept in list(formulas.keys()):
-            if concept.lower() in f.lower():
-                formulas.setdefault(concept, []).append(f)
-                added = True
-        if not added:
-            formulas.setdefault(document_title, []).append(f)
+    assign_formulas(formulas, document_formulas, document_title)
 
     # 5. Build graph
+    _report(progress, "graph")
     graph = build_graph(relations, frequency, descriptions, formulas, heading_edges)
 
     # 6. Also add concepts that have no relations but are significant
@@ -168,17 +752,27 @@ def process_text(raw_text: str) -> Dict:
                 cluster=-1,
             )
 
+    if graph_sink is not None:
+        graph_sink(graph, document_title, flat_headings)
+
+    # From here on the graph is only modified in place, so a single
+    # undirected view serves both ranking and community detection.
+    undirected = undirected_view(graph)
+
     #7. Remove weak isolated nodes
-    graph = filter_low_value_nodes(graph, frequency, freq_threshold=3, document_title=document_title)
+    filter_low_value_nodes(graph, frequency, freq_threshold=3,
+                           document_title=document_title, inplace=True)
 
     # 8. Connect orphans to document_root
     graph = connect_to_root(graph, document_title)
 
     # 9. Importance ranking
-    scores = rank_concepts(graph, heading_concepts=flat_headings)
+    _report(progress, "ranking", nodes=graph.number_of_nodes(), edges=graph.number_of_edges())
+    scores = rank_concepts(graph, heading_concepts=flat_headings, undirected=undirected)
 
     # 10. Prune to top N concepts
-    graph = prune_graph(graph, scores, max_concepts=MAX_CONCEPTS, document_title=document_title)
+    prune_graph(graph, scores, max_concepts=MAX_CONCEPTS,
+                document_title=document_title, inplace=True)
 
     # Re-connect after pruning
     graph = connect_to_root(graph, document_title)
@@ -188,7 +782,8 @@ def process_text(raw_text: str) -> Dict:
         graph.nodes[document_title]["formulas"] = formulas[document_title]
         
     # 11. Community detection
-    clusters = detect_communities(graph)
+    _report(progress, "clustering", nodes=graph.number_of_nodes())
+    clusters, clustering = cluster_graph(graph, undirected=undirected, previous=previous_clusters)
     for node, cluster_id in clusters.items():
         if node in graph:
             graph.nodes[node]["cluster"] = cluster_id
@@ -198,34 +793,399 @@ def process_text(raw_text: str) -> Dict:
 
     # Stats
     stats = {
-        "total_sentences": len(sentences),
+        "total_sentences": sentence_count,
         "total_concepts_extracted": len(concepts),
-        "total_relations_extracted": len(relations),
+        "total_relations_extracted": relation_count,
         "concepts_in_map": len(concept_map["nodes"]),
         "edges_in_map": len(concept_map["edges"]),
         "communities_detected": len(set(clusters.values())) if clusters else 0,
         "headings_found": len(flat_headings),
+        "clustering": clustering,
+    }
+    _report(progress, "done", **stats)
+
+    return concept_map, stats
+
+
+# ---------------------------------------------------------------------------
+# Long-document (streaming) mode
+# ---------------------------------------------------------------------------
+
+def _iter_body_lines(chunks: Iterable[str]):
+    """Clean each incoming chunk (text block or PDF page) and yield its lines."""
+    for chunk in chunks:
+        yield from clean_text(chunk).split("\n")
+
+
+def _process_long_document(
+    lines: Iterable[str],
+    batch_size: int = NLP_BATCH_SIZE,
+    n_process: int = NLP_N_PROCESS,
+    profile: str = DEFAULT_PROFILE,
+    progress: Optional[ProgressCallback] = None,
+    section_workers: int = SECTION_WORKERS,
+    document_id: Optional[str] = None,
+    graph_sink: Optional[GraphSink] = None,
+    partial: Optional[PartialCallback] = None,
+) -> Dict:
+    """
+    Stream cleaned body *lines* through the pipeline one heading section
+    at a time.
+
+    No input limits apply.  Only the current section's spaCy Docs are held
+    in memory; per-section concept counts, relations, descriptions and
+    formulas are merged into an ``ExtractionAggregate`` before ranking and
+    pruning run once on the merged graph.  Sections longer than
+    ``LONG_DOC_SECTION_SENTENCES`` lines are processed in slices, and the
+    meaning analyzer's context carries over between sections exactly as
+    in the regular pipeline.  With *section_workers* each top-level
+    section is extracted in a worker process instead.  With
+    *document_id* every heading section is extracted on its own and only
+    those changed since that document's previous version are extracted
+    again (see ``_extract_sections``).  *partial* receives previews of
+    the map built from the sections read so far.
+    """
+    nlp = get_nlp(profile)
+    pipeline = describe_pipeline(profile)
+
+    root_node = HeadingNode("Document_Root", level=0)
+    flat_headings: List[str] = []
+    preview = _Preview(partial, root_node, flat_headings)
+    aggregate = ExtractionAggregate(max_descriptions=LONG_DOC_MAX_DESCRIPTIONS)
+    analyzer = MeaningAnalyzer(nlp, batch_size, n_process, cache=get_parse_cache(profile))
+
+    sections = iter_sections(
+        lines, root_node, flat_headings,
+        max_sentences=LONG_DOC_SECTION_SENTENCES,
+    )
+    workers = _section_worker_count(section_workers)
+    section_counts = None
+    if workers > 1 or document_id:
+        group = _group_by_heading if document_id else _group_top_level
+        aggregate, section_counts = _extract_sections(
+            group(sections), workers, batch_size, profile,
+            max_descriptions=LONG_DOC_MAX_DESCRIPTIONS,
+            slice_size=LONG_DOC_SECTION_SENTENCES,
+            with_document_formulas=True,
+            progress=progress,
+            document_id=document_id,
+            preview=preview,
+        )
+        sections = iter(())
+
+    for section_no, (node, lines) in enumerate(sections, 1):
+        sentence_parses = analyzer.parse_lines(lines)
+
+        for parse in sentence_parses:
+            aggregate.concepts.add_doc(parse)
+        relations, descriptions, formulas = analyzer.analyze_sentences(sentence_parses)
+        aggregate.add_relations(relations)
+        aggregate.add_descriptions(descriptions)
+        aggregate.add_formulas(formulas)
+        aggregate.add_document_formulas(extract_formulas("\n".join(lines)))
+        aggregate.sentence_count += len(sentence_parses)
+
+        _report(
+            progress, "sections",
+            sections=section_no,
+            section=node.title,
+            sentences=aggregate.sentence_count,
+            relations=aggregate.relation_count,
+        )
+        preview.update(aggregate.concepts.freq, aggregate.relations.values())
+
+    if not aggregate.sentence_count:
+        return _empty_result(["No sentences found in input."], pipeline)
+
+    concepts, frequency = aggregate.concepts.finalize()
+    relations = aggregate.relation_list()
+    preview.headings()
+    preview.concepts(frequency)
+    preview.relations(relations)
+    previous_clusters = None
+    if document_id:
+        previous_clusters = get_section_versions(profile).clusters(document_id)
+    concept_map, stats = _assemble_concept_map(
+        concepts, frequency,
+        relations,
+        aggregate.description_lists(),
+        aggregate.formula_lists(),
+        list(aggregate.document_formulas),
+        root_node, flat_headings,
+        aggregate.sentence_count, aggregate.relation_count,
+        progress,
+        previous_clusters=previous_clusters,
+        graph_sink=graph_sink,
+    )
+    result = {
+        "concept_map": concept_map,
+        "warnings": [],
+        "stats": stats,
+        "pipeline": pipeline,
     }
+    if document_id:
+        get_section_versions(profile).store_clusters(document_id, concept_map)
+        result["incremental"] = _incremental_summary(section_counts)
+    return result
+
+
+# ---------------------------------------------------------------------------
+# Public API
+# ---------------------------------------------------------------------------
+
+def process_text(
+    raw_text: str,
+    batch_size: int = NLP_BATCH_SIZE,
+    n_process: int = NLP_N_PROCESS,
+    profile: str = DEFAULT_PROFILE,
+    long_document: bool = False,
+    progress: Optional[ProgressCallback] = None,
+    section_workers: int = SECTION_WORKERS,
+    document_id: Optional[str] = None,
+    graph_sink: Optional[GraphSink] = None,
+    partial: Optional[PartialCallback] = None,
+) -> Dict:
+    """
+    Run the full CS-CME pipeline on raw text.
+
+    *batch_size* and *n_process* are passed to ``nlp.pipe`` for every
+    spaCy stage; *profile* selects the spaCy pipeline (see
+    ``utils.PIPELINE_PROFILES``).  With *long_document* the input limits
+    are lifted and the text is streamed section by section.  *progress*,
+    if given, is called as ``progress(stage, info)`` while the pipeline
+    runs.  With *section_workers* > 1 (-1 = all cores) every top-level
+    heading section is extracted in its own worker process, with its own
+    pronoun-resolution context, and the partial results are merged in
+    document order.
+
+    *document_id* turns on incremental mode for text that is edited and
+    regenerated: every heading section (not just every top-level one) is
+    extracted on its own, starting from the pronoun-resolution context the
+    section before it ended with, and a section whose lines and starting
+    context are unchanged since the previous version of the same document
+    reuses that version's results, so only edited sections (and a section
+    whose opening pronouns now resolve differently) are parsed and
+    analyzed again.  The map is the one the whole text would give, except
+    that clustering is warm-started from the previous version's clusters.
+    Ranking, pruning and clustering always run on the whole map.
 
+    *graph_sink*, if given, receives the document's full graph before it
+    is filtered and pruned (see ``GraphSink``).  *partial*, if given,
+    receives previews of the map as soon as the headings, the concepts
+    and the relations are known (see ``PartialCallback``).
+
+    Returns
+    -------
+    dict with keys:
+        concept_map : dict   – the final JSON (nodes + edges)
+        warnings    : list[str]
+        stats       : dict   – summary statistics
+        pipeline    : dict   – profile, model and components used
+        incremental : dict   – sections, reused and extracted
+                               (only with *document_id*)
+    """
+    if long_document:
+        return _process_long_document(
+            _iter_body_lines([raw_text]), batch_size, n_process, profile, progress,
+            section_workers, document_id, graph_sink, partial,
+        )
+
+    nlp = get_nlp(profile)
+    pipeline = describe_pipeline(profile)
+
+    # 1. Preprocess (sentence segmentation happens per section below)
+    _report(progress, "preprocessing")
+    prep = preprocess(raw_text, nlp, segment=False)
+    cleaned_text = prep["cleaned_text"]
+    warnings = list(prep["warnings"])
+
+    # NEW: extract formulas from the entire document
+    document_formulas = extract_formulas(cleaned_text)
+
+    # 2. Heading segmentation (separates headings from body sentences)
+    root_node, flat_headings = segment_by_headings(cleaned_text)
+    preview = _Preview(partial, root_node, flat_headings)
+    preview.headings()
+
+    # Collect only non-heading sentences from the heading tree
+    # This prevents heading text from being merged into adjacent sentences
+    def _collect_sentences(node: HeadingNode) -> list:
+        sents = []
+        for s in node.sentences:
+            sents.append(s)
+        for child in node.children:
+            sents.extend(_collect_sentences(child))
+        return sents
+
+    raw_body_sentences = _collect_sentences(root_node)
+
+    workers = _section_worker_count(section_workers)
+    if workers > 1 or document_id:
+        _report(progress, "parsing", lines=len(raw_body_sentences))
+        if document_id:
+            # Every heading section on its own, so an edit only
+            # invalidates the section it is in
+            sections = list(_heading_sections(root_node))
+        else:
+            # Preamble lines first, then one task per top-level section
+            sections = [list(root_node.sentences)]
+            sections += [_collect_sentences(child) for child in root_node.children]
+        aggregate, section_counts = _extract_sections(
+            sections, workers, batch_size, profile, progress=progress,
+            document_id=document_id, preview=preview,
+        )
+        if not aggregate.sentence_count:
+            return _empty_result(warnings + ["No sentences found in input."], pipeline)
+
+        concepts, frequency = aggregate.concepts.finalize()
+        relations = aggregate.relation_list()
+        preview.concepts(frequency)
+        preview.relations(relations)
+        previous_clusters = None
+        if document_id:
+            previous_clusters = get_section_versions(profile).clusters(document_id)
+        concept_map, stats = _assemble_concept_map(
+            concepts, frequency,
+            relations,
+            aggregate.description_lists(),
+            aggregate.formula_lists(),
+            document_formulas, root_node, flat_headings,
+            aggregate.sentence_count, aggregate.relation_count,
+            progress,
+            previous_clusters=previous_clusters,
+            graph_sink=graph_sink,
+        )
+        result = {
+            "concept_map": concept_map,
+            "warnings": warnings,
+            "stats": stats,
+            "pipeline": pipeline,
+        }
+        if document_id:
+            get_section_versions(profile).store_clusters(document_id, concept_map)
+            result["incremental"] = _incremental_summary(section_counts)
+        return result
+
+    # Parse each body line at most once (lines seen in earlier documents
+    # come from the parse cache).  The sentence artifacts carry the parse
+    # through concept extraction and meaning analysis.
+    _report(progress, "parsing", lines=len(raw_body_sentences))
+    analyzer = MeaningAnalyzer(nlp, batch_size, n_process, cache=get_parse_cache(profile))
+    sentence_parses = analyzer.parse_lines(raw_body_sentences)
+
+    if not sentence_parses:
+        return _empty_result(warnings + ["No sentences found in input."], pipeline)
+
+    # 3. Concept extraction
+    _report(progress, "concepts", sentences=len(sentence_parses))
+    concepts, frequency = extract_concepts(sentence_parses, nlp, batch_size, n_process)
+    preview.concepts(frequency)
+
+    # 4. Context-aware meaning analysis
+    _report(progress, "relations", sentences=len(sentence_parses))
+    relations, descriptions, formulas = analyzer.analyze_sentences(sentence_parses)
+    preview.relations(relations)
+
+    concept_map, stats = _assemble_concept_map(
+        concepts, frequency, relations, descriptions, formulas,
+        document_formulas, root_node, flat_headings,
+        len(sentence_parses), len(relations),
+        progress,
+        graph_sink=graph_sink,
+    )
     return {
         "concept_map": concept_map,
         "warnings": warnings,
         "stats": stats,
+        "pipeline": pipeline,
     }
 
 
-def process_pdf(pdf_bytes: bytes) -> Dict:
+def process_text_file(
+    path: str,
+    batch_size: int = NLP_BATCH_SIZE,
+    n_process: int = NLP_N_PROCESS,
+    profile: str = DEFAULT_PROFILE,
+    long_document: bool = False,
+    progress: Optional[ProgressCallback] = None,
+    section_workers: int = SECTION_WORKERS,
+    graph_sink: Optional[GraphSink] = None,
+    partial: Optional[PartialCallback] = None,
+) -> Dict:
+    """
+    Run the CS-CME pipeline on a UTF-8 text file (e.g. a spooled upload).
+
+    With *long_document* the file is decoded and cleaned line by line as
+    it streams into the pipeline, so it is never held in memory whole;
+    otherwise it is read once and passed to ``process_text``.  *graph_sink*
+    and *partial* are as for ``process_text``.
+    """
+    if not long_document:
+        return process_text(
+            read_file_text(path), batch_size, n_process, profile, False, progress,
+            section_workers, graph_sink=graph_sink, partial=partial,
+        )
+    return _process_long_document(
+        iter_clean_lines(iter_file_text(path)), batch_size, n_process, profile, progress,
+        section_workers, graph_sink=graph_sink, partial=partial,
+    )
+
+
+def process_pdf(
+    pdf_bytes: Union[bytes, str],
+    batch_size: int = NLP_BATCH_SIZE,
+    n_process: int = NLP_N_PROCESS,
+    profile: str = DEFAULT_PROFILE,
+    long_document: bool = False,
+    progress: Optional[ProgressCallback] = None,
+    section_workers: int = SECTION_WORKERS,
+    pdf_backend: str = PDF_BACKEND,
+    pdf_workers: int = PDF_WORKERS,
+    graph_sink: Optional[GraphSink] = None,
+    partial: Optional[PartialCallback] = None,
+) -> Dict:
     """
     Extract text from a PDF and run the CS-CME pipeline.
+
+    *pdf_bytes* may also be the path of a PDF file, which is then opened
+    by the extraction backend instead of being read into memory.  With
+    *long_document* every page is read (no ``MAX_PDF_PAGES`` limit) and
+    pages are streamed into the pipeline as they are extracted.
+    *pdf_backend* and *pdf_workers* are passed to ``pdf_ingest``; the
+    backend used and per-page extraction times are returned under "pdf".
+    *graph_sink* and *partial* are as for ``process_text``.
     """
-    text, pdf_warnings = extract_text_from_pdf(pdf_bytes)
-    if not text.strip():
-        return {
-            "concept_map": {"nodes": [], "edges": []},
-            "warnings": pdf_warnings + ["Could not extract text from PDF."],
-            "stats": {},
-        }
+    try:
+        pdf = PdfDocument(pdf_bytes, pdf_backend)
+    except PdfBackendError as exc:
+        return _empty_result([str(exc)], describe_pipeline(profile))
 
-    result = process_text(text)
-    result["warnings"] = pdf_warnings + result.get("warnings", [])
+    _report(progress, "pdf", pages=pdf.page_count, backend=pdf.backend)
+    max_pages = None if long_document else MAX_PDF_PAGES
+    pdf_warnings = pdf.limit_warnings(max_pages)
+    pages = pdf.iter_pages(max_pages, pdf_workers)
+
+    if long_document:
+        result = _process_long_document(
+            _iter_body_lines(pages), batch_size, n_process, profile, progress,
+            section_workers, graph_sink=graph_sink, partial=partial,
+        )
+        found_text = any(chars for _, _, chars in pdf.page_timings)
+    else:
+        text = "\n".join(p for p in pages if p)
+        found_text = bool(text.strip())
+        if found_text:
+            result = process_text(
+                text, batch_size, n_process, profile, False, progress, section_workers,
+                graph_sink=graph_sink, partial=partial,
+            )
+
+    if not found_text:
+        result = _empty_result(
+            pdf_warnings + ["Could not extract text from PDF."],
+            describe_pipeline(profile),
+        )
+    else:
+        result["warnings"] = pdf_warnings + result.get("warnings", [])
+    result["pdf"] = pdf.summary()
     return result
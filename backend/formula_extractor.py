@@ -1,48 +1,174 @@
+"""
+Formula Extractor – document-level formula scanning.
+
+Responsibilities:
+  - Find equations, sqrt / argmax expressions, function calls, Big-O
+    terms, vectors, powers and LaTeX commands in a whole document
+  - Return them de-duplicated in a stable order (pattern by pattern,
+    then by position)
+  - Assign document formulas to the concepts named in them
+
+Sentence-level detection (``utils.detect_formulas``) is separate; its
+results are stored with each sentence's parse artifacts.
+"""
+
 import re
+from typing import Dict, Iterable, Iterator, List, Pattern
+
+from phrase_index import PhraseAutomaton
+
+
+class _CharClass:
+    """Membership test for a one-character regex class, as matched under IGNORECASE."""
+
+    def __init__(self, char_class: str):
+        self._regex = re.compile(char_class, re.IGNORECASE)
+        self._ascii = frozenset(c for c in map(chr, range(128)) if self._regex.fullmatch(c))
+
+    def __contains__(self, ch: str) -> bool:
+        if ch < "\x80":
+            return ch in self._ascii
+        # e.g. the Kelvin sign matches [a-z] under IGNORECASE
+        return self._regex.fullmatch(ch) is not None
+
+
+_WORD_RUN = _CharClass(r"[A-Za-z0-9_() ]")
+_IDENTIFIER = _CharClass(r"[A-Za-z0-9_]")
+
+# General patterns only — works for ANY academic document.
+# Patterns that start with a run of word characters are scanned from an
+# anchor character backwards: (pattern, anchor, run class, first-character
+# class).  See _scan_from_anchor.
+_PATTERNS = [
+    # General equations with =
+    (re.compile(r"[A-Za-z0-9_() ]+\s*=\s*[^\n=]{5,120}", re.IGNORECASE),
+     "=", _WORD_RUN, _WORD_RUN),
+
+    # sqrt expressions (with or without ...)
+    (re.compile(r"[A-Za-z0-9_() ]+\s*=\s*sqrt\s*\([^\)]+\)", re.IGNORECASE),
+     "=", _WORD_RUN, _WORD_RUN),
+
+    # argmax / summation style
+    (re.compile(r"[a-z_]+\s*=\s*argmax", re.IGNORECASE),
+     "=", _CharClass(r"[a-z_]"), _CharClass(r"[a-z_]")),
+
+    # Function calls like f(x), P(x,y)
+    (re.compile(r"[A-Za-z_][A-Za-z0-9_]*\s*\([^\)]*\)", re.IGNORECASE),
+     "(", _IDENTIFIER, _CharClass(r"[A-Za-z_]")),
+
+    # Big-O notation
+    (re.compile(r"O\s*\([^\)]+\)", re.IGNORECASE), None, None, None),
+
+    # Vector / array style
+    (re.compile(r"\[[^\]]+\]", re.IGNORECASE), None, None, None),
+
+    # Any math with ^ or powers
+    (re.compile(r"[A-Za-z0-9_]+\s*\^\s*\d+", re.IGNORECASE),
+     "^", _IDENTIFIER, _IDENTIFIER),
 
-def extract_formulas(text: str):
+    # LaTeX-style (for safety)
+    (re.compile(r"\\[a-zA-Z]+\{[^}]*\}", re.IGNORECASE), None, None, None),
+]
+
+
+def _scan_from_anchor(
+    pattern: Pattern, text: str, anchor: str, run: _CharClass, first: _CharClass,
+) -> Iterator[str]:
+    """
+    ``pattern.findall(text)`` for patterns of the form
+    ``first run* \\s* anchor ...``.
+
+    The run cannot contain the anchor, so a match can only start at the
+    leftmost *first* character of the run (and spaces) just before an
+    anchor, and if it fails there it fails anywhere in that run.  Trying
+    only those starts avoids the regex engine's attempt at every position,
+    which is quadratic in the run length.  *text* must have its whitespace
+    normalised to single spaces.
+    """
+    pos = 0
+    while True:
+        k = text.find(anchor, pos)
+        if k < 0:
+            return
+        start = k
+        if " " not in run:
+            while start > pos and text[start - 1] == " ":
+                start -= 1
+        run_end = start
+        while start > pos and text[start - 1] in run:
+            start -= 1
+        while start < run_end and text[start] not in first:
+            start += 1
+        m = pattern.match(text, start) if start < run_end else None
+        if m is not None:
+            yield m.group()
+            pos = m.end()
+        else:
+            pos = k + 1
+
+
+def _normalize_whitespace(text: str) -> str:
+    """Every whitespace run as one space (as ``re.sub(r"\\s+", " ", text)``)."""
+    if not text:
+        return text
+    core = " ".join(text.split())
+    if not core:
+        return " "
+    lead = " " if text[0].isspace() else ""
+    trail = " " if text[-1].isspace() else ""
+    return lead + core + trail
+
+
+def extract_formulas(text: str) -> List[str]:
     """
     Extract mathematical formulas from raw text.
     General patterns only — works for ANY academic document.
     Catches equations, sqrt, argmax, vectors, Big-O, LaTeX-style, etc.
     """
-    # Normalize
-    text = text.replace("\n", " ")
-    text = re.sub(r"\s+", " ", text)
-
-    formulas = []
-
-    patterns = [
-        # General equations with = 
-        r"[A-Za-z0-9_() ]+\s*=\s*[^\n=]{5,120}",
-        
-        # sqrt expressions (with or without ...)
-        r"[A-Za-z0-9_() ]+\s*=\s*sqrt\s*\([^\)]+\)",
-        
-        # argmax / summation style
-        r"[a-z_]+\s*=\s*argmax",
-        
-        # Function calls like f(x), P(x,y)
-        r"[A-Za-z_][A-Za-z0-9_]*\s*\([^\)]*\)",
-        
-        # Big-O notation
-        r"O\s*\([^\)]+\)",
-        
-        # Vector / array style
-        r"\[[^\]]+\]",
-        
-        # Any math with ^ or powers
-        r"[A-Za-z0-9_]+\s*\^\s*\d+",
-        
-        # LaTeX-style (for safety)
-        r"\\[a-zA-Z]+\{[^}]*\}"
-    ]
-
-    for pattern in patterns:
-        matches = re.findall(pattern, text, re.IGNORECASE)
+    text = _normalize_whitespace(text)
+
+    formulas = {}
+    for pattern, anchor, run, first in _PATTERNS:
+        if anchor is not None:
+            matches = _scan_from_anchor(pattern, text, anchor, run, first)
+        else:
+            matches = (m.group() for m in pattern.finditer(text))
         for m in matches:
             m = m.strip()
-            if 8 < len(m) < 180 and m not in formulas:
-                formulas.append(m)
+            if 8 < len(m) < 180:
+                formulas.setdefault(m, None)
+
+    return list(formulas)
+
+
+def assign_formulas(
+    formulas: Dict[str, List[str]],
+    document_formulas: Iterable[str],
+    fallback: str,
+):
+    """
+    Append each document formula to every concept in *formulas* whose
+    name occurs in it (case-insensitively), or to *fallback* if none does.
+
+    *formulas* is updated in place.  The concept names are matched with
+    one Aho-Corasick scan of each lowercased formula rather than one
+    substring test per concept.  Once a formula has fallen back to
+    *fallback*, that name is matched like any other concept.
+    """
+    by_lower: Dict[str, List[str]] = {}
+    for concept in formulas:
+        by_lower.setdefault(concept.lower(), []).append(concept)
+    fallback_lower = fallback.lower()
+    automaton = PhraseAutomaton(set(by_lower) | {fallback_lower})
 
-    return formulas
\ No newline at end of file
+    for f in document_formulas:
+        added = False
+        for lower in set(automaton.iter_matches(f.lower())):
+            for concept in by_lower.get(lower, ()):
+                formulas[concept].append(f)
+                added = True
+        if not added:
+            if fallback not in formulas:
+                formulas[fallback] = []
+                by_lower.setdefault(fallback_lower, []).append(fallback)
+            formulas[fallback].append(f)
@@ -4,21 +4,32 @@ Graph Builder module for the CS-CME engine.
 Responsibilities:
   - Build a NetworkX directed graph from extracted relations
   - Apply PageRank-style importance scoring
-  - Apply Louvain community detection for clustering
+  - Apply Louvain community detection for clustering (see louvain.py)
   - Keep top-N concepts
   - Produce the final JSON structure
+
+Every function below also accepts a CompactConceptGraph (see
+compact_graph.py) in place of a NetworkX DiGraph.
 """
 
-from typing import Dict, List, Optional, Set
+from typing import Dict, List, Optional, Set, Tuple, Union
 
 import networkx as nx
+import numpy as np
+from scipy import sparse
 
-try:
-    import community as community_louvain  # python-louvain
-except ImportError:
-    community_louvain = None
+from utils import (
+    MAX_CONCEPTS,
+    ALLOWED_RELATIONS,
+    RANK_WEIGHTS,
+    LOUVAIN_MAX_LEVELS,
+    LOUVAIN_TIME_BUDGET,
+)
+from compact_graph import CompactConceptGraph
+from louvain import align_labels, build_adjacency, louvain, seed_membership
 
-from utils import MAX_CONCEPTS, ALLOWED_RELATIONS
+# Either graph backend
+ConceptGraph = Union[nx.DiGraph, CompactConceptGraph]
 
 
 # ---------------------------------------------------------------------------
@@ -31,7 +42,8 @@ def build_graph(
     descriptions: Dict[str, List[str]],
     formulas: Dict[str, List[str]],
     heading_edges: Optional[List[Dict]] = None,
-) -> nx.DiGraph:
+    compact: bool = False,
+) -> ConceptGraph:
     """
     Build a directed graph from extracted relations.
 
@@ -47,9 +59,16 @@ def build_graph(
         Concept -> formula strings.
     heading_edges : list[dict] | None
         Edges from heading hierarchy (source, target, relation).
+    compact : bool
+        Return a CompactConceptGraph instead (much less memory per node).
 
     Returns a NetworkX DiGraph.
     """
+    if compact:
+        return CompactConceptGraph.from_relations(
+            relations, frequency, descriptions, formulas, heading_edges
+        )
+
     G = nx.DiGraph()
 
     # --- Add relation edges ---
@@ -117,16 +136,33 @@ def build_graph(
 # ---------------------------------------------------------------------------
 
 def filter_low_value_nodes(
-    G: nx.DiGraph,
+    G: ConceptGraph,
     frequency: Dict[str, int],
     freq_threshold: int = 3,
     document_title: str = "Document Overview",  # <--- NEW parameter
-) -> nx.DiGraph:
+    inplace: bool = False,
+) -> ConceptGraph:
     """
     Keep:
         - nodes that participate in relations
         - standalone nodes only if frequency >= threshold
+
+    With *inplace* the nodes are removed from *G* itself instead of a copy
+    (compact graphs always return a new graph sharing *G*'s strings).
     """
+    if isinstance(G, CompactConceptGraph):
+        degree = G.degrees()
+        keep = np.fromiter(
+            (
+                node == document_title
+                or degree[i] > 0
+                or frequency.get(node, 1) >= freq_threshold
+                for i, node in enumerate(G.names)
+            ),
+            dtype=bool, count=len(G),
+        )
+        return G.subgraph(keep)
+
     nodes_to_keep = set()
 
     for node in list(G.nodes):
@@ -145,66 +181,158 @@ def filter_low_value_nodes(
 
     nodes_to_remove = [n for n in G.nodes if n not in nodes_to_keep]
 
-    pruned = G.copy()
+    pruned = G if inplace else G.copy()
     pruned.remove_nodes_from(nodes_to_remove)
 
     return pruned
 
+
+def undirected_view(G: nx.DiGraph) -> nx.Graph:
+    """
+    Read-only undirected projection of *G* that shares its storage.
+
+    The view follows later in-place changes to *G*, so one projection
+    can serve ranking and community detection without copying any node
+    data.
+    """
+    return G.to_undirected(as_view=True)
+
 # ---------------------------------------------------------------------------
 # Concept importance ranking (PageRank-style)
 # ---------------------------------------------------------------------------
 
+def _undirected_adjacency(n: int, src: np.ndarray, dst: np.ndarray) -> sparse.csr_array:
+    """
+    Binary symmetric adjacency of the undirected projection.
+
+    Reciprocal edges (u→v and v→u) collapse into one undirected edge and
+    a self-loop appears once on the diagonal, as with ``G.to_undirected()``.
+    """
+    rows = np.concatenate([src, dst])
+    cols = np.concatenate([dst, src])
+    A = sparse.coo_array((np.ones(len(rows)), (rows, cols)), shape=(n, n)).tocsr()
+    A.sum_duplicates()
+    A.data[:] = 1.0
+    return A
+
+
+def _pagerank(
+    A: sparse.csr_array,
+    alpha: float = 0.85,
+    max_iter: int = 100,
+    tol: float = 1.0e-6,
+) -> np.ndarray:
+    """
+    PageRank by sparse power iteration over adjacency matrix *A*.
+
+    Same iteration as ``nx.pagerank`` (uniform teleport, dangling mass
+    spread uniformly, L1 convergence test against ``N * tol``); raises
+    ``nx.PowerIterationFailedConvergence`` after *max_iter* iterations.
+    """
+    N = A.shape[0]
+    S = np.asarray(A.sum(axis=1)).ravel()
+    S[S != 0] = 1.0 / S[S != 0]
+    # Row-normalise: M[i, j] = A[i, j] / out_weight(i)
+    M = A.copy()
+    M.data *= np.repeat(S, np.diff(M.indptr))
+
+    p = np.repeat(1.0 / N, N)
+    is_dangling = np.where(S == 0)[0]
+
+    x = np.repeat(1.0 / N, N)
+    for _ in range(max_iter):
+        xlast = x
+        x = alpha * (x @ M + sum(x[is_dangling]) * p) + (1 - alpha) * p
+        err = np.absolute(x - xlast).sum()
+        if err < N * tol:
+            return x
+    raise nx.PowerIterationFailedConvergence(max_iter)
+
+
 def rank_concepts(
-    G: nx.DiGraph,
+    G: ConceptGraph,
     heading_concepts: Optional[List[str]] = None,
+    weights: Optional[Dict[str, float]] = None,
+    undirected: Optional[nx.Graph] = None,
 ) -> Dict[str, float]:
     """
     Score every concept using a weighted PageRank that considers:
-      - Link structure (PageRank)
+      - Link structure (PageRank on the undirected projection)
       - Concept frequency
+      - Node degree
       - Whether it appeared as a heading (heading boost)
 
+    *weights* overrides entries of ``utils.RANK_WEIGHTS``.  All components
+    are computed as arrays from one sparse adjacency matrix, so ranking
+    is linear in the number of edges.  PageRank runs on *undirected* (see
+    ``undirected_view``) when given, else on the projection of *G*.
+
     Returns dict: concept -> importance score.
     """
     if len(G) == 0:
         return {}
 
+    w = dict(RANK_WEIGHTS, **(weights or {}))
     heading_set = set(heading_concepts) if heading_concepts else set()
 
+    if isinstance(G, CompactConceptGraph):
+        nodes = G.names
+        n = len(nodes)
+        index = G.index
+        src = G.edge_sources()
+        dst = G.indices.astype(np.int64)
+        freq = G.frequency.astype(float)
+    else:
+        nodes = list(G.nodes)
+        n = len(nodes)
+        index = {node: i for i, node in enumerate(nodes)}
+        edges = list(G.edges())
+        src = np.fromiter((index[u] for u, _ in edges), dtype=np.int64, count=len(edges))
+        dst = np.fromiter((index[v] for _, v in edges), dtype=np.int64, count=len(edges))
+        freq = np.fromiter(
+            (G.nodes[node].get("frequency", 1) for node in nodes), dtype=float, count=n
+        )
+
     # Compute PageRank on the undirected projection
-    undirected = G.to_undirected()
+    if undirected is not None:
+        pairs = list(undirected.edges())
+        und_src = np.fromiter((index[u] for u, _ in pairs), dtype=np.int64, count=len(pairs))
+        und_dst = np.fromiter((index[v] for _, v in pairs), dtype=np.int64, count=len(pairs))
+        adjacency = _undirected_adjacency(n, und_src, und_dst)
+    else:
+        adjacency = _undirected_adjacency(n, src, dst)
     try:
-        pr = nx.pagerank(undirected, alpha=0.85, max_iter=100)
+        pr = _pagerank(adjacency, alpha=0.85, max_iter=100)
     except nx.PowerIterationFailedConvergence:
-        pr = {n: 1.0 / len(G) for n in G.nodes}
+        pr = np.repeat(1.0 / n, n)
 
-    scores: Dict[str, float] = {}
-    for node in G.nodes:
-        freq = G.nodes[node].get("frequency", 1)
-        pagerank_score = pr.get(node, 0)
-        degree = G.degree(node)
+    # In- plus out-degree, as G.degree() counts it
+    degree = (np.bincount(src, minlength=n) + np.bincount(dst, minlength=n)).astype(float)
+    heading = np.fromiter((node in heading_set for node in nodes), dtype=bool, count=n)
 
-        # Combined score
-        score = (
-            0.4 * pagerank_score * 100
-            + 0.3 * (freq / max(1, max(f for f in (G.nodes[n].get("frequency", 1) for n in G.nodes))))
-            + 0.2 * (degree / max(1, max(G.degree(n) for n in G.nodes)))
-            + (0.1 if node in heading_set else 0.0)
-        )
-        scores[node] = score
-
-    return scores
+    # Combined score
+    scores = (
+        w["pagerank"] * pr * 100
+        + w["frequency"] * (freq / max(1, freq.max()))
+        + w["degree"] * (degree / max(1, degree.max()))
+        + np.where(heading, w["heading"], 0.0)
+    )
+    return dict(zip(nodes, scores.tolist()))
 
 
 def prune_graph(
-    G: nx.DiGraph,
+    G: ConceptGraph,
     scores: Dict[str, float],
     max_concepts: int = MAX_CONCEPTS,
     document_title: str = "Document Overview",  # <--- NEW parameter
-) -> nx.DiGraph:
+    inplace: bool = False,
+) -> ConceptGraph:
     """
     Keep only the top *max_concepts* nodes (by importance score).
     Always keep document_root if present.
+
+    With *inplace* the nodes are removed from *G* itself instead of a copy
+    (compact graphs always return a new graph sharing *G*'s strings).
     """
     if len(G) <= max_concepts:
         return G
@@ -220,8 +348,11 @@ def prune_graph(
         keep.add(node)
     keep.update(protected & set(G.nodes))
 
+    if isinstance(G, CompactConceptGraph):
+        return G.subgraph(np.fromiter((n in keep for n in G.names), dtype=bool, count=len(G)))
+
     remove = set(G.nodes) - keep
-    pruned = G.copy()
+    pruned = G if inplace else G.copy()
     pruned.remove_nodes_from(remove)
 
     return pruned
@@ -231,34 +362,81 @@ def prune_graph(
 # Community detection (Louvain)
 # ---------------------------------------------------------------------------
 
-def detect_communities(G: nx.DiGraph) -> Dict[str, int]:
+def cluster_graph(
+    G: ConceptGraph,
+    undirected: Optional[nx.Graph] = None,
+    previous: Optional[Dict[str, int]] = None,
+    max_levels: int = LOUVAIN_MAX_LEVELS,
+    time_budget: float = LOUVAIN_TIME_BUDGET,
+) -> Tuple[Dict[str, int], Dict]:
     """
-    Apply Louvain community detection on the undirected projection.
+    Louvain community detection on the undirected projection of *G*
+    (edges are read from *undirected* if given).
+
+    *previous* (concept -> cluster id, e.g. from the last run on the same
+    document) seeds the partition and the new clusters are relabelled to
+    keep those ids.  *max_levels* and *time_budget* bound the run (see
+    ``louvain.louvain``).
+
+    Returns
+    -------
+    partition : dict[str, int]
+        Concept -> cluster id.
+    info : dict
+        modularity, levels, passes, moves, seconds, warm_start and
+        budget_exhausted.
+    """
+    if isinstance(G, CompactConceptGraph):
+        nodes = G.names
+        edges = zip(G.edge_sources().tolist(), G.indices.tolist())
+    else:
+        nodes = list(G.nodes)
+        index = {node: i for i, node in enumerate(nodes)}
+        source = undirected if undirected is not None else G
+        edges = ((index[u], index[v]) for u, v in source.edges())
+    adjacency = build_adjacency(len(nodes), edges)
+
+    initial = seed_membership(nodes, previous) if previous else None
+    membership, info = louvain(
+        adjacency, initial, max_levels=max_levels, time_budget=time_budget,
+    )
+    return align_labels(nodes, membership, previous), info
+
+
+def detect_communities(
+    G: ConceptGraph,
+    undirected: Optional[nx.Graph] = None,
+    previous: Optional[Dict[str, int]] = None,
+) -> Dict[str, int]:
+    """
+    Apply Louvain community detection on the undirected projection
+    (*undirected* if given, else *G*), seeded with *previous* clusters.
     Returns dict: concept -> cluster_id.
     """
-    if community_louvain is None or len(G) < 2:
-        return {n: 0 for n in G.nodes}
-
-    undirected = G.to_undirected()
-    try:
-        partition = community_louvain.best_partition(undirected)
-    except Exception:
-        partition = {n: 0 for n in G.nodes}
-
-    return partition
+    return cluster_graph(G, undirected, previous)[0]
 
 
 # ---------------------------------------------------------------------------
 # Connect orphans to document_root
 # ---------------------------------------------------------------------------
 
-def connect_to_root(G: nx.DiGraph, document_title: str = "Document Overview") -> nx.DiGraph:  # <--- NEW parameter
+def connect_to_root(G: ConceptGraph, document_title: str = "Document Overview") -> ConceptGraph:  # <--- NEW parameter
     """
     Ensure every node is reachable from document_root.
     Add 'connected_to' edges from document_root to any disconnected
     top-level concepts.
     """
     root = document_title
+    if isinstance(G, CompactConceptGraph):
+        G = G.with_node(root, frequency=0)
+        r = G.index[root]
+        in_degree = G.in_degrees()
+        targets = [
+            node for i, node in enumerate(G.names)
+            if i != r and in_degree[i] == 0
+        ]
+        return G.with_edges_from(root, targets, "contains")
+
     if root not in G:
         G.add_node(root, frequency=0, descriptions=[], formulas=[], cluster=-1)
 
@@ -276,7 +454,7 @@ def connect_to_root(G: nx.DiGraph, document_title: str = "Document Overview") ->
 # JSON export
 # ---------------------------------------------------------------------------
 
-def graph_to_json(G: nx.DiGraph) -> Dict:
+def graph_to_json(G: ConceptGraph) -> Dict:
     """
     Convert the graph to the required JSON format:
     {
@@ -284,6 +462,9 @@ def graph_to_json(G: nx.DiGraph) -> Dict:
       "edges": [{"source": ..., "target": ..., "relation": ..., "negated": ...}]
     }
     """
+    if isinstance(G, CompactConceptGraph):
+        return G.to_json()
+
     nodes = []
     for node in G.nodes:
         data = G.nodes[node]
@@ -309,13 +490,9 @@ def graph_to_json(G: nx.DiGraph) -> Dict:
             "negated": data.get("negated", False),
         })
 
-    all_formulas = []
-
-    for node in G.nodes:
-        fs = G.nodes[node].get("formulas", [])
-        for f in fs:
-            if f not in all_formulas:
-                all_formulas.append(f)
+    all_formulas = list(dict.fromkeys(
+        f for node in G.nodes for f in G.nodes[node].get("formulas", [])
+    ))
 
     return {
         "nodes": nodes,
@@ -6,7 +6,7 @@ organise concepts into a tree under document_root.
 """
 
 import re
-from typing import Dict, List, Optional, Tuple
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
 
 from utils import normalize_concept
 
@@ -116,15 +116,24 @@ class HeadingNode:
         }
 
 
-def segment_by_headings(text: str) -> Tuple[HeadingNode, List[str]]:
+def iter_sections(
+    lines: Iterable[str],
+    root: HeadingNode,
+    flat_headings: List[str],
+    max_sentences: Optional[int] = None,
+) -> Iterator[Tuple[HeadingNode, List[str]]]:
     """
-    Parse *text* into a heading hierarchy.
+    Stream *lines* into the heading hierarchy below *root*.
+
+    Yields ``(node, sentences)`` whenever a section ends, so only one
+    section's sentences are held at a time.  With *max_sentences*, long
+    sections are yielded in chunks of at most that many sentences.  The
+    heading tree and *flat_headings* are built as a side effect; the
+    nodes' own ``sentences`` lists are left untouched.
     """
-    root = HeadingNode("Document_Root", level=0)
     current_node = root
-    flat_headings: List[str] = []
+    buffer: List[str] = []
 
-    lines = text.split("\n")
     for line in lines:
         stripped = line.strip()
         if not stripped:
@@ -136,6 +145,10 @@ def segment_by_headings(text: str) -> Tuple[HeadingNode, List[str]]:
             if not heading_text:
                 continue
             heading_text = normalize_concept(heading_text)
+
+            if buffer:
+                yield current_node, buffer
+                buffer = []
             flat_headings.append(heading_text)
 
             node = HeadingNode(heading_text, level)
@@ -148,7 +161,24 @@ def segment_by_headings(text: str) -> Tuple[HeadingNode, List[str]]:
             current_node = node
         else:
             # Regular sentence → attach to current section
-            current_node.sentences.append(stripped)
+            buffer.append(stripped)
+            if max_sentences and len(buffer) >= max_sentences:
+                yield current_node, buffer
+                buffer = []
+
+    if buffer:
+        yield current_node, buffer
+
+
+def segment_by_headings(text: str) -> Tuple[HeadingNode, List[str]]:
+    """
+    Parse *text* into a heading hierarchy.
+    """
+    root = HeadingNode("Document_Root", level=0)
+    flat_headings: List[str] = []
+
+    for node, sentences in iter_sections(text.split("\n"), root, flat_headings):
+        node.sentences.extend(sentences)
 
     return root, flat_headings
 
@@ -0,0 +1,343 @@
+"""
+Job Manager – runs concept-map extractions in a local process pool.
+
+Responsibilities:
+  - Accept extraction jobs and return a job id immediately
+  - Run jobs in worker processes that each load the spaCy model once
+  - Track per-stage progress reported by the pipeline
+  - Bound the number of queued jobs (callers get QueueFullError)
+  - Keep finished results for a limited time
+  - Merge the graphs of jobs that name a corpus document into the
+    corpus store (opened by each worker)
+  - Serve one manager to several web server processes, so a job can be
+    polled from any of them
+"""
+
+import multiprocessing
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing.managers import BaseManager
+from typing import Dict, Optional
+
+from uploads import remove_quietly
+from utils import DEFAULT_PROFILE, JOB_QUEUE_SIZE, JOB_RESULT_TTL
+
+
+class QueueFullError(Exception):
+    """Raised when the job queue is at capacity."""
+
+
+# ---------------------------------------------------------------------------
+# Worker side
+# ---------------------------------------------------------------------------
+
+_progress_queue = None
+_corpus_path = ""
+_corpus = None
+
+
+def _init_worker(progress_queue, profile: str, corpus_path: str = ""):
+    """Pool initializer: remember the progress queue and load the model once."""
+    global _progress_queue, _corpus_path
+    _progress_queue = progress_queue
+    _corpus_path = corpus_path
+
+    from document_graph_builder import get_nlp
+    get_nlp(profile)
+
+
+def _run_job(job_id: str, kind: str, payload, options: Dict) -> Dict:
+    """Execute one extraction inside a worker process."""
+    from corpus_store import document_record
+    from document_graph_builder import process_text, process_text_file, process_pdf
+
+    def progress(stage: str, info: Dict):
+        _progress_queue.put((job_id, stage, info, time.time()))
+
+    corpus_document = options.pop("corpus_document", None)
+    if corpus_document and _corpus_path:
+        options["graph_sink"] = lambda *graph: _worker_corpus().add_document(
+            corpus_document, document_record(*graph)
+        )
+
+    progress("started", {"pid": os.getpid()})
+    if kind == "pdf":
+        return process_pdf(payload, progress=progress, **options)
+    if kind == "text_file":
+        return process_text_file(payload, progress=progress, **options)
+    return process_text(payload, progress=progress, **options)
+
+
+def _worker_corpus():
+    """This worker's connection to the corpus store, opened on first use."""
+    global _corpus
+    if _corpus is None:
+        from corpus_store import CorpusStore
+        _corpus = CorpusStore(_corpus_path)
+    return _corpus
+
+
+# ---------------------------------------------------------------------------
+# Manager
+# ---------------------------------------------------------------------------
+
+class JobManager:
+    """
+    Submit extraction jobs to a process pool and track their state.
+
+    At most ``max_workers + max_queued`` jobs may be pending or running;
+    further submissions raise ``QueueFullError`` so the HTTP layer can
+    answer 429.  Workers use the "spawn" start method so forking never
+    happens from a multi-threaded server process.  When a worker dies,
+    the jobs in the pool fail and the next submission starts a new pool.
+    """
+
+    def __init__(
+        self,
+        max_workers: Optional[int] = None,
+        max_queued: int = JOB_QUEUE_SIZE,
+        profile: str = DEFAULT_PROFILE,
+        result_ttl: float = JOB_RESULT_TTL,
+        corpus_path: str = "",
+    ):
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.max_queued = max_queued
+        self.result_ttl = result_ttl
+
+        self._ctx = multiprocessing.get_context("spawn")
+        self._progress_queue = self._ctx.Queue()
+        self._initargs = (self._progress_queue, profile, corpus_path)
+        self._executor = self._new_executor()
+        self._jobs: Dict[str, Dict] = {}
+        self._results: Dict[str, Dict] = {}
+        self._lock = threading.Lock()
+
+        self._listener = threading.Thread(target=self._drain_progress, daemon=True)
+        self._listener.start()
+
+    # ------------------------------------------------------------------
+    # Public API
+    # ------------------------------------------------------------------
+
+    def submit(self, kind: str, payload, options: Dict, temp_path: Optional[str] = None) -> str:
+        """
+        Queue a "text", "text_file" or "pdf" job and return its id.
+
+        *temp_path* (e.g. a spooled upload passed as the payload) is
+        removed once the job has finished, or at once if it is rejected.
+        """
+        # Each worker already runs in its own process; nested spaCy or
+        # section multiprocessing would only oversubscribe the cores.
+        options = dict(options, n_process=1, section_workers=0)
+        # Incremental section results live in the web process, not here
+        options.pop("document_id", None)
+        if kind == "pdf":
+            options["pdf_workers"] = 0
+
+        with self._lock:
+            self._purge_expired()
+            active = sum(1 for j in self._jobs.values() if j["status"] in ("queued", "running"))
+            if active >= self.max_workers + self.max_queued:
+                remove_quietly(temp_path)
+                raise QueueFullError(
+                    f"Job queue is full ({active} jobs pending or running)."
+                )
+
+            job_id = uuid.uuid4().hex
+            try:
+                try:
+                    future = self._executor.submit(_run_job, job_id, kind, payload, options)
+                except BrokenProcessPool:
+                    # A worker died (killed for memory, crashed in a native
+                    # library) and took the pool down; its jobs have failed.
+                    self._executor = self._new_executor()
+                    future = self._executor.submit(_run_job, job_id, kind, payload, options)
+            except BaseException:
+                remove_quietly(temp_path)
+                raise
+            # Recorded only once submitted, so a failed submit leaves no
+            # job counted as queued
+            self._jobs[job_id] = {
+                "id": job_id,
+                "kind": kind,
+                "status": "queued",
+                "stage": None,
+                "stages": {},
+                "submitted_at": time.time(),
+                "started_at": None,
+                "finished_at": None,
+                "error": None,
+            }
+        future.add_done_callback(lambda f, job_id=job_id: self._finish(job_id, f, temp_path))
+        return job_id
+
+    def status(self, job_id: str) -> Optional[Dict]:
+        """Snapshot of a job's state, or None if unknown / expired."""
+        with self._lock:
+            self._purge_expired()
+            job = self._jobs.get(job_id)
+            if job is None:
+                return None
+            snapshot = dict(job)
+            snapshot["stages"] = {k: dict(v) for k, v in job["stages"].items()}
+            return snapshot
+
+    def result(self, job_id: str) -> Optional[Dict]:
+        """Concept-map result of a finished job (None if not available)."""
+        with self._lock:
+            self._purge_expired()
+            return self._results.get(job_id)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            self._purge_expired()
+            counts: Dict[str, int] = {}
+            for job in self._jobs.values():
+                counts[job["status"]] = counts.get(job["status"], 0) + 1
+            return {
+                "workers": self.max_workers,
+                "max_queued": self.max_queued,
+                "jobs": counts,
+            }
+
+    def shutdown(self, wait: bool = True):
+        self._executor.shutdown(wait=wait)
+
+    # ------------------------------------------------------------------
+    # Internal helpers
+    # ------------------------------------------------------------------
+
+    def _new_executor(self) -> ProcessPoolExecutor:
+        return ProcessPoolExecutor(
+            max_workers=self.max_workers,
+            mp_context=self._ctx,
+            initializer=_init_worker,
+            initargs=self._initargs,
+        )
+
+    def _drain_progress(self):
+        """Background thread: apply progress events sent by the workers."""
+        while True:
+            try:
+                job_id, stage, info, timestamp = self._progress_queue.get()
+            except (EOFError, OSError):
+                return
+            with self._lock:
+                job = self._jobs.get(job_id)
+                if job is None:
+                    continue
+                if stage == "started":
+                    # Events can arrive after the job already finished
+                    if job["status"] == "queued":
+                        job["status"] = "running"
+                    job["started_at"] = timestamp
+                    continue
+                previous = job["stage"]
+                if previous is not None and previous != stage:
+                    job["stages"][previous]["finished_at"] = timestamp
+                entry = job["stages"].setdefault(stage, {"started_at": timestamp})
+                entry.update(info)
+                entry["updated_at"] = timestamp
+                job["stage"] = stage
+
+    def _finish(self, job_id: str, future, temp_path: Optional[str] = None):
+        remove_quietly(temp_path)
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return
+            job["finished_at"] = time.time()
+            if job["stage"] is not None:
+                job["stages"][job["stage"]].setdefault("finished_at", job["finished_at"])
+            exc = future.exception()
+            if isinstance(exc, BrokenProcessPool):
+                # Every job of the pool fails, not only the one whose
+                # worker died; the next submit starts a new pool.
+                job["status"] = "failed"
+                job["error"] = "A worker process died (out of memory or a crash); the job was lost."
+            elif exc is not None:
+                job["status"] = "failed"
+                job["error"] = str(exc)
+            else:
+                job["status"] = "done"
+                self._results[job_id] = future.result()
+
+    def _purge_expired(self):
+        """Drop finished jobs older than the result TTL (lock must be held)."""
+        cutoff = time.time() - self.result_ttl
+        expired = [
+            job_id for job_id, job in self._jobs.items()
+            if job["finished_at"] is not None and job["finished_at"] < cutoff
+        ]
+        for job_id in expired:
+            self._jobs.pop(job_id, None)
+            self._results.pop(job_id, None)
+
+
+# ---------------------------------------------------------------------------
+# One manager shared by several server processes
+# ---------------------------------------------------------------------------
+
+_shared_options: Dict = {}
+_shared_manager: Optional[JobManager] = None
+
+
+def _configure_shared(options: Dict):
+    """Server-process initializer: remember the JobManager arguments."""
+    global _shared_options
+    _shared_options = options
+
+
+def _get_shared_manager() -> JobManager:
+    global _shared_manager
+    if _shared_manager is None:
+        _shared_manager = JobManager(**_shared_options)
+    return _shared_manager
+
+
+class JobServer(BaseManager):
+    """
+    Runs one ``JobManager`` in a server process of its own; pre-forked web
+    workers reach it through proxies (``connect_job_server``), so jobs,
+    their progress and their results are the same whichever worker a
+    request lands on.  Exceptions such as ``QueueFullError`` are raised
+    again in the caller.
+    """
+
+
+JobServer.register(
+    "job_manager", callable=_get_shared_manager,
+    exposed=("submit", "status", "result", "stats", "shutdown"),
+)
+
+
+def start_job_server(**options) -> JobServer:
+    """
+    Start a ``JobServer`` whose manager is ``JobManager(**options)``.
+
+    Processes forked from this one afterwards share its authentication
+    key and can connect to ``server.address``.  Stop it with
+    ``stop_job_server``.
+    """
+    server = JobServer(ctx=multiprocessing.get_context("spawn"))
+    server.start(_configure_shared, (options,))
+    return server
+
+
+def stop_job_server(server: JobServer):
+    """Shut down the manager's worker pool, then the server process."""
+    try:
+        connect_job_server(server.address).shutdown()
+    finally:
+        server.shutdown()
+
+
+def connect_job_server(address) -> JobManager:
+    """Proxy for the manager of the ``JobServer`` at *address*."""
+    client = JobServer(address=address)
+    client.connect()
+    return client.job_manager()
@@ -0,0 +1,289 @@
+"""
+Louvain – modularity-based community detection with warm starts.
+
+Responsibilities:
+  - Run the Louvain method on an undirected graph given as node indices
+    and edge pairs, visiting nodes in a fixed order so results are
+    reproducible
+  - Start from a previous partition instead of singletons when one is
+    given, so a slightly changed graph converges in a pass or two
+  - Stop early under a level / time budget (the partition found so far
+    is always valid)
+  - Report modularity, levels, passes and time
+  - Relabel communities to best match previous labels, so cluster ids
+    (and colours in the UI) stay put across runs
+"""
+
+import time
+from typing import Dict, Hashable, Iterable, List, Optional, Sequence, Tuple
+
+from utils import LOUVAIN_RESOLUTION, LOUVAIN_MAX_LEVELS, LOUVAIN_TIME_BUDGET
+
+# Smallest modularity gain that counts as progress (as in python-louvain)
+_MIN_GAIN = 1e-7
+
+# Nodes moved between two deadline checks
+_CHECK_EVERY = 1024
+
+# adjacency[u] maps neighbour v to A[u][v]; an undirected self-loop is
+# stored as A[u][u] = 2, so that every degree is the row sum.
+Adjacency = List[Dict[int, float]]
+
+
+def build_adjacency(n: int, edges: Iterable[Tuple[int, int]]) -> Adjacency:
+    """
+    Binary symmetric adjacency over nodes 0 .. *n* - 1.
+
+    Repeated and reciprocal pairs collapse into one undirected edge, as
+    in ``G.to_undirected()``.
+    """
+    adjacency: Adjacency = [{} for _ in range(n)]
+    for u, v in edges:
+        if u == v:
+            adjacency[u][u] = 2.0
+        else:
+            adjacency[u][v] = 1.0
+            adjacency[v][u] = 1.0
+    return adjacency
+
+
+def modularity(adjacency: Adjacency, membership: Sequence[int], resolution: float = 1.0) -> float:
+    """Newman modularity of *membership* (node -> community)."""
+    two_m = sum(sum(row.values()) for row in adjacency)
+    if not two_m:
+        return 0.0
+    internal: Dict[int, float] = {}
+    total: Dict[int, float] = {}
+    for u, row in enumerate(adjacency):
+        c = membership[u]
+        total[c] = total.get(c, 0.0) + sum(row.values())
+        inside = sum(w for v, w in row.items() if membership[v] == c)
+        internal[c] = internal.get(c, 0.0) + inside
+    return sum(
+        internal.get(c, 0.0) / two_m - resolution * (tot / two_m) ** 2
+        for c, tot in total.items()
+    )
+
+
+def _collapsed_modularity(collapsed: Adjacency, resolution: float) -> float:
+    """Modularity of a partition, given the graph with each community collapsed."""
+    two_m = sum(sum(row.values()) for row in collapsed)
+    if not two_m:
+        return 0.0
+    return sum(
+        row.get(c, 0.0) / two_m - resolution * (sum(row.values()) / two_m) ** 2
+        for c, row in enumerate(collapsed)
+    )
+
+
+# ---------------------------------------------------------------------------
+# One level: local moving
+# ---------------------------------------------------------------------------
+
+def _move_nodes(
+    adjacency: Adjacency,
+    community: List[int],
+    resolution: float,
+    deadline: Optional[float],
+) -> Tuple[int, int, bool]:
+    """
+    Move single nodes to the neighbouring community with the best
+    modularity gain until no move helps.
+
+    *community* is updated in place.  Returns (moves, passes, whether the
+    deadline was hit).
+    """
+    degree = [sum(row.values()) for row in adjacency]
+    two_m = sum(degree)
+    if not two_m:
+        return 0, 0, False
+    total: Dict[int, float] = {}
+    for u, c in enumerate(community):
+        total[c] = total.get(c, 0.0) + degree[u]
+
+    moves = passes = 0
+    visited = 0
+    while True:
+        passes += 1
+        moved = False
+        for u, row in enumerate(adjacency):
+            visited += 1
+            if deadline is not None and visited % _CHECK_EVERY == 0 and time.perf_counter() > deadline:
+                return moves, passes, True
+
+            links: Dict[int, float] = {}
+            for v, w in row.items():
+                if v != u:
+                    links[community[v]] = links.get(community[v], 0.0) + w
+
+            current = community[u]
+            k = degree[u] * resolution / two_m
+            total[current] -= degree[u]
+            best, best_gain = current, links.get(current, 0.0) - total[current] * k
+            for c, weight in links.items():
+                gain = weight - total[c] * k
+                if gain > best_gain + _MIN_GAIN:
+                    best, best_gain = c, gain
+            total[best] += degree[u]
+            if best != current:
+                community[u] = best
+                moves += 1
+                moved = True
+        if not moved:
+            return moves, passes, False
+        if deadline is not None and time.perf_counter() > deadline:
+            return moves, passes, True
+
+
+def _aggregate(adjacency: Adjacency, community: List[int]) -> Tuple[Adjacency, List[int]]:
+    """
+    Collapse each community into one node.
+
+    Returns the new adjacency and the renumbered community of every node
+    (numbered by first appearance).
+    """
+    renumber: Dict[int, int] = {}
+    for c in community:
+        renumber.setdefault(c, len(renumber))
+    dense = [renumber[c] for c in community]
+
+    collapsed: Adjacency = [{} for _ in range(len(renumber))]
+    for u, row in enumerate(adjacency):
+        cu = collapsed[dense[u]]
+        for v, w in row.items():
+            cv = dense[v]
+            cu[cv] = cu.get(cv, 0.0) + w
+    return collapsed, dense
+
+
+# ---------------------------------------------------------------------------
+# Public API
+# ---------------------------------------------------------------------------
+
+def louvain(
+    adjacency: Adjacency,
+    initial: Optional[Sequence[int]] = None,
+    resolution: float = LOUVAIN_RESOLUTION,
+    max_levels: int = LOUVAIN_MAX_LEVELS,
+    time_budget: float = LOUVAIN_TIME_BUDGET,
+) -> Tuple[List[int], Dict]:
+    """
+    Louvain communities of the graph given by *adjacency*.
+
+    *initial* (node -> community, any integers) is used as the starting
+    partition instead of one community per node; the first level then
+    only has to move the nodes whose neighbourhood changed.  At most
+    *max_levels* aggregation levels run (0 = until modularity stops
+    improving) and node moving stops after *time_budget* seconds (0 = no
+    limit); the partition reached is then collapsed and scored.
+
+    Returns
+    -------
+    membership : list[int]
+        Community of every node, numbered by first appearance.
+    info : dict
+        modularity, levels, passes, moves, seconds, warm_start and
+        budget_exhausted (whether a budget cut the run short).
+    """
+    start = time.perf_counter()
+    deadline = start + time_budget if time_budget > 0 else None
+    n = len(adjacency)
+
+    if initial is not None:
+        # Nodes without edges cannot be moved, so they never inherit a label
+        community = list(initial)
+        fresh = max(community, default=-1) + 1
+        for u, row in enumerate(adjacency):
+            if not row:
+                community[u] = fresh
+                fresh += 1
+    else:
+        community = list(range(n))
+    membership = list(range(n))
+    current = adjacency
+    levels = passes = moves = 0
+    exhausted = False
+
+    while True:
+        level_moves, level_passes, exhausted = _move_nodes(current, community, resolution, deadline)
+        passes += level_passes
+        moves += level_moves
+        levels += 1
+        current, dense = _aggregate(current, community)
+        membership = [dense[c] for c in membership]
+        if exhausted or len(current) == len(dense):
+            break
+        if max_levels and levels >= max_levels:
+            exhausted = True
+            break
+        if deadline is not None and time.perf_counter() > deadline:
+            exhausted = True
+            break
+        community = list(range(len(current)))
+
+    info = {
+        # Each community of the final level is one node of *current*
+        "modularity": round(_collapsed_modularity(current, resolution), 6),
+        "levels": levels,
+        "passes": passes,
+        "moves": moves,
+        "seconds": round(time.perf_counter() - start, 6),
+        "warm_start": initial is not None,
+        "budget_exhausted": exhausted,
+    }
+    return membership, info
+
+
+def seed_membership(nodes: Sequence[Hashable], previous: Dict[Hashable, int]) -> List[int]:
+    """
+    Starting partition from *previous* labels: known nodes keep their
+    label, new nodes start in a community of their own.
+    """
+    fresh = max(previous.values(), default=-1) + 1
+    seeded = []
+    for node in nodes:
+        label = previous.get(node)
+        if label is None:
+            label = fresh
+            fresh += 1
+        seeded.append(label)
+    return seeded
+
+
+def align_labels(
+    nodes: Sequence[Hashable],
+    membership: Sequence[int],
+    previous: Optional[Dict[Hashable, int]] = None,
+) -> Dict[Hashable, int]:
+    """
+    node -> cluster id, with ids chosen to match *previous* labels.
+
+    Communities are matched to previous labels greedily by the number of
+    nodes they share (largest overlap first), each previous label used
+    at most once.  Unmatched communities get the smallest ids still free.
+    Without *previous* ids follow *membership*.
+    """
+    if not previous:
+        return {node: c for node, c in zip(nodes, membership)}
+
+    overlap: Dict[Tuple[int, int], int] = {}
+    for node, c in zip(nodes, membership):
+        label = previous.get(node)
+        if label is not None:
+            overlap[c, label] = overlap.get((c, label), 0) + 1
+
+    assigned: Dict[int, int] = {}
+    taken = set()
+    for (c, label), _ in sorted(overlap.items(), key=lambda item: (-item[1], item[0])):
+        if c not in assigned and label not in taken:
+            assigned[c] = label
+            taken.add(label)
+
+    next_free = 0
+    for c in dict.fromkeys(membership):
+        if c not in assigned:
+            while next_free in taken:
+                next_free += 1
+            assigned[c] = next_free
+            taken.add(next_free)
+    return {node: assigned[c] for node, c in zip(nodes, membership)}
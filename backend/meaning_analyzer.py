@@ -10,10 +10,10 @@ Responsibilities:
   - Formula detection
 """
 
-from typing import Dict, List, Optional, Set, Tuple
+from typing import Dict, Iterable, List, Optional, Sequence, Set, Tuple, Union
 
 import spacy
-from spacy.tokens import Doc, Token
+from spacy.tokens import Doc, Span, Token
 
 from utils import (
     ALLOWED_RELATIONS,
@@ -22,8 +22,12 @@ from utils import (
     normalize_concept,
     is_valid_concept,
     detect_formulas,
+    NLP_BATCH_SIZE,
+    NLP_N_PROCESS,
 )
-from concept_extractor import extract_concepts_from_doc
+from concept_extractor import extract_concepts_from_doc, get_raw_phrases
+from preprocessor import iter_parsed, parse_texts
+from parse_cache import ParseCache, SentenceParse, text_key
 
 
 # ---------------------------------------------------------------------------
@@ -86,13 +90,33 @@ def _find_objects(verb: Token) -> List[Token]:
     return objs
 
 
+_CHUNK_INDEX_KEY = "cscme_noun_chunk_index"
+
+
+def _noun_chunk_index(doc: Doc) -> List[Optional[str]]:
+    """
+    Token position -> text of the noun chunk containing it (or None).
+
+    Built once per Doc and kept in ``doc.user_data``, so phrase lookups
+    are O(1) instead of re-running ``doc.noun_chunks`` for every token.
+    """
+    index = doc.user_data.get(_CHUNK_INDEX_KEY)
+    if index is None:
+        index = [None] * len(doc)
+        for chunk in doc.noun_chunks:
+            for i in range(chunk.start, chunk.end):
+                if index[i] is None:
+                    index[i] = chunk.text
+        doc.user_data[_CHUNK_INDEX_KEY] = index
+    return index
+
+
 def _get_full_phrase(token: Token) -> str:
     """Reconstruct the full noun-phrase around *token* using its subtree."""
     # Use the noun chunk that contains this token if available
-    doc = token.doc
-    for chunk in doc.noun_chunks:
-        if chunk.start <= token.i < chunk.end:
-            return chunk.text
+    chunk_text = _noun_chunk_index(token.doc)[token.i]
+    if chunk_text is not None:
+        return chunk_text
 
     # Fallback: collect compound + amod children on the left + token
     parts = []
@@ -268,6 +292,22 @@ def _is_negated(verb: Token) -> bool:
     return False
 
 
+# ---------------------------------------------------------------------------
+# Pronoun subjects
+# ---------------------------------------------------------------------------
+
+def _pronoun_subjects(doc: Union[Doc, Span]) -> List[Tuple[int, str]]:
+    """(position, text) of the pronoun subjects that may need resolving.
+    Relative pronouns ('that', 'which') inside clauses are skipped."""
+    pronouns = []
+    for pos, token in enumerate(doc):
+        if token.pos_ == "PRON" and token.dep_ in ("nsubj", "nsubjpass"):
+            if token.text.lower() in ("that", "which", "who", "whom", "whose"):
+                continue
+            pronouns.append((pos, token.text))
+    return pronouns
+
+
 # ---------------------------------------------------------------------------
 # Public API
 # ---------------------------------------------------------------------------
@@ -277,17 +317,96 @@ class MeaningAnalyzer:
     Analyse sentences to extract semantic relations and concept descriptions.
     """
 
-    def __init__(self, nlp: spacy.language.Language):
+    def __init__(
+        self,
+        nlp: spacy.language.Language,
+        batch_size: int = NLP_BATCH_SIZE,
+        n_process: int = NLP_N_PROCESS,
+        cache: Optional[ParseCache] = None,
+    ):
         self.nlp = nlp
+        self.batch_size = batch_size
+        self.n_process = n_process
+        self.cache = cache
         self.context = ContextTracker()
 
+    def parse_sentence(self, doc: Union[Doc, Span]) -> SentenceParse:
+        """Collect the parse artifacts the pipeline needs from one sentence."""
+        # Relations, relative clauses and conjunctions
+        triples = self._extract_relations(doc)
+        triples.extend(_extract_relcl_relations(doc))
+        triples = _expand_conjunctions(triples, doc)
+
+        # Relation types of negated verbs
+        negated = []
+        for token in doc:
+            if token.pos_ == "VERB" and _is_negated(token):
+                rel_type = _map_verb_to_relation(token)
+                if rel_type:
+                    negated.append(rel_type)
+
+        noun_chunks, compound_phrases = get_raw_phrases(doc)
+        pronouns = _pronoun_subjects(doc)
+        tokens = [(t.text, t.whitespace_) for t in doc] if pronouns else []
+        text = doc.text.strip()
+
+        return SentenceParse(
+            text=text,
+            noun_chunks=noun_chunks,
+            compound_phrases=compound_phrases,
+            concepts=extract_concepts_from_doc(doc),
+            triples=triples,
+            negated_relations=negated,
+            pronouns=pronouns,
+            tokens=tokens,
+            formulas=detect_formulas(text),
+        )
+
+    def parse_lines(self, lines: Iterable[str]) -> List[SentenceParse]:
+        """
+        Parse body lines and return the artifacts of their sentences.
+
+        Each line is parsed once, in context, and split into sentences
+        (as ``segment_lines`` does).  With a cache, lines seen before –
+        in this or any earlier document – are not parsed again.
+        """
+        lines = list(lines)
+        per_line: List[Optional[List[SentenceParse]]] = [None] * len(lines)
+        keys = [None] * len(lines)
+        misses: List[int] = []
+
+        for i, line in enumerate(lines):
+            if self.cache is not None:
+                keys[i] = text_key("line", line)
+                per_line[i] = self.cache.get(keys[i])
+            if per_line[i] is None:
+                misses.append(i)
+
+        docs = parse_texts((lines[i] for i in misses), self.nlp, self.batch_size, self.n_process)
+        for i, doc in zip(misses, docs):
+            per_line[i] = [
+                self.parse_sentence(sent) for sent in doc.sents if sent.text.strip()
+            ]
+            if self.cache is not None:
+                self.cache.put(keys[i], per_line[i])
+
+        return [parse for sentences in per_line for parse in sentences]
+
     def analyze_sentences(
         self,
-        sentences: List[str],
+        sentences: Sequence[Union[str, Span, SentenceParse]],
     ) -> Tuple[List[Dict], Dict[str, List[str]], Dict[str, List[str]]]:
         """
         Analyse a list of sentences.
 
+        Sentences may be raw strings, already-parsed spaCy spans or the
+        ``SentenceParse`` artifacts returned by ``parse_lines``.  Spans and
+        artifacts are analysed without re-parsing; raw strings are parsed
+        up front in batches.  Sentences are still analysed one by one in
+        document order, so the context tracker sees them exactly as before
+        and spaCy only runs again when pronoun resolution rewrites a
+        sentence into text that is not cached yet.
+
         Returns
         -------
         relations : list[dict]
@@ -301,30 +420,30 @@ class MeaningAnalyzer:
         descriptions: Dict[str, List[str]] = {}
         formulas: Dict[str, List[str]] = {}
 
-        for sent_text in sentences:
-            # Detect paragraph boundaries (crude: blank-line separated)
-            if not sent_text.strip():
-                continue
+        # Detect paragraph boundaries (crude: blank-line separated)
+        sentences = [
+            s for s in sentences
+            if (s if isinstance(s, str) else s.text).strip()
+        ]
+        parsed = iter_parsed(sentences, self.nlp, self.batch_size, self.n_process)
+
+        for sentence, doc in zip(sentences, parsed):
+            sent_text = sentence if isinstance(sentence, str) else sentence.text.strip()
+            parse = doc if isinstance(doc, SentenceParse) else self.parse_sentence(doc)
 
-            doc = self.nlp(sent_text)
+            # --- Formula detection (done when the sentence was parsed) ---
+            if parse.text == sent_text:
+                found_formulas = list(parse.formulas)
+            else:
+                found_formulas = detect_formulas(sent_text)
 
             # --- Pronoun resolution ---
-            resolved_text = self._resolve_pronouns(doc)
+            resolved_text = self._resolve_pronouns(parse)
             if resolved_text != sent_text:
-                doc = self.nlp(resolved_text)
-
-            # --- Formula detection ---
-            found_formulas = detect_formulas(sent_text)
+                parse = self._parse_resolved(resolved_text)
 
-            # --- Extract relations from this sentence ---
-            sent_relations = self._extract_relations(doc)
-
-            # --- Relative-clause relations ---
-            relcl_rels = _extract_relcl_relations(doc)
-            sent_relations.extend(relcl_rels)
-
-            # --- Expand conjunctions ---
-            sent_relations = _expand_conjunctions(sent_relations, doc)
+            # --- Relations, relative clauses and conjunctions ---
+            sent_relations = parse.triples
 
             # --- Normalise & validate ---
             valid_rels = []
@@ -351,19 +470,16 @@ class MeaningAnalyzer:
                         })
 
             # Check negation for each relation
-            for token in doc:
-                if token.pos_ == "VERB" and _is_negated(token):
-                    # Mark any relation whose verb matches as negated
-                    rel_type = _map_verb_to_relation(token)
-                    if rel_type:
-                        for r in valid_rels:
-                            if r["relation"] == rel_type:
-                                r["negated"] = True
+            for rel_type in parse.negated_relations:
+                # Mark any relation whose verb matches as negated
+                for r in valid_rels:
+                    if r["relation"] == rel_type:
+                        r["negated"] = True
 
             all_relations.extend(valid_rels)
 
             # --- Description fallback ---
-            concepts_in_sent = extract_concepts_from_doc(doc)
+            concepts_in_sent = parse.concepts
             if not valid_rels and concepts_in_sent:
                 # No relations extracted → store sentence as description
                 for concept in concepts_in_sent:
@@ -394,36 +510,42 @@ class MeaningAnalyzer:
     # Internal helpers
     # ------------------------------------------------------------------
 
-    def _resolve_pronouns(self, doc: Doc) -> str:
+    def _resolve_pronouns(self, parse: SentenceParse) -> str:
         """Replace anaphoric pronouns with the last known subject.
         Does NOT resolve relative pronouns ('that', 'which') inside clauses."""
-        tokens = list(doc)
         replacements: Dict[int, str] = {}
 
-        for token in tokens:
-            if token.pos_ == "PRON" and token.dep_ in ("nsubj", "nsubjpass"):
-                # Skip relative pronouns inside relative clauses
-                if token.text.lower() in ("that", "which", "who", "whom", "whose"):
-                    continue
-                resolved = self.context.resolve_pronoun(token.text)
-                if resolved:
-                    replacements[token.i] = resolved
+        for pos, pronoun in parse.pronouns:
+            resolved = self.context.resolve_pronoun(pronoun)
+            if resolved:
+                replacements[pos] = resolved
 
         if not replacements:
-            return doc.text
+            return parse.text
 
         parts = []
-        for token in tokens:
-            if token.i in replacements:
+        for pos, (text, ws) in enumerate(parse.tokens):
+            if pos in replacements:
                 # Preserve original trailing whitespace
-                ws = token.whitespace_
-                parts.append(replacements[token.i] + ws)
+                parts.append(replacements[pos] + ws)
             else:
-                parts.append(token.text_with_ws)
+                parts.append(text + ws)
 
         return "".join(parts).strip()
 
-    def _extract_relations(self, doc: Doc) -> List[Tuple[str, str, str]]:
+    def _parse_resolved(self, resolved_text: str) -> SentenceParse:
+        """Artifacts of a pronoun-resolved sentence, parsed on its own."""
+        key = text_key("resolved", resolved_text) if self.cache is not None else None
+        if key is not None:
+            cached = self.cache.get(key)
+            if cached is not None:
+                return cached[0]
+        parse = self.parse_sentence(self.nlp(resolved_text))
+        if key is not None:
+            self.cache.put(key, [parse])
+        return parse
+
+    def _extract_relations(self, doc: Union[Doc, Span]) -> List[Tuple[str, str, str]]:
         """Extract (source, relation, target) triples from a doc."""
         relations: List[Tuple[str, str, str]] = []
 
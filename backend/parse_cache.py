@@ -0,0 +1,123 @@
+"""
+Parse Cache – sentence-level parse artifacts shared across documents.
+
+Responsibilities:
+  - Hold everything the pipeline reads from a parsed sentence (noun
+    phrases, concepts, raw relation triples, negated relations and the
+    pronoun subjects needed for context-dependent resolution)
+  - Cache those artifacts by text hash in a bounded LRU, so repeated
+    boilerplate is never parsed by spaCy twice
+"""
+
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Dict, Hashable, List, Optional, Sequence, Tuple
+
+from utils import PARSE_CACHE_SIZE
+
+
+# ---------------------------------------------------------------------------
+# Parse artifacts
+# ---------------------------------------------------------------------------
+
+class SentenceParse:
+    """
+    Parse-derived artifacts of one sentence.
+
+    ``formulas`` holds ``detect_formulas(text)``, so cached sentences are
+    not scanned again.
+    ``tokens`` (text, trailing whitespace) is only kept when the sentence
+    has pronoun subjects, since it is needed solely to rewrite them.
+    ``pronouns`` lists (token position, pronoun text) for those subjects.
+    """
+
+    __slots__ = (
+        "text", "noun_chunks", "compound_phrases", "concepts",
+        "triples", "negated_relations", "pronouns", "tokens", "formulas",
+    )
+
+    def __init__(
+        self,
+        text: str,
+        noun_chunks: Sequence[str],
+        compound_phrases: Sequence[str],
+        concepts: Sequence[str],
+        triples: Sequence[Tuple[str, str, str]],
+        negated_relations: Sequence[str],
+        pronouns: Sequence[Tuple[int, str]] = (),
+        tokens: Sequence[Tuple[str, str]] = (),
+        formulas: Sequence[str] = (),
+    ):
+        self.text = text
+        self.noun_chunks = tuple(noun_chunks)
+        self.compound_phrases = tuple(compound_phrases)
+        self.concepts = tuple(concepts)
+        self.triples = tuple(triples)
+        self.negated_relations = tuple(negated_relations)
+        self.pronouns = tuple(pronouns)
+        self.tokens = tuple(tokens)
+        self.formulas = tuple(formulas)
+
+    def __repr__(self):
+        return f"SentenceParse({self.text!r})"
+
+
+# ---------------------------------------------------------------------------
+# Cache
+# ---------------------------------------------------------------------------
+
+def text_key(namespace: str, text: str) -> bytes:
+    """Fixed-size hash of *text*, so cached entries never hold the text twice."""
+    digest = hashlib.blake2b(namespace.encode("utf-8"), digest_size=16)
+    digest.update(b"\0")
+    digest.update(text.encode("utf-8"))
+    return digest.digest()
+
+
+class ParseCache:
+    """
+    Bounded LRU of parse artifacts keyed by text hash.
+
+    Values are lists of ``SentenceParse`` (a body line may hold several
+    sentences).  ``max_entries=0`` disables caching.
+    """
+
+    def __init__(self, max_entries: int = PARSE_CACHE_SIZE):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Hashable, List[SentenceParse]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Hashable) -> Optional[List[SentenceParse]]:
+        with self._lock:
+            value = self._entries.get(key)
+            if value is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key: Hashable, value: List[SentenceParse]):
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+            }
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
@@ -0,0 +1,226 @@
+"""
+PDF Ingest – page-by-page PDF text extraction.
+
+Responsibilities:
+  - Choose a text-extraction backend (PyMuPDF or pypdfium2 when
+    installed, PyPDF2 otherwise)
+  - Yield page text lazily, in page order, so the pipeline can start on
+    the first pages while later ones are still being extracted
+  - Extract page ranges in parallel worker processes for large PDFs
+  - Record how long each page took
+"""
+
+import io
+import multiprocessing
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Dict, Iterator, List, Optional, Tuple, Union
+
+from utils import PDF_BACKEND, PDF_WORKERS, PDF_PAGES_PER_TASK, PDF_PARALLEL_MIN_PAGES
+
+
+class PdfBackendError(Exception):
+    """Raised when no usable PDF backend is installed or the PDF cannot be opened."""
+
+
+# ---------------------------------------------------------------------------
+# Backends
+# ---------------------------------------------------------------------------
+# Each opener takes PDF bytes or a file path and returns (page count,
+# function page index -> text).
+
+PdfSource = Union[bytes, str]
+PageReader = Tuple[int, Callable[[int], str]]
+
+
+def _open_pymupdf(source: PdfSource) -> PageReader:
+    import fitz
+
+    if isinstance(source, str):
+        doc = fitz.open(source)
+    else:
+        doc = fitz.open(stream=source, filetype="pdf")
+    return doc.page_count, lambda i: doc[i].get_text()
+
+
+def _open_pypdfium2(source: PdfSource) -> PageReader:
+    import pypdfium2
+
+    doc = pypdfium2.PdfDocument(source)
+    return len(doc), lambda i: doc[i].get_textpage().get_text_range()
+
+
+def _open_pypdf2(source: PdfSource) -> PageReader:
+    from PyPDF2 import PdfReader
+
+    reader = PdfReader(source if isinstance(source, str) else io.BytesIO(source))
+    return len(reader.pages), lambda i: reader.pages[i].extract_text() or ""
+
+
+# Preference order for "auto": native extractors first
+_BACKENDS: Dict[str, Tuple[str, Callable[[PdfSource], PageReader]]] = {
+    "pymupdf": ("fitz", _open_pymupdf),
+    "pypdfium2": ("pypdfium2", _open_pypdfium2),
+    "pypdf2": ("PyPDF2", _open_pypdf2),
+}
+
+
+def available_backends() -> List[str]:
+    """Installed backends, fastest first."""
+    found = []
+    for name, (module, _) in _BACKENDS.items():
+        try:
+            __import__(module)
+        except ImportError:
+            continue
+        found.append(name)
+    return found
+
+
+def select_backend(preferred: str = PDF_BACKEND) -> str:
+    """
+    Resolve *preferred* ("auto" or a backend name) to an installed backend.
+
+    Raises ``PdfBackendError`` if nothing suitable is installed.
+    """
+    installed = available_backends()
+    if preferred == "auto":
+        if installed:
+            return installed[0]
+        raise PdfBackendError(
+            "No PDF backend is installed (PyPDF2, PyMuPDF or pypdfium2). "
+            "Cannot process PDF files."
+        )
+    if preferred not in _BACKENDS:
+        raise PdfBackendError(f"Unknown PDF backend '{preferred}'.")
+    if preferred not in installed:
+        raise PdfBackendError(f"PDF backend '{preferred}' is not installed.")
+    return preferred
+
+
+def _open(source: PdfSource, backend: str) -> PageReader:
+    try:
+        return _BACKENDS[backend][1](source)
+    except Exception as exc:
+        raise PdfBackendError(f"Could not open PDF: {exc}") from exc
+
+
+# ---------------------------------------------------------------------------
+# Worker side
+# ---------------------------------------------------------------------------
+
+_worker_reader: Optional[PageReader] = None
+
+
+def _init_worker(source: PdfSource, backend: str):
+    """Pool initializer: open the document once per worker."""
+    global _worker_reader
+    _worker_reader = _open(source, backend)
+
+
+def _read_pages(read_page: Callable[[int], str], start: int, stop: int) -> List[Tuple[str, float]]:
+    """(text, seconds) for pages *start* .. *stop* - 1."""
+    pages = []
+    for i in range(start, stop):
+        t0 = time.perf_counter()
+        text = read_page(i)
+        pages.append((text, time.perf_counter() - t0))
+    return pages
+
+
+def _read_range(start: int, stop: int) -> List[Tuple[str, float]]:
+    return _read_pages(_worker_reader[1], start, stop)
+
+
+# ---------------------------------------------------------------------------
+# Document
+# ---------------------------------------------------------------------------
+
+class PdfDocument:
+    """
+    A PDF opened for page-by-page extraction.
+
+    *source* is the PDF as bytes or the path of a PDF file.  Workers
+    open a path themselves, so only bytes sources are copied to them.
+
+    ``iter_pages()`` yields page text in order.  Documents with at least
+    ``PDF_PARALLEL_MIN_PAGES`` pages are split into ranges of
+    *pages_per_task* pages that *workers* processes extract concurrently
+    (at most two ranges per worker are in flight, so memory stays bounded
+    however long the PDF is).  Every page read is recorded in
+    ``page_timings`` as (page number, seconds, characters).
+    """
+
+    def __init__(self, source: PdfSource, backend: str = PDF_BACKEND):
+        self.source = source
+        self.backend = select_backend(backend)
+        self.page_count, self._read_page = _open(source, self.backend)
+        self.page_timings: List[Tuple[int, float, int]] = []
+        self.workers_used = 1
+
+    def limit_warnings(self, max_pages: Optional[int]) -> List[str]:
+        if max_pages is not None and self.page_count > max_pages:
+            return [
+                f"PDF has {self.page_count} pages; only the first "
+                f"{max_pages} will be processed."
+            ]
+        return []
+
+    def iter_pages(
+        self,
+        max_pages: Optional[int] = None,
+        workers: int = PDF_WORKERS,
+        pages_per_task: int = PDF_PAGES_PER_TASK,
+    ) -> Iterator[str]:
+        """Yield the text of each page (at most *max_pages*; None = all)."""
+        stop = self.page_count if max_pages is None else min(self.page_count, max_pages)
+        if workers < 0:
+            workers = os.cpu_count() or 1
+        ranges = [(s, min(s + pages_per_task, stop)) for s in range(0, stop, pages_per_task)]
+        workers = min(workers, len(ranges))
+
+        if workers <= 1 or stop < PDF_PARALLEL_MIN_PAGES:
+            batches = (_read_pages(self._read_page, s, e) for s, e in ranges)
+        else:
+            batches = self._parallel_batches(ranges, workers)
+
+        page_no = 0
+        for batch in batches:
+            for text, seconds in batch:
+                page_no += 1
+                self.page_timings.append((page_no, seconds, len(text)))
+                yield text
+
+    def _parallel_batches(self, ranges: List[Tuple[int, int]], workers: int):
+        self.workers_used = workers
+        # "spawn" so a pool is never forked from a multi-threaded server
+        executor = ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(self.source, self.backend),
+        )
+        try:
+            pending = deque()
+            for start, stop in ranges:
+                pending.append(executor.submit(_read_range, start, stop))
+                if len(pending) >= 2 * workers:
+                    yield pending.popleft().result()
+            while pending:
+                yield pending.popleft().result()
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def summary(self) -> Dict:
+        """Backend, page count and per-page extraction times (seconds) so far."""
+        page_seconds = [s for _, s, _ in self.page_timings]
+        return {
+            "backend": self.backend,
+            "pages": self.page_count,
+            "pages_read": len(page_seconds),
+            "workers": self.workers_used,
+            "extract_seconds": round(sum(page_seconds), 4),
+            "page_seconds": [round(s, 4) for s in page_seconds],
+        }
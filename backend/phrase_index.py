@@ -0,0 +1,78 @@
+"""
+Phrase Index – multi-pattern substring search over concept phrases.
+
+Responsibilities:
+  - Build an Aho-Corasick automaton over a fixed set of phrases
+  - Report every phrase that occurs inside a given text in one pass
+    (used to find phrases contained in longer ones without comparing
+    every pair)
+"""
+
+from collections import deque
+from typing import Dict, Iterable, Iterator, List, Optional
+
+
+class PhraseAutomaton:
+    """
+    Aho-Corasick automaton over *phrases* (matched case-sensitively).
+
+    ``iter_matches(text)`` yields every phrase occurring in *text*, once
+    per occurrence, in O(len(text) + matches) time regardless of how many
+    phrases the automaton holds.  An empty phrase, like ``"" in text``,
+    matches any text (it is reported once).
+    """
+
+    def __init__(self, phrases: Iterable[str]):
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._output: List[Optional[str]] = [None]
+        # Nearest state on the failure chain that ends a phrase (0 = none)
+        self._out_link: List[int] = [0]
+
+        for phrase in phrases:
+            self._insert(phrase)
+        self._build_links()
+
+    def _insert(self, phrase: str):
+        state = 0
+        for ch in phrase:
+            nxt = self._goto[state].get(ch)
+            if nxt is None:
+                nxt = len(self._goto)
+                self._goto.append({})
+                self._fail.append(0)
+                self._output.append(None)
+                self._out_link.append(0)
+                self._goto[state][ch] = nxt
+            state = nxt
+        self._output[state] = phrase
+
+    def _build_links(self):
+        """Breadth-first pass computing failure and output links."""
+        goto, fail, output, out_link = self._goto, self._fail, self._output, self._out_link
+        queue = deque(goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for ch, nxt in goto[state].items():
+                f = fail[state]
+                while f and ch not in goto[f]:
+                    f = fail[f]
+                target = goto[f].get(ch, 0)
+                fail[nxt] = target if target != nxt else 0
+                out_link[nxt] = fail[nxt] if output[fail[nxt]] is not None else out_link[fail[nxt]]
+                queue.append(nxt)
+
+    def iter_matches(self, text: str) -> Iterator[str]:
+        """Yield each phrase found in *text*."""
+        goto, fail, output, out_link = self._goto, self._fail, self._output, self._out_link
+        if output[0] is not None:
+            yield output[0]
+        state = 0
+        for ch in text:
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+            match = state if output[state] is not None else out_link[state]
+            while match:
+                yield output[match]
+                match = out_link[match]
@@ -8,23 +8,35 @@ Handles:
   - Input validation & truncation
 """
 
-import re
-import io
-from typing import List, Tuple
+from typing import Iterable, Iterator, List, Optional, Sequence, Tuple, Union
 
 import spacy
+from spacy.tokens import Doc, Span
 
-from utils import MAX_PDF_PAGES, validate_input, truncate_text
+from utils import (
+    MAX_PDF_PAGES,
+    NLP_BATCH_SIZE,
+    NLP_N_PROCESS,
+    limit_warnings,
+    truncate_text,
+)
+from pdf_ingest import PdfDocument, PdfBackendError
 
 
 # ---------------------------------------------------------------------------
 # PDF extraction
 # ---------------------------------------------------------------------------
 
-def extract_text_from_pdf(pdf_bytes: bytes) -> Tuple[str, List[str]]:
+def extract_text_from_pdf(
+    pdf_bytes: bytes,
+    max_pages: Optional[int] = MAX_PDF_PAGES,
+) -> Tuple[str, List[str]]:
     """
     Extract text from PDF bytes.
 
+    At most *max_pages* pages are read; ``None`` reads the whole document.
+    See ``pdf_ingest.PdfDocument`` to consume pages as they are extracted.
+
     Returns
     -------
     text : str
@@ -33,51 +45,128 @@ def extract_text_from_pdf(pdf_bytes: bytes) -> Tuple[str, List[str]]:
         Any warnings (e.g. page-limit exceeded).
     """
     try:
-        from PyPDF2 import PdfReader
-    except ImportError:
-        return "", ["PyPDF2 is not installed. Cannot process PDF files."]
-
-    warnings: List[str] = []
-    reader = PdfReader(io.BytesIO(pdf_bytes))
-    total_pages = len(reader.pages)
-
-    if total_pages > MAX_PDF_PAGES:
-        warnings.append(
-            f"PDF has {total_pages} pages; only the first "
-            f"{MAX_PDF_PAGES} will be processed."
-        )
-
-    pages_to_read = min(total_pages, MAX_PDF_PAGES)
-    text_parts: List[str] = []
-    for i in range(pages_to_read):
-        page_text = reader.pages[i].extract_text()
-        if page_text:
-            text_parts.append(page_text)
+        pdf = PdfDocument(pdf_bytes)
+    except PdfBackendError as exc:
+        return "", [str(exc)]
 
-    return "\n".join(text_parts), warnings
+    pages = pdf.iter_pages(max_pages)
+    return "\n".join(p for p in pages if p), pdf.limit_warnings(max_pages)
 
 
 # ---------------------------------------------------------------------------
 # Text cleaning
 # ---------------------------------------------------------------------------
 
+def _clean_lines(text: str) -> List[str]:
+    """
+    Cleaned lines of *text*, before leading / trailing blank lines are
+    dropped.
+
+    NUL characters (PDF artefacts) are removed, ``\r\n`` and ``\r``
+    become ``\n``, three or more newlines collapse to a paragraph break,
+    runs of spaces and tabs become one space and every line is stripped.
+    Each step is a C-level ``str`` operation that is skipped when the
+    text has nothing for it to do (regex substitution with a match per
+    space was the bulk of the old cost).
+    """
+    if "\x00" in text:
+        text = text.replace("\x00", "")
+    if "\r" in text:
+        text = text.replace("\r\n", "\n").replace("\r", "\n")
+    while "\n\n\n" in text:
+        text = text.replace("\n\n\n", "\n\n")
+    if "\t" in text:
+        text = text.replace("\t", " ")
+    while "  " in text:
+        text = text.replace("  ", " ")
+    return list(map(str.strip, text.split("\n")))
+
+
 def clean_text(text: str) -> str:
     """Basic cleaning: normalise whitespace, fix common artefacts."""
-    # Replace common PDF artefacts
-    text = text.replace("\x00", "")
-    text = text.replace("\r\n", "\n").replace("\r", "\n")
+    return "\n".join(_clean_lines(text)).strip()
 
-    # Collapse multiple blank lines into two newlines (paragraph break)
-    text = re.sub(r"\n{3,}", "\n\n", text)
 
-    # Collapse multiple spaces
-    text = re.sub(r"[ \t]+", " ", text)
+def iter_clean_lines(chunks: Iterable[str]) -> Iterator[str]:
+    """
+    Streaming ``clean_text``: yield the cleaned lines of the concatenated
+    *chunks* one block at a time.
 
-    # Strip each line
-    lines = [line.strip() for line in text.split("\n")]
-    text = "\n".join(lines)
+    ``"\n".join(iter_clean_lines(chunks))`` equals
+    ``clean_text("".join(chunks))``.  Chunks may split lines and ``\r\n``
+    pairs anywhere; blocks are cut right after the last complete line
+    with content, so a run of blank lines is always cleaned as a whole.
+    """
+    buffer = ""
+    first = True
+    held_blanks = 0         # blank lines not yet known to be inner
+    started = False         # a non-blank line was yielded
+
+    def emit(block: str) -> Iterator[str]:
+        nonlocal first, held_blanks, started
+        lines = _clean_lines(block)
+        if not first:
+            # Every later block starts with the previous line's line break
+            lines = lines[1:]
+        first = False
+        for line in lines:
+            if not line:
+                held_blanks += 1
+                continue
+            if started and held_blanks:
+                yield from [""] * held_blanks
+            held_blanks = 0
+            started = True
+            yield line
+
+    for chunk in chunks:
+        buffer += chunk
+        last_newline = buffer.rfind("\n")
+        if last_newline < 0:
+            continue
+        end = len(buffer[:last_newline].rstrip("\r\n\x00"))
+        if end == 0:
+            continue
+        yield from emit(buffer[:end])
+        buffer = buffer[end:]
+    yield from emit(buffer)
 
-    return text.strip()
+
+# ---------------------------------------------------------------------------
+# Batched parsing
+# ---------------------------------------------------------------------------
+
+def parse_texts(
+    texts: Iterable[str],
+    nlp: spacy.language.Language,
+    batch_size: int = NLP_BATCH_SIZE,
+    n_process: int = NLP_N_PROCESS,
+) -> Iterator[Doc]:
+    """
+    Parse *texts* with ``nlp.pipe``, yielding Docs in input order.
+
+    ``n_process > 1`` fans the batches out to worker processes; spaCy
+    still returns the Docs in the order the texts were given.
+    """
+    return nlp.pipe(texts, batch_size=batch_size, n_process=n_process)
+
+
+def iter_parsed(
+    sentences: Sequence[Union[str, Span]],
+    nlp: spacy.language.Language,
+    batch_size: int = NLP_BATCH_SIZE,
+    n_process: int = NLP_N_PROCESS,
+) -> Iterator[Union[Doc, Span]]:
+    """
+    Yield a parse for every item of *sentences*, in order.
+
+    Raw strings are parsed in batches; spans that already carry a parse
+    (and cached parse artifacts) are passed through untouched.
+    """
+    texts = [s for s in sentences if isinstance(s, str)]
+    parsed = parse_texts(texts, nlp, batch_size, n_process) if texts else iter(())
+    for sentence in sentences:
+        yield next(parsed) if isinstance(sentence, str) else sentence
 
 
 # ---------------------------------------------------------------------------
@@ -87,6 +176,9 @@ def clean_text(text: str) -> str:
 def segment_sentences(text: str, nlp: spacy.language.Language) -> List[str]:
     """
     Split *text* into sentences using spaCy's sentence boundary detector.
+
+    Only sentence boundaries are used, so *nlp* may be a segmentation-only
+    pipeline (see ``document_graph_builder.get_segmenter``).
     """
     doc = nlp(text)
     sentences: List[str] = []
@@ -97,14 +189,38 @@ def segment_sentences(text: str, nlp: spacy.language.Language) -> List[str]:
     return sentences
 
 
+def segment_lines(
+    lines: Iterable[str],
+    nlp: spacy.language.Language,
+    batch_size: int = NLP_BATCH_SIZE,
+    n_process: int = NLP_N_PROCESS,
+) -> List[Span]:
+    """
+    Parse each body line once and return its non-empty sentence spans.
+
+    The spans keep their parse, so later stages (concept extraction and
+    meaning analysis) can reuse it instead of running spaCy again.
+    """
+    spans: List[Span] = []
+    for doc in parse_texts(lines, nlp, batch_size, n_process):
+        for sent in doc.sents:
+            if sent.text.strip():
+                spans.append(sent)
+    return spans
+
+
 # ---------------------------------------------------------------------------
 # Public API
 # ---------------------------------------------------------------------------
 
-def preprocess(raw_text: str, nlp: spacy.language.Language):
+def preprocess(raw_text: str, nlp: spacy.language.Language, segment: bool = True):
     """
     Full preprocessing pipeline.
 
+    When *segment* is False the cleaned text is not parsed and
+    ``sentences`` is empty; callers that segment later (e.g. per heading
+    section) avoid a redundant spaCy pass over the whole document.
+
     Returns
     -------
     dict with keys:
@@ -112,12 +228,12 @@ def preprocess(raw_text: str, nlp: spacy.language.Language):
         cleaned_text : str
         warnings : list[str]
     """
-    validation = validate_input(raw_text)
-    warnings = validation.get("warnings", [])
+    # One split of the raw text serves both the limit check and truncation
+    words = raw_text.split()
+    warnings = limit_warnings(len(raw_text), len(words)) if words else []
+    text = clean_text(truncate_text(raw_text, words))
 
-    text = truncate_text(raw_text)
-    text = clean_text(text)
-    sentences = segment_sentences(text, nlp)
+    sentences = segment_sentences(text, nlp) if segment else []
 
     return {
         "sentences": sentences,
@@ -0,0 +1,294 @@
+"""
+Result Cache – content-addressed cache of finished concept maps.
+
+Responsibilities:
+  - Derive a cache key from the normalized input and everything that
+    influences the output (engine version, limits, spaCy pipeline)
+  - Keep recent results in an in-memory LRU bounded by size
+  - Optionally keep results on disk (SQLite, zlib-compressed JSON) with
+    least-recently-used eviction once the file exceeds its size budget
+  - Count hits and misses for /api/health
+"""
+
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from typing import Dict, Optional
+
+from pdf_ingest import PdfBackendError, select_backend
+from uploads import update_digest
+from utils import (
+    ENGINE_VERSION,
+    MAX_CHARACTERS,
+    MAX_WORDS,
+    MAX_PDF_PAGES,
+    MAX_CONCEPTS,
+    RESULT_CACHE_MEMORY_BYTES,
+    RESULT_CACHE_DISK_BYTES,
+    PDF_BACKEND,
+)
+
+
+# ---------------------------------------------------------------------------
+# Cache keys
+# ---------------------------------------------------------------------------
+
+def normalize_text_input(raw_text: str, long_document: bool = False) -> str:
+    """
+    Normalize text so trivially different submissions share a key.
+
+    Line endings are unified and surrounding whitespace is dropped –
+    ``clean_text`` does the same, so the result is unchanged.  Texts over
+    the character limit are kept verbatim because the limit is checked
+    (and the warning worded) against the raw length.
+    """
+    if not long_document and len(raw_text) > MAX_CHARACTERS:
+        return raw_text
+    return raw_text.replace("\r\n", "\n").replace("\r", "\n").strip()
+
+
+def make_cache_key(kind: str, payload, options: Dict, pipeline: Dict) -> str:
+    """
+    SHA-256 of the input and the configuration that shapes the result.
+
+    *kind* is "text", "text_file" or "pdf"; *payload* is the raw text, or
+    for files their bytes or path (file contents are hashed in place),
+    *options* the keyword arguments for process_text / process_pdf and
+    *pipeline* the output of ``describe_pipeline``.  Batching options are
+    left out because they do not change the result; section-parallel
+    extraction is kept in because it resets pronoun context per section.
+    PDFs are also keyed by the extraction backend ("auto" is resolved to
+    the installed one), since backends differ in the text they return.
+    """
+    long_document = bool(options.get("long_document", False))
+    section_workers = int(options.get("section_workers", 0))
+
+    config = {
+        "engine": ENGINE_VERSION,
+        "kind": kind,
+        "long_document": long_document,
+        "section_parallel": section_workers not in (0, 1),
+        "limits": [MAX_CHARACTERS, MAX_WORDS, MAX_PDF_PAGES, MAX_CONCEPTS],
+        "pipeline": pipeline,
+    }
+    if kind == "pdf":
+        pdf_backend = options.get("pdf_backend", PDF_BACKEND)
+        try:
+            pdf_backend = select_backend(pdf_backend)
+        except PdfBackendError:
+            pass
+        config["pdf_backend"] = pdf_backend
+
+    digest = hashlib.sha256()
+    digest.update(json.dumps(config, sort_keys=True).encode("utf-8"))
+    digest.update(b"\0")
+    if kind == "text":
+        digest.update(normalize_text_input(payload, long_document).encode("utf-8"))
+    elif isinstance(payload, str):
+        update_digest(digest, payload)
+    else:
+        digest.update(payload)
+    return digest.hexdigest()
+
+
+# ---------------------------------------------------------------------------
+# Disk tier
+# ---------------------------------------------------------------------------
+
+# Seconds to wait for another process's write to the disk tier
+_BUSY_TIMEOUT = 5.0
+
+
+class _SQLiteTier:
+    """
+    Compressed results in a single SQLite file, evicted by last access.
+
+    Several processes (pre-forked server workers) may share the file, so
+    its size is summed from the table whenever it is checked rather than
+    kept in a per-process counter.
+    """
+
+    def __init__(self, path: str, max_bytes: int):
+        self.path = path
+        self.max_bytes = max_bytes
+        # Autocommit; put() opens its own write transaction
+        self._conn = sqlite3.connect(
+            path, timeout=_BUSY_TIMEOUT, isolation_level=None, check_same_thread=False,
+        )
+        # Readers are not blocked by another process's write
+        self._conn.execute("PRAGMA journal_mode = WAL")
+        self._conn.execute("PRAGMA synchronous = NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS results ("
+            " key TEXT PRIMARY KEY,"
+            " value BLOB NOT NULL,"
+            " size INTEGER NOT NULL,"
+            " accessed REAL NOT NULL)"
+        )
+
+    def get(self, key: str) -> Optional[str]:
+        row = self._conn.execute(
+            "SELECT value FROM results WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None:
+            return None
+        try:
+            self._conn.execute(
+                "UPDATE results SET accessed = ? WHERE key = ?", (time.time(), key)
+            )
+        except sqlite3.OperationalError:
+            pass  # still locked after the timeout: the hit is served anyway
+        return zlib.decompress(row[0]).decode("utf-8")
+
+    def put(self, key: str, body: str):
+        blob = zlib.compress(body.encode("utf-8"))
+        if len(blob) > self.max_bytes:
+            return
+        # IMMEDIATE takes the write lock up front, so no other process
+        # writes between the size check and the eviction
+        self._conn.execute("BEGIN IMMEDIATE")
+        try:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO results (key, value, size, accessed) "
+                "VALUES (?, ?, ?, ?)",
+                (key, blob, len(blob), time.time()),
+            )
+            self._evict()
+        except BaseException:
+            self._conn.execute("ROLLBACK")
+            raise
+        self._conn.execute("COMMIT")
+
+    def count(self) -> int:
+        return self._conn.execute("SELECT COUNT(*) FROM results").fetchone()[0]
+
+    def total_bytes(self) -> int:
+        return self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM results").fetchone()[0]
+
+    def close(self):
+        self._conn.close()
+
+    def _evict(self):
+        total = self.total_bytes()
+        if total <= self.max_bytes:
+            return
+        rows = self._conn.execute(
+            "SELECT key, size FROM results ORDER BY accessed"
+        ).fetchall()
+        for key, size in rows:
+            if total <= self.max_bytes:
+                break
+            self._conn.execute("DELETE FROM results WHERE key = ?", (key,))
+            total -= size
+
+
+# ---------------------------------------------------------------------------
+# Two-tier cache
+# ---------------------------------------------------------------------------
+
+class ResultCache:
+    """
+    Two-tier cache of serialized concept-map results.
+
+    Values are stored as JSON strings so a hit can be returned without
+    re-serializing.  The memory tier is an LRU bounded by *memory_bytes*;
+    when *disk_path* is given, results are also written to a SQLite file
+    bounded by *disk_bytes*, and disk hits are promoted to memory.
+    """
+
+    def __init__(
+        self,
+        memory_bytes: int = RESULT_CACHE_MEMORY_BYTES,
+        disk_path: Optional[str] = None,
+        disk_bytes: int = RESULT_CACHE_DISK_BYTES,
+    ):
+        self.memory_bytes = memory_bytes
+        self._memory: "OrderedDict[str, str]" = OrderedDict()
+        self._memory_used = 0
+        self._disk = _SQLiteTier(disk_path, disk_bytes) if disk_path else None
+        self._lock = threading.Lock()
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    def get(self, key: str) -> Optional[str]:
+        """Serialized result for *key*, or None on a miss."""
+        with self._lock:
+            body = self._memory.get(key)
+            if body is not None:
+                self._memory.move_to_end(key)
+                self.memory_hits += 1
+                return body
+
+            if self._disk is not None:
+                body = self._disk.get(key)
+                if body is not None:
+                    self.disk_hits += 1
+                    self._remember(key, body)
+                    return body
+
+            self.misses += 1
+            return None
+
+    def put(self, key: str, result: Dict) -> str:
+        """Store *result* and return its serialized form."""
+        body = json.dumps(result)
+        with self._lock:
+            self._remember(key, body)
+            if self._disk is not None:
+                try:
+                    self._disk.put(key, body)
+                except sqlite3.OperationalError:
+                    # Locked by other processes past the timeout; the
+                    # result is still returned, only not stored on disk
+                    pass
+        return body
+
+    def stats(self) -> Dict:
+        with self._lock:
+            lookups = self.memory_hits + self.disk_hits + self.misses
+            info = {
+                "hits": self.memory_hits + self.disk_hits,
+                "memory_hits": self.memory_hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": round((self.memory_hits + self.disk_hits) / lookups, 3)
+                if lookups else 0.0,
+                "memory_entries": len(self._memory),
+                "memory_bytes": self._memory_used,
+            }
+            if self._disk is not None:
+                info["disk_entries"] = self._disk.count()
+                info["disk_bytes"] = self._disk.total_bytes()
+            return info
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+            self._memory_used = 0
+
+    def close(self):
+        if self._disk is not None:
+            self._disk.close()
+
+    # ------------------------------------------------------------------
+    # Internal helpers
+    # ------------------------------------------------------------------
+
+    def _remember(self, key: str, body: str):
+        """Insert into the memory tier and evict LRU entries (lock held)."""
+        size = len(body)
+        if size > self.memory_bytes:
+            return
+        old = self._memory.pop(key, None)
+        if old is not None:
+            self._memory_used -= len(old)
+        self._memory[key] = body
+        self._memory_used += size
+        while self._memory_used > self.memory_bytes:
+            _, evicted = self._memory.popitem(last=False)
+            self._memory_used -= len(evicted)
@@ -0,0 +1,173 @@
+"""
+Serving – a pre-forking WSGI server for production use.
+
+Responsibilities:
+  - Bind the listening socket and warm the application (load the spaCy
+    model) once in a master process, then fork the workers, so they
+    share the model's memory pages copy-on-write
+  - Let every worker accept connections on the shared socket (the kernel
+    spreads them across the workers that are waiting)
+  - Recycle a worker after a number of requests, to bound memory growth,
+    and replace workers that exit
+  - Shut the workers down gracefully on SIGTERM / SIGINT
+
+Each worker serves one request at a time; concurrency comes from the
+number of workers.  Needs ``os.fork`` (Linux, macOS).
+"""
+
+import gc
+import os
+import random
+import signal
+import socket
+import sys
+import time
+from typing import Callable, Dict, Optional
+
+from werkzeug.serving import make_server
+
+from utils import SERVE_MAX_REQUESTS, SERVE_WORKERS
+
+# Connections that may wait for a free worker
+_BACKLOG = 128
+
+# Seconds a worker blocks in accept() before checking whether to stop
+_POLL = 1.0
+
+# Seconds between two forks of the same slot, so a worker that dies at
+# start-up is not restarted in a tight loop
+_RESPAWN_DELAY = 1.0
+
+
+def can_prefork() -> bool:
+    return hasattr(os, "fork")
+
+
+def serve_prefork(
+    app: Callable,
+    host: str,
+    port: int,
+    workers: int = SERVE_WORKERS,
+    max_requests: int = SERVE_MAX_REQUESTS,
+    preload: Optional[Callable[[], None]] = None,
+    log: Callable[[str], None] = print,
+):
+    """
+    Serve the WSGI *app* on *host*:*port* from *workers* forked processes
+    (0 = one per CPU core) until SIGTERM or SIGINT.
+
+    *preload* runs in the master before forking (e.g. to load models).
+    Each worker exits after *max_requests* requests (plus up to 10 %
+    jitter, so workers do not all restart together; 0 = never) and is
+    replaced by a fresh fork of the master.
+    """
+    if workers <= 0:
+        workers = os.cpu_count() or 1
+
+    listener = socket.socket(socket.AF_INET6 if ":" in host else socket.AF_INET, socket.SOCK_STREAM)
+    listener.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    listener.bind((host, port))
+    listener.listen(_BACKLOG)
+    listener.set_inheritable(True)
+
+    if preload is not None:
+        preload()
+    # Objects created so far are left alone by the workers' garbage
+    # collector, which would otherwise touch (and so copy) their pages.
+    gc.collect()
+    gc.freeze()
+
+    children: Dict[int, int] = {}     # pid -> worker slot
+    last_fork: Dict[int, float] = {}  # slot -> time of its last fork
+    stopping = False
+
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+        for pid in list(children):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    def spawn(slot: int):
+        wait = last_fork.get(slot, 0.0) + _RESPAWN_DELAY - time.monotonic()
+        if wait > 0:
+            time.sleep(wait)
+        last_fork[slot] = time.monotonic()
+        # Output still buffered here would be written again by the child
+        sys.stdout.flush()
+        sys.stderr.flush()
+        pid = os.fork()
+        if pid == 0:
+            code = 1
+            try:
+                _run_worker(app, host, port, listener, max_requests)
+                code = 0
+            except BaseException:
+                import traceback
+                traceback.print_exc()
+            finally:
+                sys.stdout.flush()
+                sys.stderr.flush()
+                os._exit(code)
+        children[pid] = slot
+
+    previous_handlers = {sig: signal.signal(sig, stop) for sig in (signal.SIGTERM, signal.SIGINT)}
+    try:
+        for slot in range(workers):
+            spawn(slot)
+        log(f"Serving on http://{host}:{port} with {workers} worker(s) "
+            f"(pids {', '.join(map(str, children))})")
+
+        while children:
+            try:
+                pid, status = os.wait()
+            except ChildProcessError:
+                break
+            slot = children.pop(pid, None)
+            if slot is None or stopping:
+                continue
+            code = os.waitstatus_to_exitcode(status)
+            if code != 0:
+                log(f"Worker {pid} exited with status {code}; restarting it")
+            spawn(slot)
+    finally:
+        stop(signal.SIGTERM, None)
+        for pid in list(children):
+            try:
+                os.waitpid(pid, 0)
+            except ChildProcessError:
+                pass
+        for sig, handler in previous_handlers.items():
+            signal.signal(sig, handler)
+        listener.close()
+        gc.unfreeze()
+
+
+def _run_worker(app: Callable, host: str, port: int, listener: socket.socket, max_requests: int):
+    """Worker process: serve requests from the shared *listener* until told to stop."""
+    stopping = False
+
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+    random.seed()  # the forked state would be the same in every worker
+
+    limit = 0
+    if max_requests > 0:
+        limit = max_requests + random.randint(0, max_requests // 10)
+    served = 0
+
+    def counted(environ, start_response):
+        nonlocal served
+        served += 1
+        return app(environ, start_response)
+
+    server = make_server(host, port, counted, fd=listener.fileno())
+    server.timeout = _POLL
+    while not stopping and not (limit and served >= limit):
+        server.handle_request()
@@ -0,0 +1,94 @@
+"""
+Uploads – spooled, memory-mapped handling of uploaded files.
+
+Responsibilities:
+  - Copy an upload stream to a temporary file in fixed-size chunks
+    instead of reading it into memory
+  - Expose the file through a read-only memory map, so hashing and
+    decoding never hold a second full-size copy
+  - Decode text files incrementally for streaming (long-document) runs
+"""
+
+import codecs
+import mmap
+import os
+import shutil
+import tempfile
+from contextlib import contextmanager
+from typing import BinaryIO, Iterator, Optional
+
+from utils import UPLOAD_CHUNK_BYTES, UPLOAD_SPOOL_DIR
+
+
+def spool_upload(stream: BinaryIO, suffix: str = "") -> str:
+    """
+    Copy *stream* to a new temporary file and return its path.
+
+    The caller owns the file and removes it with ``remove_quietly``.
+    """
+    fd, path = tempfile.mkstemp(prefix="cscme-upload-", suffix=suffix, dir=UPLOAD_SPOOL_DIR or None)
+    try:
+        with os.fdopen(fd, "wb") as out:
+            shutil.copyfileobj(stream, out, UPLOAD_CHUNK_BYTES)
+    except BaseException:
+        remove_quietly(path)
+        raise
+    return path
+
+
+def remove_quietly(path: Optional[str]):
+    if not path:
+        return
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+@contextmanager
+def mapped_file(path: str):
+    """Read-only memory map of *path* (``b""`` for an empty file)."""
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            yield b""
+            return
+        mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            yield mapped
+        finally:
+            mapped.close()
+
+
+def iter_file_text(path: str, chunk_bytes: int = UPLOAD_CHUNK_BYTES) -> Iterator[str]:
+    """
+    Decode a UTF-8 file *chunk_bytes* at a time.
+
+    Undecodable bytes are replaced, as ``bytes.decode(errors="replace")``
+    would do for the whole file; characters split across chunks are
+    carried over by the incremental decoder.
+    """
+    decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+    with mapped_file(path) as data:
+        view = memoryview(data)
+        try:
+            for start in range(0, len(view), chunk_bytes):
+                text = decoder.decode(view[start:start + chunk_bytes])
+                if text:
+                    yield text
+        finally:
+            view.release()
+    tail = decoder.decode(b"", final=True)
+    if tail:
+        yield tail
+
+
+def read_file_text(path: str) -> str:
+    """The whole file decoded as UTF-8 (undecodable bytes replaced)."""
+    with mapped_file(path) as data:
+        return str(data, "utf-8", "replace")
+
+
+def update_digest(digest, path: str):
+    """Feed the contents of *path* to a hashlib object without copying it."""
+    with mapped_file(path) as data:
+        digest.update(data)
@@ -3,6 +3,7 @@ Utility functions and constants for the CS-CME engine.
 """
 
 import re
+from typing import List, Optional
 
 # ---------------------------------------------------------------------------
 # Input limits
@@ -12,6 +13,132 @@ MAX_WORDS = 2000
 MAX_PDF_PAGES = 10
 MAX_CONCEPTS = 60
 
+# ---------------------------------------------------------------------------
+# Long-document (streaming) mode – no character / word / page limits
+# ---------------------------------------------------------------------------
+LONG_DOC_SECTION_SENTENCES = 200   # max body lines parsed at once
+LONG_DOC_MAX_DESCRIPTIONS = 10     # descriptions kept per concept
+
+# ---------------------------------------------------------------------------
+# PDF ingestion
+# ---------------------------------------------------------------------------
+PDF_BACKEND = "auto"          # "auto", "pymupdf", "pypdfium2" or "pypdf2"
+PDF_WORKERS = -1              # processes extracting page ranges (-1 = all cores)
+PDF_PAGES_PER_TASK = 8        # pages extracted per worker task
+PDF_PARALLEL_MIN_PAGES = 32   # smaller PDFs are read in-process
+
+# ---------------------------------------------------------------------------
+# Uploads
+# ---------------------------------------------------------------------------
+UPLOAD_SPOOL_DIR = ""                 # directory for spooled uploads ("" = system temp)
+UPLOAD_CHUNK_BYTES = 1024 * 1024      # copy / decode block size
+
+# ---------------------------------------------------------------------------
+# Section-parallel extraction
+# ---------------------------------------------------------------------------
+SECTION_WORKERS = 0      # processes for top-level sections (0 = off, -1 = all cores)
+
+# ---------------------------------------------------------------------------
+# Asynchronous jobs
+# ---------------------------------------------------------------------------
+JOB_WORKERS = 0          # worker processes (0 = one per CPU core)
+JOB_QUEUE_SIZE = 16      # jobs allowed to wait beyond the running ones
+JOB_RESULT_TTL = 3600    # seconds a finished job's result is kept
+
+# ---------------------------------------------------------------------------
+# Pre-forked web server (--serve --workers N)
+# ---------------------------------------------------------------------------
+SERVE_WORKERS = 0             # worker processes (0 = one per CPU core)
+SERVE_MAX_REQUESTS = 1000     # requests before a worker is replaced (0 = never)
+
+# ---------------------------------------------------------------------------
+# Streaming responses (partial concept maps)
+# ---------------------------------------------------------------------------
+STREAM_MAX_RELATIONS = 150   # relations sent in a preview
+STREAM_INTERVAL = 0.5        # seconds between previews of a running aggregate
+
+# ---------------------------------------------------------------------------
+# Batch corpus runs
+# ---------------------------------------------------------------------------
+BATCH_WORKERS = 0                    # worker processes (0 = one per CPU core)
+BATCH_SUFFIXES = (".txt", ".pdf")    # files picked up from --input-dir
+
+# ---------------------------------------------------------------------------
+# Corpus graph store
+# ---------------------------------------------------------------------------
+CORPUS_CACHE_KIB = 16 * 1024         # SQLite page cache per connection
+CORPUS_MAX_TEXTS = 10                # descriptions / formulas per concept in exports
+CORPUS_QUERY_LIMIT = 100             # default rows per corpus query
+CORPUS_MAX_HOPS = 3                  # deepest subgraph /api/corpus serves
+
+# ---------------------------------------------------------------------------
+# Result cache
+# ---------------------------------------------------------------------------
+# Bump ENGINE_VERSION whenever a change alters extraction output so that
+# cached results from older code are no longer served.
+ENGINE_VERSION = "2"
+RESULT_CACHE_MEMORY_BYTES = 64 * 1024 * 1024   # in-memory LRU budget
+RESULT_CACHE_DISK_BYTES = 512 * 1024 * 1024    # SQLite tier budget (compressed)
+
+# ---------------------------------------------------------------------------
+# Sentence parse cache (shared across documents, per pipeline profile)
+# ---------------------------------------------------------------------------
+PARSE_CACHE_SIZE = 50000   # body lines whose parse artifacts are kept (0 = off)
+
+# ---------------------------------------------------------------------------
+# Community detection (Louvain)
+# ---------------------------------------------------------------------------
+LOUVAIN_RESOLUTION = 1.0
+LOUVAIN_MAX_LEVELS = 0        # aggregation levels per run (0 = until no gain)
+LOUVAIN_TIME_BUDGET = 0.0     # seconds per run (0 = no limit)
+
+# ---------------------------------------------------------------------------
+# Incremental re-extraction (per pipeline profile)
+# ---------------------------------------------------------------------------
+INCREMENTAL_DOCUMENTS = 64   # documents whose per-section results are kept (0 = off)
+MAX_DOCUMENT_ID_LENGTH = 128  # longest client-chosen document id accepted
+
+# ---------------------------------------------------------------------------
+# spaCy batching (nlp.pipe)
+# ---------------------------------------------------------------------------
+NLP_BATCH_SIZE = 256
+NLP_N_PROCESS = 1
+
+# ---------------------------------------------------------------------------
+# spaCy pipeline profiles
+# ---------------------------------------------------------------------------
+SPACY_MODEL = "en_core_web_sm"
+DEFAULT_PROFILE = "full"
+
+# Every profile records the components the engine relies on, so a result
+# can be reproduced with the same pipeline.  "exclude" lists components
+# that are never loaded; "segmenter" is the component used when only
+# sentence boundaries are needed ("parser" or "senter").
+PIPELINE_PROFILES = {
+    "full": {
+        "requires": ["tok2vec", "tagger", "parser", "attribute_ruler", "lemmatizer"],
+        "exclude": [],
+        "segmenter": "parser",
+    },
+    "fast": {
+        "requires": ["tok2vec", "tagger", "parser", "attribute_ruler", "lemmatizer"],
+        "exclude": ["ner"],
+        "segmenter": "senter",
+    },
+}
+
+# ---------------------------------------------------------------------------
+# Concept importance ranking (graph_builder.rank_concepts)
+# ---------------------------------------------------------------------------
+# score = pagerank * PageRank * 100 + frequency * freq / max_freq
+#         + degree * degree / max_degree + heading (if a heading concept)
+RANK_WEIGHTS = {
+    "pagerank": 0.4,
+    "frequency": 0.3,
+    "degree": 0.2,
+    "heading": 0.1,
+}
+
 # ---------------------------------------------------------------------------
 # Meaningless / stop concepts
 # ---------------------------------------------------------------------------
@@ -199,6 +326,9 @@ FORMULA_PATTERN = re.compile(
     re.IGNORECASE
 )
 
+# Every FORMULA_PATTERN match contains one of these characters
+_FORMULA_HINT = re.compile(r"[=<>!→\-($\\+*/^\[]")
+
 # ---------------------------------------------------------------------------
 # Helper functions
 # ---------------------------------------------------------------------------
@@ -256,6 +386,10 @@ def is_valid_concept(text: str) -> bool:
 
 def detect_formulas(text: str) -> list:
     """Return a list of formula strings found in *text*."""
+    # Most prose sentences hold none of the operator characters a formula
+    # needs; skip the (per-position) alternation scan for them.
+    if _FORMULA_HINT.search(text) is None:
+        return []
     return FORMULA_PATTERN.findall(text)
 
 
@@ -264,9 +398,11 @@ def validate_input(text: str) -> dict:
     if not text or not text.strip():
         return {"valid": False, "message": "Input text is empty."}
 
-    char_count = len(text)
-    word_count = len(text.split())
+    return {"valid": True, "warnings": limit_warnings(len(text), len(text.split()))}
+
 
+def limit_warnings(char_count: int, word_count: int) -> list:
+    """Warnings for a text of *char_count* characters and *word_count* words."""
     warnings = []
     if char_count > MAX_CHARACTERS:
         warnings.append(
@@ -278,16 +414,13 @@ def validate_input(text: str) -> dict:
             f"Text exceeds {MAX_WORDS} word limit "
             f"({word_count} words). It will be truncated."
         )
+    return warnings
 
-    if warnings:
-        return {"valid": True, "warnings": warnings}
 
-    return {"valid": True, "warnings": []}
-
-
-def truncate_text(text: str) -> str:
-    """Truncate text to stay within limits."""
-    words = text.split()
+def truncate_text(text: str, words: Optional[List[str]] = None) -> str:
+    """Truncate text to stay within limits (*words*: ``text.split()`` if known)."""
+    if words is None:
+        words = text.split()
     if len(words) > MAX_WORDS:
         words = words[:MAX_WORDS]
         text = " ".join(words)
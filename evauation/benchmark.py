@@ -0,0 +1,1178 @@
+"""
+Benchmarks for the CS-CME engine.
+
+Times optimised pipeline helpers against reference copies of the
+implementations they replaced, and checks that both produce the same
+output.
+
+Usage:
+    python benchmark.py
+    python benchmark.py --only full_phrase --repeat 5
+"""
+
+import os
+import sys
+import time
+import random
+import argparse
+import tracemalloc
+from contextlib import contextmanager
+from typing import Callable, Dict, List
+
+# Make the backend modules importable
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "backend"))
+
+
+# ---------------------------------------------------------------------------
+# Helpers
+# ---------------------------------------------------------------------------
+
+def best_of(fn: Callable, repeat: int) -> float:
+    """Fastest of *repeat* runs of *fn*, in milliseconds."""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+@contextmanager
+def patched(module, name: str, replacement):
+    """Temporarily replace ``module.name`` (e.g. with a reference copy)."""
+    original = getattr(module, name)
+    setattr(module, name, replacement)
+    try:
+        yield
+    finally:
+        setattr(module, name, original)
+
+
+def print_table(title: str, header: List[str], rows: List[List]):
+    widths = [max(len(str(x)) for x in col) for col in zip(header, *rows)]
+    print("=" * 60)
+    print(f"  {title}")
+    print("=" * 60)
+    print("  " + "  ".join(str(h).rjust(w) for h, w in zip(header, widths)))
+    print("  " + "-" * (sum(widths) + 2 * (len(widths) - 1)))
+    for row in rows:
+        print("  " + "  ".join(str(x).rjust(w) for x, w in zip(row, widths)))
+    print()
+
+
+# ---------------------------------------------------------------------------
+# meaning_analyzer._get_full_phrase
+# ---------------------------------------------------------------------------
+
+def reference_get_full_phrase(token) -> str:
+    """Previous implementation: scans doc.noun_chunks for every token."""
+    doc = token.doc
+    for chunk in doc.noun_chunks:
+        if chunk.start <= token.i < chunk.end:
+            return chunk.text
+
+    parts = []
+    for child in token.children:
+        if child.dep_ in ("compound", "amod") and child.i < token.i:
+            parts.append(child.text)
+    parts.append(token.text)
+    for child in token.children:
+        if child.dep_ == "compound" and child.i > token.i:
+            parts.append(child.text)
+    return " ".join(parts)
+
+
+_CLAUSES = [
+    "the distributed system uses the large data store",
+    "the neural network that contains hidden layers produces accurate predictions",
+    "the query optimizer analyzes relational queries and improves execution plans",
+    "the cache stores frequently used records",
+    "the compiler requires a parse tree and generates machine code",
+]
+
+
+def long_sentence(clauses: int) -> str:
+    """A run-on sentence like those produced by flattened PDF text."""
+    return ", and ".join(_CLAUSES[i % len(_CLAUSES)] for i in range(clauses)) + "."
+
+
+def bench_full_phrase(repeat: int):
+    import meaning_analyzer
+    from document_graph_builder import get_nlp
+
+    nlp = get_nlp()
+    analyzer = meaning_analyzer.MeaningAnalyzer(nlp)
+
+    def extract(doc):
+        doc.user_data.pop(meaning_analyzer._CHUNK_INDEX_KEY, None)
+        triples = analyzer._extract_relations(doc)
+        triples.extend(meaning_analyzer._extract_relcl_relations(doc))
+        return meaning_analyzer._expand_conjunctions(triples, doc)
+
+    rows = []
+    for clauses in (5, 25, 100, 400):
+        doc = nlp(long_sentence(clauses))
+        indexed = extract(doc)
+        indexed_ms = best_of(lambda: extract(doc), repeat)
+        with patched(meaning_analyzer, "_get_full_phrase", reference_get_full_phrase):
+            reference = extract(doc)
+            reference_ms = best_of(lambda: extract(doc), repeat)
+        rows.append([
+            len(doc), len(indexed), f"{reference_ms:.2f}", f"{indexed_ms:.2f}",
+            f"{reference_ms / indexed_ms:.1f}x", "yes" if indexed == reference else "NO",
+        ])
+
+    print_table(
+        "Relation extraction on long sentences (_get_full_phrase)",
+        ["tokens", "triples", "scan ms", "index ms", "speedup", "same"],
+        rows,
+    )
+
+
+# ---------------------------------------------------------------------------
+# concept_extractor._keep_longest_phrases
+# ---------------------------------------------------------------------------
+
+def reference_keep_longest_phrases(raw_phrases: List[str]) -> List[str]:
+    """Previous implementation: compares every candidate with every kept phrase."""
+    normed = [(p, p.lower()) for p in raw_phrases]
+    normed.sort(key=lambda x: -len(x[1]))
+
+    kept: List[str] = []
+    kept_lower: List[str] = []
+    for original, lower in normed:
+        if lower in {"what", "the", "also", "referred", "to", "common", "tool", "type", "upfront"}:
+            continue
+        is_sub = False
+        for kl in kept_lower:
+            if lower in kl and lower != kl:
+                is_sub = True
+                break
+        if not is_sub:
+            kept.append(original)
+            kept_lower.append(lower)
+    return kept
+
+
+_WORDS = (
+    "data model network neural graph query cache store system learning "
+    "parser tree node edge index record vector layer token compiler "
+    "distributed relational sparse dense large fast deep machine process "
+    "memory storage schema engine stream batch signal feature cluster"
+).split()
+
+
+def random_phrases(count: int, seed: int = 0) -> List[str]:
+    """Unique title-cased noun phrases of one to four words."""
+    rng = random.Random(seed)
+    phrases = set()
+    while len(phrases) < count:
+        words = [rng.choice(_WORDS) for _ in range(rng.randint(1, 4))]
+        # Occasionally append a numeric suffix to widen the vocabulary
+        if rng.random() < 0.5:
+            words[-1] += str(rng.randint(0, count))
+        phrases.add(" ".join(words).title())
+    return list(phrases)
+
+
+def tricky_phrases(rng: random.Random) -> List[str]:
+    """Small inputs with case duplicates, character-level overlaps and noise words."""
+    pool = ["ab", "AB", "Ab", "abc", "b", "bc", "c", "abcd", "d", "the", "The",
+            "Type", "a b", "b c", "the cat", "cat", "at", "a", "", "bcd", "cd"]
+    return rng.sample(pool, rng.randint(0, len(pool)))
+
+
+def bench_keep_longest(repeat: int):
+    from concept_extractor import _keep_longest_phrases
+
+    rng = random.Random(42)
+    cases = [tricky_phrases(rng) for _ in range(2000)]
+    cases += [random_phrases(rng.randint(1, 300), seed=i) for i in range(200)]
+    mismatches = sum(
+        _keep_longest_phrases(case) != reference_keep_longest_phrases(case)
+        for case in cases
+    )
+    print(f"  Equivalence: {len(cases)} random cases, {mismatches} mismatches")
+
+    rows = []
+    for count in (1_000, 10_000, 100_000):
+        phrases = random_phrases(count)
+        indexed_ms = best_of(lambda: _keep_longest_phrases(phrases), repeat)
+        if count <= 10_000:
+            reference_ms = best_of(lambda: reference_keep_longest_phrases(phrases), 1)
+            same = _keep_longest_phrases(phrases) == reference_keep_longest_phrases(phrases)
+            rows.append([count, f"{reference_ms:.0f}", f"{indexed_ms:.0f}",
+                         f"{reference_ms / indexed_ms:.1f}x", "yes" if same else "NO"])
+        else:
+            # The quadratic reference would take hours at this size
+            rows.append([count, "-", f"{indexed_ms:.0f}", "-", "-"])
+
+    print_table(
+        "Longest-phrase filtering (_keep_longest_phrases)",
+        ["phrases", "pairwise ms", "automaton ms", "speedup", "same"],
+        rows,
+    )
+
+
+# ---------------------------------------------------------------------------
+# graph_builder.rank_concepts
+# ---------------------------------------------------------------------------
+
+def reference_rank_concepts(G, heading_concepts=None) -> Dict[str, float]:
+    """Previous implementation: per-node loop recomputing both maxima (O(N²))."""
+    import networkx as nx
+
+    if len(G) == 0:
+        return {}
+    heading_set = set(heading_concepts) if heading_concepts else set()
+    undirected = G.to_undirected()
+    try:
+        pr = nx.pagerank(undirected, alpha=0.85, max_iter=100)
+    except nx.PowerIterationFailedConvergence:
+        pr = {n: 1.0 / len(G) for n in G.nodes}
+
+    scores: Dict[str, float] = {}
+    for node in G.nodes:
+        freq = G.nodes[node].get("frequency", 1)
+        degree = G.degree(node)
+        scores[node] = (
+            0.4 * pr.get(node, 0) * 100
+            + 0.3 * (freq / max(1, max(f for f in (G.nodes[n].get("frequency", 1) for n in G.nodes))))
+            + 0.2 * (degree / max(1, max(G.degree(n) for n in G.nodes)))
+            + (0.1 if node in heading_set else 0.0)
+        )
+    return scores
+
+
+def random_concept_graph(nodes: int, seed: int = 0):
+    """Sparse concept graph with reciprocal edges, self-loops and isolated nodes."""
+    import networkx as nx
+
+    rng = random.Random(seed)
+    G = nx.DiGraph()
+    for i in range(nodes):
+        G.add_node(f"Concept {i}", frequency=rng.randint(1, 20))
+    for _ in range(nodes * 2):
+        u, v = rng.randrange(nodes), rng.randrange(nodes)
+        if rng.random() < 0.7:
+            v = rng.randrange(max(1, nodes // 50))  # hub-like targets
+        G.add_edge(f"Concept {u}", f"Concept {v}", relation="uses", negated=False)
+        if rng.random() < 0.1:
+            G.add_edge(f"Concept {v}", f"Concept {u}", relation="uses", negated=False)
+    return G
+
+
+def bench_rank(repeat: int):
+    from graph_builder import rank_concepts
+
+    worst = 0.0
+    for seed in range(20):
+        G = random_concept_graph(random.Random(seed).randint(1, 400), seed)
+        headings = [n for i, n in enumerate(G.nodes) if i % 7 == 0]
+        new, old = rank_concepts(G, headings), reference_rank_concepts(G, headings)
+        assert list(new) == list(old)
+        worst = max([worst] + [abs(new[n] - old[n]) for n in G.nodes])
+    print(f"  Equivalence: 20 random graphs, max score difference {worst:.2e}")
+
+    rows = []
+    for count in (1_000, 5_000, 10_000, 100_000):
+        G = random_concept_graph(count)
+        sparse_ms = best_of(lambda: rank_concepts(G), repeat)
+        # The quadratic reference takes minutes beyond this size
+        if count <= 5_000:
+            reference_ms = best_of(lambda: reference_rank_concepts(G), 1)
+            rows.append([count, G.number_of_edges(), f"{reference_ms:.0f}",
+                         f"{sparse_ms:.0f}", f"{reference_ms / sparse_ms:.1f}x"])
+        else:
+            rows.append([count, G.number_of_edges(), "-", f"{sparse_ms:.0f}", "-"])
+
+    print_table(
+        "Concept ranking (rank_concepts)",
+        ["nodes", "edges", "loop ms", "sparse ms", "speedup"],
+        rows,
+    )
+
+
+# ---------------------------------------------------------------------------
+# Graph post-processing (filter → rank → prune → communities)
+# ---------------------------------------------------------------------------
+
+def peak_memory(fn: Callable) -> float:
+    """Peak traced allocation while running *fn*, in MB."""
+    tracemalloc.start()
+    try:
+        fn()
+        return tracemalloc.get_traced_memory()[1] / 1e6
+    finally:
+        tracemalloc.stop()
+
+
+def bench_postprocess(repeat: int):
+    import graph_builder as gb
+
+    def with_copies(G):
+        # Previous flow: each step returns a copy, Louvain projects again
+        G = gb.filter_low_value_nodes(G, {}, document_title="Concept 0")
+        scores = gb.rank_concepts(G)
+        G = gb.prune_graph(G, scores, document_title="Concept 0")
+        gb.detect_communities(G, undirected=G.to_undirected())
+
+    def in_place(G):
+        undirected = gb.undirected_view(G)
+        gb.filter_low_value_nodes(G, {}, document_title="Concept 0", inplace=True)
+        scores = gb.rank_concepts(G, undirected=undirected)
+        gb.prune_graph(G, scores, document_title="Concept 0", inplace=True)
+        gb.detect_communities(G, undirected=undirected)
+
+    rows = []
+    for count in (1_000, 10_000, 50_000):
+        base = random_concept_graph(count)
+        for i, node in enumerate(base.nodes):
+            base.nodes[node].update(
+                descriptions=[f"Sentence {i}.{k} describing {node}." for k in range(5)],
+                formulas=[], cluster=-1,
+            )
+        copy_ms = best_of(lambda: with_copies(base.copy()), repeat)
+        inplace_ms = best_of(lambda: in_place(base.copy()), repeat)
+        copy_mb = peak_memory(lambda: with_copies(base))
+        G = base.copy()  # the in-place run consumes its graph
+        inplace_mb = peak_memory(lambda: in_place(G))
+        rows.append([count, f"{copy_ms:.0f}", f"{inplace_ms:.0f}",
+                     f"{copy_mb:.1f}", f"{inplace_mb:.1f}"])
+
+    print_table(
+        "Graph post-processing (copies vs in place + shared view)",
+        ["nodes", "copy ms", "inplace ms", "copy MB", "inplace MB"],
+        rows,
+    )
+
+
+# ---------------------------------------------------------------------------
+# Graph backends: NetworkX vs CompactConceptGraph
+# ---------------------------------------------------------------------------
+
+def retained_memory(fn: Callable):
+    """(result, MB still allocated by *fn* once it returns)."""
+    tracemalloc.start()
+    try:
+        result = fn()
+        return result, tracemalloc.get_traced_memory()[0] / 1e6
+    finally:
+        tracemalloc.stop()
+
+
+def random_extraction(concepts: int, seed: int = 0):
+    """Relations, frequencies and descriptions shaped like a long document."""
+    rng = random.Random(seed)
+    names = [f"Concept {i}" for i in range(concepts)]
+    sentences = [f"Sentence {i} relates several concepts." for i in range(concepts * 2)]
+    relations = [
+        {"source": rng.choice(names), "target": rng.choice(names),
+         "relation": rng.choice(["uses", "contains", "is_a", "requires"]), "negated": False}
+        for _ in range(concepts * 2)
+    ]
+    frequency = {n: rng.randint(1, 20) for n in names}
+    descriptions = {n: rng.sample(sentences, 5) for n in names}
+    return relations, frequency, descriptions, {}
+
+
+def bench_compact(repeat: int):
+    from graph_builder import build_graph, graph_to_json, rank_concepts
+
+    rows = []
+    for count in (1_000, 10_000, 100_000):
+        relations, frequency, descriptions, formulas = random_extraction(count)
+        nx_graph, nx_mb = retained_memory(
+            lambda: build_graph(relations, frequency, descriptions, formulas))
+        compact, compact_mb = retained_memory(
+            lambda: build_graph(relations, frequency, descriptions, formulas, compact=True))
+        same = (graph_to_json(nx_graph) == graph_to_json(compact)
+                and rank_concepts(nx_graph) == rank_concepts(compact))
+        rows.append([
+            count, f"{nx_mb * 1e6 / count:.0f}", f"{compact_mb * 1e6 / count:.0f}",
+            f"{nx_mb / compact_mb:.1f}x", "yes" if same else "NO",
+        ])
+        del nx_graph, compact
+
+    print_table(
+        "Graph memory per node (descriptions shared through one table)",
+        ["nodes", "networkx B", "compact B", "smaller", "same"],
+        rows,
+    )
+
+
+# ---------------------------------------------------------------------------
+# PDF ingestion
+# ---------------------------------------------------------------------------
+
+def reference_extract_pages(pdf_bytes: bytes) -> List[str]:
+    """Previous implementation: PyPDF2, one page after another."""
+    import io
+    from PyPDF2 import PdfReader
+
+    reader = PdfReader(io.BytesIO(pdf_bytes))
+    return [page.extract_text() for page in reader.pages]
+
+
+def synthetic_pdf(pages: int, lines_per_page: int = 40) -> bytes:
+    """A plain-text PDF with Helvetica body lines on every page."""
+    objects = [b"<< /Type /Catalog /Pages 2 0 R >>", None,
+               b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"]
+    kids = []
+    for p in range(pages):
+        lines = [f"The parser builds a tree of concepts for page {p}, line {i}."
+                 for i in range(lines_per_page)]
+        ops = ["BT /F1 10 Tf 14 TL 50 780 Td"]
+        ops += [f"({line}) '" for line in lines]
+        ops.append("ET")
+        stream = "\n".join(ops).encode("latin-1")
+        objects.append(b"<< /Length %d >>\nstream\n%s\nendstream" % (len(stream), stream))
+        objects.append(
+            b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+            b"/Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>" % len(objects)
+        )
+        kids.append(len(objects))
+    objects[1] = b"<< /Type /Pages /Kids [%s] /Count %d >>" % (
+        b" ".join(b"%d 0 R" % k for k in kids), pages)
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, 1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n%s\nendobj\n" % (number, body)
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    out += b"".join(b"%010d 00000 n \n" % off for off in offsets)
+    out += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (
+        len(objects) + 1, xref)
+    return bytes(out)
+
+
+def bench_pdf(repeat: int):
+    from pdf_ingest import PdfDocument, available_backends
+
+    workers = os.cpu_count() or 1
+    rows = []
+    for pages in (16, 128, 512):
+        pdf_bytes = synthetic_pdf(pages)
+        expected = reference_extract_pages(pdf_bytes)
+        ref_ms = best_of(lambda: reference_extract_pages(pdf_bytes), repeat)
+        for backend in available_backends():
+            for n in (0, workers):
+                got = list(PdfDocument(pdf_bytes, backend).iter_pages(workers=n))
+
+                def first_page():
+                    next(PdfDocument(pdf_bytes, backend).iter_pages(workers=n))
+
+                ms = best_of(lambda: list(PdfDocument(pdf_bytes, backend).iter_pages(workers=n)), repeat)
+                same = "yes" if got == expected else ("n/a" if backend != "pypdf2" else "NO")
+                rows.append([
+                    pages, backend, n, f"{ref_ms:.0f}", f"{ms:.0f}",
+                    f"{best_of(first_page, repeat):.0f}", f"{ref_ms / ms:.1f}x", same,
+                ])
+
+    print_table(
+        "PDF text extraction (first page = latency until page 1 is available)",
+        ["pages", "backend", "workers", "reference ms", "ms", "first page ms", "speedup", "same"],
+        rows,
+    )
+
+
+# ---------------------------------------------------------------------------
+# preprocessor.clean_text / preprocess
+# ---------------------------------------------------------------------------
+
+def reference_clean_text(text: str) -> str:
+    """Previous implementation: five whole-text passes."""
+    import re
+
+    text = text.replace("\x00", "")
+    text = text.replace("\r\n", "\n").replace("\r", "\n")
+    text = re.sub(r"\n{3,}", "\n\n", text)
+    text = re.sub(r"[ \t]+", " ", text)
+    lines = [line.strip() for line in text.split("\n")]
+    text = "\n".join(lines)
+    return text.strip()
+
+
+def reference_limits(text: str):
+    """Previous validate_input + truncate_text + clean_text sequence."""
+    from utils import validate_input, truncate_text
+
+    warnings = validate_input(text).get("warnings", [])
+    return reference_clean_text(truncate_text(text)), warnings
+
+
+CLEAN_PIECES = [
+    "The  parser\tbuilds a tree.", "x", " ", "\t", "  ", "\n", "\r", "\r\n", "\x00",
+    "\n\n\n", " \n", "\x0c", "\u00a0", "\u2028", "é", "",
+]
+
+
+def random_dirty_text(rng: random.Random, pieces: int) -> str:
+    """Text mixing line endings, NULs, blank-line runs and odd whitespace."""
+    return "".join(rng.choice(CLEAN_PIECES) for _ in range(pieces))
+
+
+def lecture_text(mb: int) -> str:
+    """PDF-like text: CRLF lines, double spaces, tabs and blank-line runs."""
+    block = (
+        "Chapter 3:  Query  Optimization\r\n\r\n\r\n"
+        "The query optimizer\tanalyzes relational queries and improves plans.\r\n"
+        "  Indexes reduce the cost of selective predicates.  \r\n"
+        "\r\n"
+        "A join order determines the size of intermediate results.\x00\r\n"
+    )
+    return block * (mb * 1024 * 1024 // len(block))
+
+
+def bench_clean(repeat: int):
+    from preprocessor import clean_text, iter_clean_lines, preprocess
+
+    rng = random.Random(0)
+    mismatches = 0
+    for _ in range(20_000):
+        text = random_dirty_text(rng, rng.randint(0, 40))
+        cuts = sorted(rng.sample(range(len(text) + 1), min(len(text) + 1, rng.randint(0, 4))))
+        chunks = [text[i:j] for i, j in zip([0] + cuts, cuts + [len(text)])]
+        expected = reference_clean_text(text)
+        if clean_text(text) != expected or "\n".join(iter_clean_lines(chunks)) != expected:
+            mismatches += 1
+    for words in (10, 1999, 2001, 5000):
+        for text in (" ".join(["word"] * words), "\n".join(["word  w"] * (words // 2))):
+            got = preprocess(text, None, segment=False)
+            if (got["cleaned_text"], got["warnings"]) != reference_limits(text):
+                mismatches += 1
+    print(f"  clean_text / iter_clean_lines / preprocess mismatches: {mismatches}")
+    print()
+
+    rows = []
+    for mb in (1, 8, 32):
+        text = lecture_text(mb)
+        same = clean_text(text) == reference_clean_text(text)
+        ref_ms = best_of(lambda: reference_clean_text(text), repeat)
+        new_ms = best_of(lambda: clean_text(text), repeat)
+        rows.append([mb, f"{ref_ms:.0f}", f"{new_ms:.0f}", f"{ref_ms / new_ms:.1f}x",
+                     "yes" if same else "NO"])
+
+    print_table(
+        "clean_text on multi-megabyte lecture-style text",
+        ["MB", "reference ms", "clean_text ms", "speedup", "same"],
+        rows,
+    )
+
+
+# ---------------------------------------------------------------------------
+# formula_extractor.extract_formulas / utils.detect_formulas
+# ---------------------------------------------------------------------------
+
+def reference_extract_formulas(text: str) -> List[str]:
+    """Previous implementation: eight findall passes and list-based dedup."""
+    import re
+
+    text = text.replace("\n", " ")
+    text = re.sub(r"\s+", " ", text)
+    formulas = []
+    patterns = [
+        r"[A-Za-z0-9_() ]+\s*=\s*[^\n=]{5,120}",
+        r"[A-Za-z0-9_() ]+\s*=\s*sqrt\s*\([^\)]+\)",
+        r"[a-z_]+\s*=\s*argmax",
+        r"[A-Za-z_][A-Za-z0-9_]*\s*\([^\)]*\)",
+        r"O\s*\([^\)]+\)",
+        r"\[[^\]]+\]",
+        r"[A-Za-z0-9_]+\s*\^\s*\d+",
+        r"\\[a-zA-Z]+\{[^}]*\}",
+    ]
+    for pattern in patterns:
+        for m in re.findall(pattern, text, re.IGNORECASE):
+            m = m.strip()
+            if 8 < len(m) < 180 and m not in formulas:
+                formulas.append(m)
+    return formulas
+
+
+LECTURE_LINES = [
+    "Lecture {i}: Gradient descent and the cost of optimization",
+    "The loss function of the linear model is defined as L(w) = sum (y_i - w x_i)^2 over the training set.",
+    "Each update computes w_{i} = w - eta grad L(w) for a learning rate eta chosen by validation.",
+    "The distance between two points is d = sqrt(x_{i}^2 + y_{i}^2) in the plane.",
+    "The best parameters satisfy theta = argmax P(theta | D) under the posterior distribution.",
+    "Sorting the {i} inputs takes O(n log n) time while a linear scan needs O(n) comparisons.",
+    "The feature vector [x1, x2, x{i}] is normalized so that its entries sum to one.",
+    "In LaTeX the ratio is written \\frac{{a_{i}}}{{b}} and the root as \\sqrt{{x}}.",
+    "Most of the remaining explanation is ordinary prose that describes how the model behaves in practice.",
+    "A polynomial such as x^3 + 2x^2 grows faster than any linear function of the input size.",
+]
+
+
+def lecture_notes(lines: int) -> str:
+    """Math-heavy lecture notes with many distinct equations."""
+    return "\n".join(
+        LECTURE_LINES[i % len(LECTURE_LINES)].format(i=i) for i in range(lines)
+    )
+
+
+def bench_formulas(repeat: int):
+    import re
+    from formula_extractor import extract_formulas
+    from utils import FORMULA_PATTERN, detect_formulas
+
+    rng = random.Random(0)
+    pieces = ["x", "f(x)", " = ", "=", " ", "\n", "sqrt(a+b)", "argmax", "O(n log n)",
+              "[1, 2]", "a^2", "\\frac{a}{b}", "theta", "(", ")", "\t", ".", "==",
+              "the model learns", "\u212a", "y2 = x1 + x2"]
+    mismatches = 0
+    for _ in range(20_000):
+        text = "".join(rng.choice(pieces) for _ in range(rng.randint(0, 40)))
+        if extract_formulas(text) != reference_extract_formulas(text):
+            mismatches += 1
+        if detect_formulas(text) != FORMULA_PATTERN.findall(text):
+            mismatches += 1
+    print(f"  extract_formulas / detect_formulas mismatches: {mismatches}")
+    print()
+
+    rows = []
+    for lines in (200, 2_000, 20_000):
+        text = lecture_notes(lines)
+        same = extract_formulas(text) == reference_extract_formulas(text)
+        ref_ms = best_of(lambda: reference_extract_formulas(text), repeat)
+        new_ms = best_of(lambda: extract_formulas(text), repeat)
+        rows.append(["document", lines, f"{ref_ms:.0f}", f"{new_ms:.0f}",
+                     f"{ref_ms / new_ms:.1f}x", "yes" if same else "NO"])
+
+        sentences = text.split("\n")
+        same = [detect_formulas(s) for s in sentences] == [FORMULA_PATTERN.findall(s) for s in sentences]
+        ref_ms = best_of(lambda: [FORMULA_PATTERN.findall(s) for s in sentences], repeat)
+        new_ms = best_of(lambda: [detect_formulas(s) for s in sentences], repeat)
+        rows.append(["sentences", lines, f"{ref_ms:.0f}", f"{new_ms:.0f}",
+                     f"{ref_ms / new_ms:.1f}x", "yes" if same else "NO"])
+
+    print_table(
+        "Formula scanning on math-heavy lecture notes",
+        ["scope", "lines", "reference ms", "new ms", "speedup", "same"],
+        rows,
+    )
+
+
+# ---------------------------------------------------------------------------
+# Formula assignment: substring test per concept vs one automaton scan
+# ---------------------------------------------------------------------------
+
+def reference_assign_formulas(formulas: Dict[str, List[str]], document_formulas: List[str], fallback: str):
+    """Previous implementation: every formula against every concept."""
+    for f in document_formulas:
+        added = False
+        for concept in list(formulas.keys()):
+            if concept.lower() in f.lower():
+                formulas.setdefault(concept, []).append(f)
+                added = True
+        if not added:
+            formulas.setdefault(fallback, []).append(f)
+
+
+def reference_document_formulas(node_formulas: List[List[str]]) -> List[str]:
+    """Previous graph_to_json dedup: list membership."""
+    all_formulas = []
+    for fs in node_formulas:
+        for f in fs:
+            if f not in all_formulas:
+                all_formulas.append(f)
+    return all_formulas
+
+
+def formula_workload(concepts: int, formulas: int, seed: int = 0):
+    """Concept names and formulas that mention a few of them each."""
+    rng = random.Random(seed)
+    names = [f"{rng.choice(_WORDS).title()} Term{i}" for i in range(concepts)]
+    found = []
+    for i in range(formulas):
+        mentioned = " + ".join(rng.choice(names).lower() for _ in range(rng.randint(0, 2)))
+        found.append(f"y{i} = {mentioned or 'x'} * w{i}")
+    return names, found
+
+
+def bench_assign(repeat: int):
+    import copy
+    from formula_extractor import assign_formulas
+
+    rng = random.Random(0)
+    names = ["pca", "PCA", "loss", "Loss Function", "x", "", "\u0130", "i\u0307", "Title"]
+    pieces = ["pca", "PCA", " = ", "loss", "LOSS FUNCTION", "x", "\u0130", "title", "(", ")", " "]
+    mismatches = 0
+    for _ in range(20_000):
+        keys = rng.sample(names, rng.randint(0, 4))
+        start = {k: [rng.choice(pieces)] for k in keys}
+        found = ["".join(rng.choice(pieces) for _ in range(rng.randint(0, 6)))
+                 for _ in range(rng.randint(0, 5))]
+        expected, actual = copy.deepcopy(start), copy.deepcopy(start)
+        reference_assign_formulas(expected, found, "Title")
+        assign_formulas(actual, found, "Title")
+        if list(expected.items()) != list(actual.items()):
+            mismatches += 1
+    print(f"  assign_formulas mismatches: {mismatches}")
+    print()
+
+    rows = []
+    for size in (100, 400, 1_600):
+        names, found = formula_workload(size, size)
+        start = {name: [] for name in names}
+        expected, actual = copy.deepcopy(start), copy.deepcopy(start)
+        reference_assign_formulas(expected, found, "Title")
+        assign_formulas(actual, found, "Title")
+        same = list(expected.items()) == list(actual.items())
+        ref_ms = best_of(lambda: reference_assign_formulas(copy.deepcopy(start), found, "Title"), repeat)
+        new_ms = best_of(lambda: assign_formulas(copy.deepcopy(start), found, "Title"), repeat)
+        rows.append(["assign", size, f"{ref_ms:.0f}", f"{new_ms:.0f}",
+                     f"{ref_ms / new_ms:.1f}x", "yes" if same else "NO"])
+
+        node_formulas = list(expected.values())
+        same = reference_document_formulas(node_formulas) == list(dict.fromkeys(
+            f for fs in node_formulas for f in fs))
+        ref_ms = best_of(lambda: reference_document_formulas(node_formulas), repeat)
+        new_ms = best_of(lambda: list(dict.fromkeys(f for fs in node_formulas for f in fs)), repeat)
+        rows.append(["dedup", size, f"{ref_ms:.0f}", f"{new_ms:.0f}",
+                     f"{ref_ms / new_ms:.1f}x", "yes" if same else "NO"])
+
+    print_table(
+        "Formula-to-concept assignment (concepts = formulas)",
+        ["step", "size", "reference ms", "new ms", "speedup", "same"],
+        rows,
+    )
+
+
+# ---------------------------------------------------------------------------
+# Incremental re-extraction of an edited document
+# ---------------------------------------------------------------------------
+
+def sectioned_document(sections: int, lines_per_section: int, seed: int = 0) -> str:
+    """Numbered heading sections of distinct prose sentences."""
+    rng = random.Random(seed)
+    out = []
+    for s in range(sections):
+        out.append(f"{s + 1}. {rng.choice(_WORDS).title()} {rng.choice(_WORDS).title()}")
+        for i in range(lines_per_section):
+            a, b, c, d = (rng.choice(_WORDS) for _ in range(4))
+            out.append(f"The {a} {b} uses the {c} {d} in step {s}-{i} of the pipeline.")
+    return "\n".join(out)
+
+
+def edit_one_line(text: str) -> str:
+    """*text* with one body line in the middle rewritten."""
+    lines = text.split("\n")
+    mid = len(lines) // 2
+    if lines[mid][:1].isdigit():
+        mid += 1
+    lines[mid] = lines[mid].replace("uses", "stores", 1)
+    return "\n".join(lines)
+
+
+def bench_incremental(repeat: int):
+    import json
+    import document_graph_builder
+    from document_graph_builder import get_nlp, process_text
+
+    get_nlp()
+
+    def comparable(result):
+        result = json.loads(json.dumps(result))
+        result.pop("incremental", None)
+        result["stats"].pop("communities_detected", None)
+        result["stats"].pop("clustering", None)
+        for node in result["concept_map"]["nodes"]:
+            node.pop("cluster", None)
+        return result
+
+    def timed(fn):
+        start = time.perf_counter()
+        result = fn()
+        return (time.perf_counter() - start) * 1000, result
+
+    rows = []
+    for sections in (10, 40, 80):
+        text = sectioned_document(sections, 25)
+        edited = edit_one_line(text)
+
+        document_graph_builder._parse_caches.clear()
+        cold_ms, plain = timed(lambda: process_text(edited, long_document=True))
+        # Regenerating after the edit, with every unchanged line in the parse cache
+        process_text(text, long_document=True)
+        warm_ms = best_of(lambda: process_text(edited, long_document=True), repeat)
+
+        incremental_ms = float("inf")
+        for _ in range(repeat):
+            process_text(text, long_document=True, document_id="bench")
+            ms, result = timed(lambda: process_text(edited, long_document=True, document_id="bench"))
+            incremental_ms = min(incremental_ms, ms)
+        counts = result["incremental"]
+
+        # The same map as extracting the edited text in one pass
+        same = comparable(result) == comparable(plain)
+        rows.append([
+            sections, f"{counts['extracted']}/{counts['sections']}",
+            f"{cold_ms:.0f}", f"{warm_ms:.0f}", f"{incremental_ms:.0f}",
+            f"{warm_ms / incremental_ms:.1f}x", "yes" if same else "NO",
+        ])
+
+    print_table(
+        "Regenerating after a one-line edit (long-document mode)",
+        ["sections", "re-extracted", "cold ms", "warm ms", "incremental ms",
+         "vs warm", "same"],
+        rows,
+    )
+
+
+# ---------------------------------------------------------------------------
+# Community detection: cold, warm-started and budgeted Louvain
+# ---------------------------------------------------------------------------
+
+def perturbed(G, fraction: float, seed: int = 1):
+    """Copy of *G* with *fraction* of its edges removed and as many random ones added."""
+    rng = random.Random(seed)
+    H = G.copy()
+    nodes = list(H.nodes)
+    edges = list(H.edges)
+    for u, v in rng.sample(edges, int(len(edges) * fraction)):
+        H.remove_edge(u, v)
+        H.add_edge(rng.choice(nodes), rng.choice(nodes), relation="uses", negated=False)
+    return H
+
+
+def bench_louvain(repeat: int):
+    from graph_builder import cluster_graph
+    from louvain import build_adjacency, modularity
+
+    try:
+        import community as community_louvain  # python-louvain, the previous implementation
+    except ImportError:
+        community_louvain = None
+
+    def stability(before, after):
+        return sum(after[n] == before.get(n) for n in after) / len(after)
+
+    rows = []
+    for count in (1_000, 10_000, 50_000):
+        G = random_concept_graph(count)
+        H = perturbed(G, 0.01)
+        nodes = list(H.nodes)
+        index = {n: i for i, n in enumerate(nodes)}
+        adjacency = build_adjacency(len(nodes), ((index[u], index[v]) for u, v in H.edges()))
+
+        if community_louvain is not None:
+            undirected = H.to_undirected()
+            ref_ms = best_of(lambda: community_louvain.best_partition(undirected, random_state=0), repeat)
+            ref = community_louvain.best_partition(undirected, random_state=0)
+            ref_q = modularity(adjacency, [ref[n] for n in nodes])
+            rows.append([count, "python-louvain", f"{ref_ms:.0f}", f"{ref_q:.4f}", "-", "-"])
+
+        previous, _ = cluster_graph(G)
+        cold_ms = best_of(lambda: cluster_graph(H), repeat)
+        cold, info = cluster_graph(H)
+        rows.append([count, "cold", f"{cold_ms:.0f}", f"{info['modularity']:.4f}",
+                     info["levels"], f"{stability(previous, cold):.0%}"])
+
+        warm_ms = best_of(lambda: cluster_graph(H, previous=previous), repeat)
+        warm, info = cluster_graph(H, previous=previous)
+        rows.append([count, "warm start", f"{warm_ms:.0f}", f"{info['modularity']:.4f}",
+                     info["levels"], f"{stability(previous, warm):.0%}"])
+
+        budget = cold_ms / 4000
+        budget_ms = best_of(lambda: cluster_graph(H, time_budget=budget), repeat)
+        _, info = cluster_graph(H, time_budget=budget)
+        rows.append([count, f"budget {budget * 1000:.0f} ms", f"{budget_ms:.0f}",
+                     f"{info['modularity']:.4f}", info["levels"], "-"])
+
+    print_table(
+        "Louvain after a 1% edge change (stable = nodes keeping their cluster id)",
+        ["nodes", "run", "ms", "modularity", "levels", "stable"],
+        rows,
+    )
+
+
+# ---------------------------------------------------------------------------
+# Corpus store: merging many documents into one SQLite graph
+# ---------------------------------------------------------------------------
+
+def corpus_records(documents: int, vocabulary: int, concepts: int = 300, seed: int = 0):
+    """
+    ``document_record``-shaped graphs whose concepts follow a Zipf-like
+    distribution over *vocabulary* names, with descriptions shared
+    between documents.
+    """
+    rng = random.Random(seed)
+    relations = ["is_a", "part_of", "uses", "depends_on", "contains"]
+    for d in range(documents):
+        names = list(dict.fromkeys(
+            f"Concept {int(vocabulary ** rng.random()) - 1}" for _ in range(concepts)
+        ))
+        nodes = [{
+            "id": name,
+            "frequency": rng.randint(1, 12),
+            "descriptions": [f"{name} is explained in lecture {rng.randrange(4)}."],
+            "formulas": [f"f(x) = {name[8:]} x"] if rng.random() < 0.1 else [],
+            "cluster": -1,
+        } for name in names]
+        edges = [{
+            "source": rng.choice(names),
+            "target": rng.choice(names),
+            "relation": rng.choice(relations),
+            "negated": rng.random() < 0.05,
+        } for _ in range(len(names) * 3 // 2)]
+        # The same edge may be drawn twice; a graph has it once
+        edges = list({(e["source"], e["target"], e["relation"], e["negated"]): e for e in edges}.values())
+        yield f"doc-{d}", {"title": names[0], "headings": names[:3], "nodes": nodes, "edges": edges}
+
+
+def reference_corpus(records) -> Dict:
+    """In-memory merge of the same records, to check the store against."""
+    frequency: Dict[str, int] = {}
+    edges: Dict[tuple, int] = {}
+    texts = set()
+    for _, record in records:
+        for node in record["nodes"]:
+            frequency[node["id"]] = frequency.get(node["id"], 0) + node["frequency"]
+            texts.update((node["id"], "d", t) for t in node["descriptions"])
+            texts.update((node["id"], "f", t) for t in node["formulas"])
+        for e in {(e["source"], e["target"], e["relation"], e["negated"]) for e in record["edges"]}:
+            edges[e] = edges.get(e, 0) + 1
+    return {"frequency": frequency, "edges": edges, "texts": len(texts)}
+
+
+def bench_corpus(repeat: int):
+    import sqlite3
+    import tempfile
+    from corpus_store import CorpusStore
+
+    rows = []
+    for documents, vocabulary in ((200, 20_000), (2_000, 400_000)):
+        records = list(corpus_records(documents, vocabulary))
+
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "corpus.db")
+            store = CorpusStore(path)
+            start = time.perf_counter()
+            tail = max(1, documents // 10)
+            for name, record in records[:-tail]:
+                store.add_document(name, record)
+            head_seconds = time.perf_counter() - start
+            start = time.perf_counter()
+            for name, record in records[-tail:]:
+                store.add_document(name, record)
+            tail_seconds = time.perf_counter() - start
+
+            expected = reference_corpus(records)
+            conn = store._conn
+            stored = dict(conn.execute("SELECT name, frequency FROM concepts"))
+            stored_edges = {
+                (s, t, r, bool(n)): d for s, t, r, n, d in conn.execute(
+                    "SELECT s.name, t.name, relation, negated, e.documents FROM edges e"
+                    " JOIN concepts s ON s.id = e.source_id JOIN concepts t ON t.id = e.target_id"
+                )
+            }
+            stats = store.stats()
+            same = (
+                stored == expected["frequency"]
+                and stored_edges == expected["edges"]
+                and stats["descriptions"] + stats["formulas"] == expected["texts"]
+            )
+
+            cold = store.refresh()
+            before = dict(conn.execute("SELECT name, cluster FROM concepts"))
+            for name, record in records[:5]:
+                store.add_document(name + "-copy", record)
+            warm = store.refresh()
+            after = conn.execute("SELECT name, cluster FROM concepts").fetchall()
+            stable = sum(before.get(name) == cluster for name, cluster in after) / len(after)
+            map_ms = best_of(store.concept_map, repeat)
+
+            # Another connection (a job worker, another server process)
+            # merges a document after this one served a map and a subgraph:
+            # this one must see it and still be able to write
+            store.subgraph(next(iter(stored)), hops=2)
+            merged = store.stats()["documents"] + 1
+            other = CorpusStore(path)
+            other.add_document("other", records[0][1])
+            other.close()
+            try:
+                store.refresh()
+                shared = store.stats()["documents"] == merged
+            except sqlite3.OperationalError:
+                shared = False
+
+            # Memory, measured apart since tracing slows everything down
+            tracemalloc.start()
+            for name, record in records[-5:]:
+                store.add_document(name, record)
+            merge_peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.reset_peak()
+            store.refresh()
+            refresh_peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            store.close()
+            size = sum(os.path.getsize(os.path.join(tmp, f)) for f in os.listdir(tmp))
+
+        rows.append([
+            documents, stats["concepts"], stats["edges"],
+            f"{(documents - tail) / head_seconds:.0f}", f"{tail / tail_seconds:.0f}",
+            f"{merge_peak / 2**20:.1f}",
+            f"{cold['seconds']:.2f}", f"{warm['seconds']:.2f}", f"{stable:.0%}",
+            f"{refresh_peak / 2**20:.0f}",
+            f"{map_ms:.0f}", f"{size / 2**20:.0f}", "yes" if same else "NO",
+            "yes" if shared else "NO",
+        ])
+
+    print_table(
+        "Corpus store (docs/s of the first 90% vs the last 10%; MiB = Python heap peak;"
+        " warm = refresh after 5 more documents)",
+        ["docs", "concepts", "edges", "docs/s", "last docs/s", "merge MiB",
+         "refresh s", "warm s", "stable", "refresh MiB", "map ms", "db MiB", "matches",
+         "sees others"],
+        rows,
+    )
+
+
+def latencies(fn: Callable, args: List) -> List[float]:
+    """Wall time of ``fn(*a)`` for each *a* in *args*, in microseconds, sorted."""
+    times = []
+    for a in args:
+        start = time.perf_counter()
+        fn(*a)
+        times.append((time.perf_counter() - start) * 1e6)
+    return sorted(times)
+
+
+def bench_corpus_query(repeat: int):
+    import tempfile
+    from corpus_store import CorpusStore
+
+    rows = []
+    for documents, vocabulary in ((200, 20_000), (2_000, 400_000)):
+        records = list(corpus_records(documents, vocabulary))
+        expected = reference_corpus(records)["edges"]
+        with tempfile.TemporaryDirectory() as tmp:
+            store = CorpusStore(os.path.join(tmp, "corpus.db"))
+            for name, record in records:
+                store.add_document(name, record)
+            store.refresh()
+
+            rng = random.Random(0)
+            names = [name for (name,) in store._conn.execute("SELECT name FROM concepts")]
+            sample = [(rng.choice(names),) for _ in range(200 * repeat)]
+            relations = ["is_a", "part_of", "uses", "depends_on", "contains"]
+            queries = {
+                "concept": (store.concept, sample),
+                "neighbors": (store.neighbors, sample),
+                "neighbors uses/out": (
+                    lambda name: store.neighbors(name, relation="uses", direction="out"), sample,
+                ),
+                "documents": (store.concept_documents, sample),
+                "relation page": (
+                    store.relations, [(rng.choice(relations), 100, rng.randrange(1000)) for _ in sample],
+                ),
+                "subgraph 1 hop": (store.subgraph, sample),
+                "subgraph 2 hops": (lambda name: store.subgraph(name, hops=2), sample),
+            }
+
+            # Every edge around a concept, against the in-memory merge
+            same = True
+            for (name,) in sample[:50]:
+                found = {
+                    (e["source"], e["target"], e["relation"], e["negated"]): e["documents"]
+                    for e in store.neighbors(name, limit=10 ** 6)
+                }
+                same &= found == {e: d for e, d in expected.items() if name in e[:2]}
+
+            for label, (fn, args) in queries.items():
+                fn(*args[0])  # warm the page cache
+                times = latencies(fn, args)
+                rows.append([
+                    documents, label, f"{times[len(times) // 2]:.0f}",
+                    f"{times[len(times) * 99 // 100]:.0f}", "yes" if same else "NO",
+                ])
+            store.close()
+
+    print_table(
+        "Corpus store lookups (µs per query over random concepts)",
+        ["docs", "query", "p50 µs", "p99 µs", "neighbors match"],
+        rows,
+    )
+
+
+# ---------------------------------------------------------------------------
+# Upload handling: in-memory vs spooled + streaming clean
+# ---------------------------------------------------------------------------
+
+def bench_upload(repeat: int):
+    import io
+    import tempfile
+    from preprocessor import clean_text, iter_clean_lines
+    from uploads import spool_upload, iter_file_text, remove_quietly
+
+    rows = []
+    for mb in (1, 8, 32):
+        line = "The  query optimizer\tanalyzes relational queries.\r\n"
+        raw = (line * (mb * 1024 * 1024 // len(line))).encode("utf-8")
+
+        def in_memory():
+            return len(clean_text(io.BytesIO(raw).read().decode("utf-8", errors="replace")))
+
+        def spooled():
+            path = spool_upload(io.BytesIO(raw))
+            try:
+                return sum(len(l) + 1 for l in iter_clean_lines(iter_file_text(path))) - 1
+            finally:
+                remove_quietly(path)
+
+        same = in_memory() == spooled()
+        rows.append([
+            mb, f"{peak_memory(in_memory):.1f}", f"{peak_memory(spooled):.1f}",
+            f"{best_of(in_memory, repeat):.0f}", f"{best_of(spooled, repeat):.0f}",
+            "yes" if same else "NO",
+        ])
+
+    print_table(
+        f"Text upload cleaning, peak MB beyond the request body ({tempfile.gettempdir()})",
+        ["upload MB", "in-memory MB", "spooled MB", "in-memory ms", "spooled ms", "same"],
+        rows,
+    )
+
+
+# ---------------------------------------------------------------------------
+# Entry point
+# ---------------------------------------------------------------------------
+
+BENCHMARKS: Dict[str, Callable[[int], None]] = {
+    "full_phrase": bench_full_phrase,
+    "keep_longest": bench_keep_longest,
+    "rank": bench_rank,
+    "postprocess": bench_postprocess,
+    "compact": bench_compact,
+    "pdf": bench_pdf,
+    "upload": bench_upload,
+    "clean": bench_clean,
+    "formulas": bench_formulas,
+    "assign": bench_assign,
+    "incremental": bench_incremental,
+    "louvain": bench_louvain,
+    "corpus": bench_corpus,
+    "corpus_query": bench_corpus_query,
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="CS-CME Benchmarks")
+    parser.add_argument(
+        "--only", choices=sorted(BENCHMARKS), action="append",
+        help="Run only the named benchmark (may be repeated)"
+    )
+    parser.add_argument(
+        "--repeat", type=int, default=3,
+        help="Runs per measurement; the fastest is reported (default: 3)"
+    )
+    args = parser.parse_args()
+
+    for name in args.only or BENCHMARKS:
+        BENCHMARKS[name](args.repeat)
+
+
+if __name__ == "__main__":
+    main()
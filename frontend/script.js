@@ -40,6 +40,13 @@ document.getElementById("btn-launch").addEventListener("click", () => {
   let zoom        = null;
   let physicsOn   = true;
   let currentHighlight = null;
+  let previewFrame = 0;    // pending requestAnimationFrame of a preview
+
+  // Names the pasted text across regenerations, so the server only
+  // re-extracts the sections that changed since the last run.
+  const documentId = (window.crypto && crypto.randomUUID)
+    ? crypto.randomUUID()
+    : `doc-${Date.now()}-${Math.random().toString(36).slice(2)}`;
 
   // ── DOM refs ──
   const $  = (s) => document.querySelector(s);
@@ -104,18 +111,24 @@ document.getElementById("btn-launch").addEventListener("click", () => {
     try {
       let resp;
       const activeTab = $(".tab.active").dataset.tab;
+      // Progress and partial maps arrive as NDJSON while the map is built
+      const accept = "application/x-ndjson";
 
       if (activeTab === "file-tab" && inputFile.files.length) {
         const fd = new FormData();
         fd.append("file", inputFile.files[0]);
-        resp = await fetch(`${API_BASE}/api/extract`, { method: "POST", body: fd });
+        resp = await fetch(`${API_BASE}/api/extract`, {
+          method: "POST",
+          headers: { Accept: accept },
+          body: fd,
+        });
       } else {
         const text = inputText.value.trim();
         if (!text) { showStatus("Please enter some text.", "error"); btnGenerate.disabled = false; return; }
         resp = await fetch(`${API_BASE}/api/extract`, {
           method: "POST",
-          headers: { "Content-Type": "application/json" },
-          body: JSON.stringify({ text }),
+          headers: { "Content-Type": "application/json", Accept: accept },
+          body: JSON.stringify({ text, document_id: documentId }),
         });
       }
 
@@ -124,7 +137,9 @@ document.getElementById("btn-launch").addEventListener("click", () => {
         throw new Error(err.error || `Server error ${resp.status}`);
       }
 
-      const data = await resp.json();
+      const streamed = (resp.headers.get("Content-Type") || "").startsWith(accept);
+      const data = streamed ? await readStream(resp) : await resp.json();
+      cancelAnimationFrame(previewFrame);
       conceptMap = data.concept_map;
 
       // Warnings
@@ -145,12 +160,25 @@ document.getElementById("btn-launch").addEventListener("click", () => {
           Edges in map: ${s.edges_in_map || 0}<br>
           Clusters: ${s.communities_detected || 0}<br>
           Headings: ${s.headings_found || 0}`;
+        if (s.clustering) {
+          statsDiv.innerHTML += `<br>Modularity: ${s.clustering.modularity.toFixed(3)}`;
+        }
+        if (data.incremental) {
+          statsDiv.innerHTML += `<br>Sections re-extracted: ${data.incremental.extracted} of ${data.incremental.sections}`;
+        }
         statsDiv.classList.remove("hidden");
       }
 
       controlsDiv.classList.remove("hidden");
       emptyState.style.display = "none";
-      showStatus("Concept map generated successfully!", "success");
+      if (data.incremental && data.incremental.reused) {
+        showStatus(
+          `Concept map updated (${data.incremental.extracted} of ${data.incremental.sections} sections re-extracted).`,
+          "success",
+        );
+      } else {
+        showStatus("Concept map generated successfully!", "success");
+      }
 
       renderGraph(conceptMap);
 
@@ -167,11 +195,111 @@ document.getElementById("btn-launch").addEventListener("click", () => {
     statusBar.classList.remove("hidden");
   }
 
+  // ═══════════════════════════════════════════════════════════════
+  //  STREAMED EXTRACTION (progress + partial maps)
+  // ═══════════════════════════════════════════════════════════════
+  const STAGE_MESSAGES = {
+    pdf: "Reading PDF…",
+    preprocessing: "Cleaning text…",
+    parsing: "Parsing sentences…",
+    concepts: "Extracting concepts…",
+    relations: "Analysing relations…",
+    graph: "Building the graph…",
+    ranking: "Ranking concepts…",
+    clustering: "Detecting clusters…",
+    done: "Finishing…",
+  };
+
+  function stageMessage(event) {
+    if (event.stage === "sections") {
+      return `Processed ${event.sections} sections (${event.sentences} sentences)…`;
+    }
+    if (event.stage === "parsing" && event.lines) return `Parsing ${event.lines} lines…`;
+    return STAGE_MESSAGES[event.stage] || "Processing…";
+  }
+
+  // Read the NDJSON events of /api/extract, showing progress and
+  // rendering each preview; resolves with the final result.
+  async function readStream(resp) {
+    const preview = { headings: [], headingEdges: [], concepts: [], relations: [] };
+    const reader = resp.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = "";
+
+    for (;;) {
+      const { value, done } = await reader.read();
+      buffer += decoder.decode(value || new Uint8Array(), { stream: !done });
+      let newline;
+      while ((newline = buffer.indexOf("\n")) >= 0) {
+        const line = buffer.slice(0, newline).trim();
+        buffer = buffer.slice(newline + 1);
+        if (!line) continue;
+        const event = JSON.parse(line);
+        switch (event.event) {
+          case "result":
+            return event.result;
+          case "error":
+            throw new Error(event.error);
+          case "progress":
+            showStatus(stageMessage(event), "");
+            break;
+          case "headings":
+            preview.headings = event.headings;
+            preview.headingEdges = event.edges;
+            renderPreview(preview);
+            break;
+          case "concepts":
+            preview.concepts = event.concepts;
+            renderPreview(preview);
+            break;
+          case "relations":
+            preview.relations = event.relations;
+            renderPreview(preview);
+            break;
+        }
+      }
+      if (done) throw new Error("The server ended the response before the concept map was ready.");
+    }
+  }
+
+  // Draw a preview on the next frame (later previews replace it)
+  function renderPreview(preview) {
+    cancelAnimationFrame(previewFrame);
+    previewFrame = requestAnimationFrame(() => {
+      const map = previewMap(preview);
+      if (map.nodes.length) emptyState.style.display = "none";
+      renderGraph(map, true);
+    });
+  }
+
+  // Partial map: heading tree, most frequent concepts so far and the
+  // relations between them (no clusters yet)
+  function previewMap(preview) {
+    const nodes = new Map();
+    const addNode = (id, frequency) => {
+      const node = nodes.get(id);
+      if (node) node.frequency = Math.max(node.frequency, frequency);
+      else nodes.set(id, { id, frequency, cluster: -1, descriptions: [], formulas: [] });
+    };
+    preview.headingEdges.forEach((e) => { addNode(e.source, 1); addNode(e.target, 1); });
+    preview.headings.forEach((h) => addNode(h, 1));
+    preview.concepts.forEach((c) => addNode(c.id, c.frequency));
+
+    const edges = preview.headingEdges
+      .map((e) => ({ ...e, negated: false }))
+      .concat(preview.relations.filter((e) => nodes.has(e.source) && nodes.has(e.target)));
+    return { nodes: [...nodes.values()], edges };
+  }
+
   // ═══════════════════════════════════════════════════════════════
   //  D3 FORCE GRAPH
   // ═══════════════════════════════════════════════════════════════
-  function renderGraph(map) {
+  function renderGraph(map, isPreview = false) {
+    // Nodes already on screen keep their place when the map is redrawn
+    const placed = new Map(simulation ? simulation.nodes().map((n) => [n.id, n]) : []);
+    if (simulation) simulation.stop();
     graphSvg.selectAll("*").remove();
+    graphSvg.classed("preview", isPreview);
 
     if (!map || !map.nodes.length) { emptyState.style.display = "flex"; return; }
 
@@ -203,9 +331,13 @@ document.getElementById("btn-launch").addEventListener("click", () => {
     graphSvg.call(zoom);
 
     svgGroup = graphSvg.append("g");
+    svgGroup.attr("transform", d3.zoomTransform(graphSvg.node()));
 
     // Prepare data  (D3 mutates arrays – work on copies)
-    const nodes = map.nodes.map((n) => ({ ...n }));
+    const nodes = map.nodes.map((n) => {
+      const p = placed.get(n.id);
+      return p ? { ...n, x: p.x, y: p.y, vx: p.vx, vy: p.vy } : { ...n };
+    });
     const edges = map.edges.map((e) => ({
       ...e,
       source: e.source,
@@ -278,6 +410,8 @@ document.getElementById("btn-launch").addEventListener("click", () => {
       .force("center", d3.forceCenter(width / 2, height / 2))
       .force("collision", d3.forceCollide().radius((d) => rScale(d.frequency || 1) + 10))
       .on("tick", ticked);
+    // A redrawn map only needs to settle the nodes that are new
+    if (placed.size) simulation.alpha(0.5);
 
     function ticked() {
       link